@@ -0,0 +1,193 @@
+"""
+Admission control.
+
+Every request is checked against, in order:
+
+* a per-client token bucket (ADMISSION_RATE_PER_SECOND refill, ADMISSION_BURST
+  capacity), rejected with 429 when empty;
+* a per-client concurrency cap (ADMISSION_PER_CLIENT_CONCURRENCY), rejected
+  with 429;
+* a concurrency cap for its route class with a bounded FIFO wait queue.
+  Reports and uploads have their own, smaller caps so they cannot take every
+  database connection from cheap reads. When the queue is full, or a request
+  waits longer than ADMISSION_QUEUE_TIMEOUT, it is shed with 503.
+
+Clients are identified by the subject of their bearer token, falling back to
+the peer address. Rejections carry a Retry-After header. Limits apply per
+worker process.
+"""
+from collections import OrderedDict, deque
+from math import ceil
+from time import monotonic
+import asyncio
+import os
+
+from dotenv import load_dotenv
+from fastapi.responses import JSONResponse
+
+from app.auth import get_token_subject
+
+load_dotenv()
+
+ADMISSION_ENABLED = os.getenv("ADMISSION_ENABLED", "true").lower() == "true"
+ADMISSION_RATE_PER_SECOND = float(os.getenv("ADMISSION_RATE_PER_SECOND", "20"))
+ADMISSION_BURST = float(os.getenv("ADMISSION_BURST", "40"))
+ADMISSION_PER_CLIENT_CONCURRENCY = int(os.getenv("ADMISSION_PER_CLIENT_CONCURRENCY", "6"))
+ADMISSION_QUEUE_SIZE = int(os.getenv("ADMISSION_QUEUE_SIZE", "50"))
+ADMISSION_QUEUE_TIMEOUT = float(os.getenv("ADMISSION_QUEUE_TIMEOUT", "5"))
+ADMISSION_MAX_CLIENTS = int(os.getenv("ADMISSION_MAX_CLIENTS", "10000"))
+
+# Defaults add up to the default SQLAlchemy pool (5 + 10 overflow connections).
+ROUTE_CLASS_CONCURRENCY = {
+    "reads": int(os.getenv("ADMISSION_READS_CONCURRENCY", "8")),
+    "reports": int(os.getenv("ADMISSION_REPORTS_CONCURRENCY", "4")),
+    "uploads": int(os.getenv("ADMISSION_UPLOADS_CONCURRENCY", "3")),
+}
+
+EXEMPT_PATHS = {"/", "/metrics", "/docs", "/redoc", "/openapi.json"}
+
+
+class TokenBucket:
+    def __init__(self, rate: float, capacity: float):
+        self.rate = rate
+        self.capacity = capacity
+        self.tokens = capacity
+        self.updated = monotonic()
+
+    def take(self) -> float:
+        """Take a token; return 0 on success, otherwise seconds until one is available."""
+        now = monotonic()
+        self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+        self.updated = now
+        if self.tokens >= 1:
+            self.tokens -= 1
+            return 0.0
+        return (1 - self.tokens) / self.rate
+
+
+class ConcurrencyLimiter:
+    """Counting semaphore with a bounded FIFO queue and a wait timeout."""
+
+    def __init__(self, limit: int, queue_size: int, timeout: float):
+        self.limit = limit
+        self.queue_size = queue_size
+        self.timeout = timeout
+        self.active = 0
+        self.waiters = deque()
+
+    async def acquire(self) -> bool:
+        if self.active < self.limit and not self.waiters:
+            self.active += 1
+            return True
+        if len(self.waiters) >= self.queue_size:
+            return False
+
+        waiter = asyncio.get_running_loop().create_future()
+        self.waiters.append(waiter)
+        try:
+            await asyncio.wait_for(waiter, self.timeout)
+        except asyncio.TimeoutError:
+            return False
+        except asyncio.CancelledError:
+            # The slot may have been handed over just before the cancellation.
+            if waiter.done() and not waiter.cancelled():
+                self.release()
+            raise
+        finally:
+            if waiter in self.waiters:
+                self.waiters.remove(waiter)
+        return True
+
+    def release(self):
+        # Hand the slot straight to the oldest waiter so newcomers can't jump the queue.
+        while self.waiters:
+            waiter = self.waiters.popleft()
+            if not waiter.done():
+                waiter.set_result(None)
+                return
+        self.active -= 1
+
+
+def route_class(scope) -> str:
+    path = scope["path"]
+    if path.startswith("/reports"):
+        return "reports"
+    if scope["method"] in ("POST", "PUT", "PATCH"):
+        content_type = dict(scope.get("headers") or []).get(b"content-type", b"")
+        if content_type.startswith(b"multipart/form-data"):
+            return "uploads"
+    return "reads"
+
+
+def client_key(scope) -> str:
+    subject = get_token_subject(scope)
+    if subject:
+        return f"user:{subject}"
+    client = scope.get("client")
+    return f"addr:{client[0]}" if client else "addr:unknown"
+
+
+def reject(status_code: int, detail: str, retry_after: float) -> JSONResponse:
+    return JSONResponse(
+        status_code=status_code,
+        content={"detail": detail},
+        headers={"Retry-After": str(max(1, ceil(retry_after)))},
+    )
+
+
+class AdmissionControlMiddleware:
+    def __init__(self, app):
+        self.app = app
+        self.buckets = OrderedDict()
+        self.client_in_flight = {}
+        self.limiters = {
+            name: ConcurrencyLimiter(limit, ADMISSION_QUEUE_SIZE, ADMISSION_QUEUE_TIMEOUT)
+            for name, limit in ROUTE_CLASS_CONCURRENCY.items()
+        }
+
+    def bucket(self, key: str) -> TokenBucket:
+        bucket = self.buckets.get(key)
+        if bucket is None:
+            bucket = TokenBucket(ADMISSION_RATE_PER_SECOND, ADMISSION_BURST)
+            self.buckets[key] = bucket
+            if len(self.buckets) > ADMISSION_MAX_CLIENTS:
+                self.buckets.popitem(last=False)
+        else:
+            self.buckets.move_to_end(key)
+        return bucket
+
+    async def __call__(self, scope, receive, send):
+        if (
+            not ADMISSION_ENABLED
+            or scope["type"] != "http"
+            or scope["method"] == "OPTIONS"
+            or scope["path"] in EXEMPT_PATHS
+            or scope["path"].startswith(("/uploads/", "/storage/"))
+        ):
+            await self.app(scope, receive, send)
+            return
+
+        key = client_key(scope)
+        wait = self.bucket(key).take()
+        if wait:
+            await reject(429, "Too many requests", wait)(scope, receive, send)
+            return
+
+        if self.client_in_flight.get(key, 0) >= ADMISSION_PER_CLIENT_CONCURRENCY:
+            await reject(429, "Too many concurrent requests", 1)(scope, receive, send)
+            return
+
+        self.client_in_flight[key] = self.client_in_flight.get(key, 0) + 1
+        try:
+            limiter = self.limiters[route_class(scope)]
+            if not await limiter.acquire():
+                await reject(503, "Server is busy, retry later", ADMISSION_QUEUE_TIMEOUT)(scope, receive, send)
+                return
+            try:
+                await self.app(scope, receive, send)
+            finally:
+                limiter.release()
+        finally:
+            self.client_in_flight[key] -= 1
+            if not self.client_in_flight[key]:
+                del self.client_in_flight[key]
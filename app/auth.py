@@ -5,8 +5,8 @@ from passlib.context import CryptContext
 from fastapi import Depends, HTTPException, status
 from fastapi.security import OAuth2PasswordBearer
 from sqlalchemy.orm import Session
-from app import schemas, models, database
-from app.database import get_db
+from app import schemas, models, database, metrics
+from app.database import get_db, get_read_db
 from fastapi import Request
 from dotenv import load_dotenv
 import os
@@ -47,6 +47,19 @@ def get_current_user(
     token: str = Depends(oauth2_scheme),
     db: Session = Depends(get_db)
 ):
+    return user_from_token(token, db)
+
+def get_current_read_user(
+    token: str = Depends(oauth2_scheme),
+    db: Session = Depends(get_read_db)
+):
+    """
+    Same as get_current_user, for read-only routes: the user is loaded through
+    the route's get_read_db session, so those routes can stay off the primary.
+    """
+    return user_from_token(token, db)
+
+def user_from_token(token: str, db: Session):
     credentials_exception = HTTPException(
         status_code=status.HTTP_401_UNAUTHORIZED,
         detail="Could not validate credentials",
@@ -64,8 +77,34 @@ def get_current_user(
     if user is None:
         raise credentials_exception
 
-    if user.profile_image:
-        normalized_path = user.profile_image.replace("\\", "/")
-        user.profile_image = f"{normalized_path.split('uploads/')[-1]}"
+    metrics.set_request_user(user.id)
 
     return user
+
+ADMIN_EMAILS = {email.strip() for email in os.getenv("ADMIN_EMAILS", "").split(",") if email.strip()}
+
+def get_current_admin(current_user: models.User = Depends(get_current_user)):
+    if current_user.email not in ADMIN_EMAILS:
+        raise HTTPException(
+            status_code=status.HTTP_403_FORBIDDEN,
+            detail="Admin privileges required",
+        )
+    return current_user
+
+def get_token_subject(scope) -> Optional[str]:
+    """
+    JWT subject of a raw ASGI request, for middleware that runs before the
+    dependencies. Decoded once and cached on the request state.
+    """
+    state = scope.setdefault("state", {})
+    if "token_subject" not in state:
+        subject = None
+        authorization = dict(scope.get("headers") or []).get(b"authorization", b"").decode("latin-1")
+        scheme, _, token = authorization.partition(" ")
+        if scheme.lower() == "bearer" and token:
+            try:
+                subject = jwt.decode(token, SECRET_KEY, algorithms=[AUTH_ALGORITHM]).get("sub")
+            except JWTError:
+                subject = None
+        state["token_subject"] = subject
+    return state["token_subject"]
@@ -1,22 +1,234 @@
-from sqlalchemy import create_engine
+from collections import OrderedDict
+from datetime import datetime, timedelta, timezone
+from threading import Lock
+from time import monotonic
+from fastapi import Request
+from sqlalchemy import create_engine, event, insert, select, text, update
+from sqlalchemy.exc import IntegrityError, OperationalError
 from sqlalchemy.ext.declarative import declarative_base
 from sqlalchemy.orm import sessionmaker
 from dotenv import load_dotenv
-import os 
+import logging
+import os
 
 load_dotenv()
 
 DATABASE_URL = os.getenv("DATABASE_URL")
 
-engine = create_engine(DATABASE_URL)
+# Comma-separated URLs of read replicas. Read-only routes use them through
+# get_read_db; without any, every session goes to the primary.
+DATABASE_REPLICA_URLS = [url.strip() for url in os.getenv("DATABASE_REPLICA_URLS", "").split(",") if url.strip()]
+REPLICA_MAX_LAG_SECONDS = float(os.getenv("REPLICA_MAX_LAG_SECONDS", "5"))
+REPLICA_CHECK_INTERVAL = float(os.getenv("REPLICA_CHECK_INTERVAL", "5"))
+REPLICA_RETRY_AFTER = float(os.getenv("REPLICA_RETRY_AFTER", "30"))
+READ_YOUR_WRITES_SECONDS = float(os.getenv("READ_YOUR_WRITES_SECONDS", "10"))
+
+logger = logging.getLogger("app.database")
+
+
+def _connect_args(url: str) -> dict:
+    # SQLite connections are opened in the threadpool and used by sync endpoints
+    # on other threads, so the same-thread check has to be disabled.
+    return {"check_same_thread": False} if url.startswith("sqlite") else {}
+
+
+engine = create_engine(DATABASE_URL, connect_args=_connect_args(DATABASE_URL))
 
 SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
 
 Base = declarative_base()
 
-def get_db():
+REPLICA_LAG_SQL = text(
+    "SELECT CASE WHEN pg_last_wal_receive_lsn() = pg_last_wal_replay_lsn() THEN 0 "
+    "ELSE COALESCE(EXTRACT(EPOCH FROM now() - pg_last_xact_replay_timestamp()), 0) END"
+)
+
+
+def _fall_back_to_primary(orm_execute_state):
+    """
+    Run a statement of a replica session again on the primary when the
+    replica fails, and keep the rest of the session there.
+    """
+    session = orm_execute_state.session
+    replica = session.info.get("replica")
+    if replica is None:
+        return None
+    try:
+        return orm_execute_state.invoke_statement()
+    except OperationalError:
+        replicas.mark_failed(replica)
+        session.rollback()
+        session.info["replica"] = None
+        session.bind = engine
+        return orm_execute_state.invoke_statement()
+
+
+class Replica:
+    def __init__(self, url: str):
+        self.engine = create_engine(url, connect_args=_connect_args(url), pool_pre_ping=True)
+        self.sessionmaker = sessionmaker(autocommit=False, autoflush=False, bind=self.engine, info={"replica": self})
+        event.listen(self.sessionmaker, "do_orm_execute", _fall_back_to_primary)
+        self.available = True
+        self.checked_at = 0.0
+        self.unavailable_until = 0.0
+
+    def lag(self) -> float:
+        with self.engine.connect() as conn:
+            if self.engine.dialect.name == "postgresql":
+                return float(conn.execute(REPLICA_LAG_SQL).scalar() or 0)
+            conn.execute(text("SELECT 1"))
+            return 0.0
+
+
+class ReplicaRouter:
+    """
+    Picks a read replica for a session, round robin, skipping replicas that
+    are lagging more than REPLICA_MAX_LAG_SECONDS or have failed recently.
+    A client that committed a write in the last READ_YOUR_WRITES_SECONDS is
+    kept on the primary so it reads its own writes. Writes are keyed by the
+    token subject, so they cover all of a user's devices and refreshed
+    tokens, and recorded in the recent_writes table, so they cover every
+    worker process. Writes this process made are also kept in memory,
+    which spares reads right after them the lookup.
+    """
+
+    def __init__(self, urls):
+        self.replicas = [Replica(url) for url in urls]
+        self.recent_writes = OrderedDict()
+        self.next_index = 0
+        self.lock = Lock()
+
+    def mark_write(self, key: str):
+        if not self.replicas:
+            return
+        self.record_write(key)
+        self.remember_write(key)
+
+    def record_write(self, key: str):
+        # app.models imports this module.
+        from app.models import RecentWrite
+        values = {"written_at": datetime.now(timezone.utc)}
+        with engine.begin() as conn:
+            if conn.execute(update(RecentWrite).where(RecentWrite.subject == key).values(**values)).rowcount:
+                return
+            try:
+                with conn.begin_nested():
+                    conn.execute(insert(RecentWrite).values(subject=key, **values))
+            except IntegrityError:
+                # Another worker recorded the subject's first write meanwhile.
+                conn.execute(update(RecentWrite).where(RecentWrite.subject == key).values(**values))
+
+    def remember_write(self, key: str):
+        now = monotonic()
+        with self.lock:
+            self.recent_writes[key] = now
+            self.recent_writes.move_to_end(key)
+            while self.recent_writes:
+                oldest_key, written_at = next(iter(self.recent_writes.items()))
+                if now - written_at <= READ_YOUR_WRITES_SECONDS:
+                    break
+                del self.recent_writes[oldest_key]
+
+    def wrote_recently(self, key: str) -> bool:
+        with self.lock:
+            written_at = self.recent_writes.get(key)
+        if written_at is not None and monotonic() - written_at <= READ_YOUR_WRITES_SECONDS:
+            return True
+        # Written through another worker?
+        from app.models import RecentWrite
+        cutoff = datetime.now(timezone.utc) - timedelta(seconds=READ_YOUR_WRITES_SECONDS)
+        with engine.connect() as conn:
+            return conn.execute(
+                select(RecentWrite.subject).where(RecentWrite.subject == key, RecentWrite.written_at > cutoff)
+            ).first() is not None
+
+    def mark_failed(self, replica: Replica):
+        logger.warning("Read replica %s failed, using the primary", replica.engine.url)
+        replica.available = False
+        replica.unavailable_until = monotonic() + REPLICA_RETRY_AFTER
+
+    def is_available(self, replica: Replica) -> bool:
+        now = monotonic()
+        if not replica.available and now < replica.unavailable_until:
+            return False
+        if now - replica.checked_at < REPLICA_CHECK_INTERVAL:
+            return replica.available
+
+        replica.checked_at = now
+        try:
+            lag = replica.lag()
+        except OperationalError:
+            self.mark_failed(replica)
+            return False
+        replica.available = lag <= REPLICA_MAX_LAG_SECONDS
+        if not replica.available:
+            logger.warning("Read replica %s is %.1fs behind, using the primary", replica.engine.url, lag)
+            replica.unavailable_until = now + REPLICA_CHECK_INTERVAL
+        return replica.available
+
+    def choose(self, key: str = None):
+        if not self.replicas or (key and self.wrote_recently(key)):
+            return None
+        with self.lock:
+            start = self.next_index
+            self.next_index = (self.next_index + 1) % len(self.replicas)
+        for offset in range(len(self.replicas)):
+            replica = self.replicas[(start + offset) % len(self.replicas)]
+            if self.is_available(replica):
+                return replica
+        return None
+
+
+replicas = ReplicaRouter(DATABASE_REPLICA_URLS)
+
+engines = [engine] + [replica.engine for replica in replicas.replicas]
+
+
+@event.listens_for(SessionLocal, "after_commit")
+def _record_write(session):
+    key = session.info.get("read_your_writes_key")
+    if key:
+        replicas.mark_write(key)
+
+
+def read_your_writes_key(request: Request):
+    # app.auth imports this module.
+    from app.auth import get_token_subject
+    return get_token_subject(request.scope)
+
+
+def get_db(request: Request):
     db = SessionLocal()
+    db.info["read_your_writes_key"] = read_your_writes_key(request)
+    try:
+        yield db
+    finally:
+        db.close()
+
+
+def open_read_session(request: Request):
+    """
+    (session, replica) for a read-only request; replica is None when the
+    session is on the primary. For responses that outlive get_read_db, e.g.
+    streamed ones, which must close the session themselves. A statement
+    that fails on the replica is retried once on the primary.
+    """
+    replica = replicas.choose(read_your_writes_key(request))
+    return (replica.sessionmaker() if replica else SessionLocal()), replica
+
+
+def get_read_db(request: Request):
+    """
+    Session for read-only routes: a healthy replica when one is configured,
+    otherwise the primary.
+    """
+    db, _ = open_read_session(request)
     try:
         yield db
+    except OperationalError:
+        # E.g. a replica failing while a result is being fetched.
+        if db.info.get("replica"):
+            replicas.mark_failed(db.info["replica"])
+        raise
     finally:
-        db.close()
\ No newline at end of file
+        db.close()
@@ -0,0 +1,326 @@
+"""
+Background report exports.
+
+POST /reports/exports records an export_jobs row and queues the job on an
+in-process thread pool of EXPORT_WORKERS threads. At most EXPORT_QUEUE_SIZE
+jobs can be waiting or running per process, and each user can have at most
+EXPORT_MAX_ACTIVE_PER_USER unfinished jobs. A job streams its query with
+yield_per and writes the rows to a temporary CSV, XLSX (openpyxl, write-only
+mode) or PDF (reportlab, if installed) file. It records its progress on the
+job row as it goes, then uploads the file to the EXPORT_BUCKET bucket.
+GET /reports/exports/{id} reads the job row, so any worker can answer it.
+
+Jobs live in the process that accepted them: if it exits, its unfinished
+jobs stay queued or running and have to be requested again. Jobs queued or
+running for longer than EXPORT_JOB_TIMEOUT_SECONDS are taken to be lost
+that way: polling reports them as failed, and they are marked failed the
+next time their user creates an export, so they stop counting towards
+EXPORT_MAX_ACTIVE_PER_USER.
+"""
+from concurrent.futures import ThreadPoolExecutor
+from datetime import date, datetime, time, timedelta, timezone
+from threading import Lock
+import csv
+import json
+import logging
+import os
+import tempfile
+
+from dotenv import load_dotenv
+from sqlalchemy import and_, func, or_, select, update
+
+from app.database import SessionLocal, replicas
+from app.models import Category, ExportJob, Product
+from app.supabase import upload
+
+try:
+    import openpyxl
+except ImportError:
+    openpyxl = None
+
+try:
+    from reportlab.lib.pagesizes import A4, landscape
+    from reportlab.pdfgen import canvas
+except ImportError:
+    canvas = None
+
+load_dotenv()
+
+EXPORT_WORKERS = int(os.getenv("EXPORT_WORKERS", "2"))
+EXPORT_QUEUE_SIZE = int(os.getenv("EXPORT_QUEUE_SIZE", "20"))
+EXPORT_MAX_ACTIVE_PER_USER = int(os.getenv("EXPORT_MAX_ACTIVE_PER_USER", "3"))
+EXPORT_BUCKET = os.getenv("EXPORT_BUCKET", "exports")
+EXPORT_URL_EXPIRE_SECONDS = int(os.getenv("EXPORT_URL_EXPIRE_SECONDS", "3600"))
+EXPORT_JOB_TIMEOUT_SECONDS = float(os.getenv("EXPORT_JOB_TIMEOUT_SECONDS", "3600"))
+CHUNK_SIZE = 2000
+
+CONTENT_TYPES = {
+    "csv": "text/csv",
+    "xlsx": "application/vnd.openxmlformats-officedocument.spreadsheetml.sheet",
+    "pdf": "application/pdf",
+}
+
+logger = logging.getLogger("app.exports")
+
+
+class QueueFull(Exception):
+    pass
+
+
+def inventory(user_id: int, parameters: dict):
+    statement = (
+        select(
+            Product.id,
+            Product.code,
+            Product.name,
+            Category.name,
+            Product.price,
+            Product.stock,
+            Product.sales,
+            Product.stock * Product.price,
+        )
+        .outerjoin(Category, Category.id == Product.category_id)
+        .where(Product.user_id == user_id)
+        .order_by(Product.id)
+    )
+    count = select(func.count(Product.id)).where(Product.user_id == user_id)
+    return statement, count
+
+
+def category_breakdown(user_id: int, parameters: dict):
+    statement = (
+        select(
+            func.coalesce(Category.name, "Uncategorized"),
+            func.count(Product.id),
+            func.coalesce(func.sum(Product.stock), 0),
+            func.coalesce(func.sum(Product.stock * Product.price), 0),
+            func.coalesce(func.sum(Product.sales), 0),
+        )
+        .select_from(Product)
+        .outerjoin(Category, Category.id == Product.category_id)
+        .where(Product.user_id == user_id)
+        .group_by(Category.name)
+        .order_by(Category.name)
+    )
+    return statement, None
+
+
+def sales_over_time(user_id: int, parameters: dict):
+    end_date = date.fromisoformat(parameters["end_date"]) if parameters.get("end_date") else datetime.utcnow().date()
+    start_date = date.fromisoformat(parameters["start_date"]) if parameters.get("start_date") else end_date - timedelta(days=30)
+    day = func.date(Product.created_at)
+    statement = (
+        select(day, func.sum(Product.sales))
+        .where(
+            Product.user_id == user_id,
+            Product.created_at >= datetime.combine(start_date, time.min),
+            Product.created_at <= datetime.combine(end_date, time.max),
+        )
+        .group_by(day)
+        .order_by(day)
+    )
+    return statement, None
+
+
+# Report name -> (column headers, function returning (statement, count statement or None)).
+REPORTS = {
+    "inventory": (
+        ["id", "code", "name", "category", "price", "stock", "sales", "stock_value"],
+        inventory,
+    ),
+    "products_by_category": (
+        ["category", "product_count", "stock", "stock_value", "sales"],
+        category_breakdown,
+    ),
+    "sales_over_time": (["date", "total_sales"], sales_over_time),
+}
+
+
+def available_formats():
+    formats = ["csv"]
+    if openpyxl is not None:
+        formats.append("xlsx")
+    if canvas is not None:
+        formats.append("pdf")
+    return formats
+
+
+class CsvWriter:
+    def __init__(self, path: str, headers: list):
+        self.file = open(path, "w", newline="", encoding="utf-8")
+        self.writer = csv.writer(self.file)
+        self.writer.writerow(headers)
+
+    def write(self, rows):
+        self.writer.writerows(rows)
+
+    def close(self):
+        self.file.close()
+
+
+class XlsxWriter:
+    def __init__(self, path: str, headers: list):
+        self.path = path
+        # Write-only workbooks stream rows to disk instead of keeping cells in memory.
+        self.workbook = openpyxl.Workbook(write_only=True)
+        self.sheet = self.workbook.create_sheet("Report")
+        self.sheet.append(headers)
+
+    def write(self, rows):
+        for row in rows:
+            self.sheet.append([str(value) if isinstance(value, (date, datetime)) else value for value in row])
+
+    def close(self):
+        self.workbook.save(self.path)
+
+
+class PdfWriter:
+    """Plain tabular PDF drawn line by line, so pages are flushed as rows arrive."""
+
+    LINE_HEIGHT = 12
+    MARGIN = 36
+
+    def __init__(self, path: str, headers: list):
+        self.canvas = canvas.Canvas(path, pagesize=landscape(A4))
+        self.width, self.height = landscape(A4)
+        self.column_width = (self.width - 2 * self.MARGIN) / len(headers)
+        self.headers = headers
+        self.new_page()
+
+    def new_page(self):
+        self.y = self.height - self.MARGIN
+        self.canvas.setFont("Helvetica-Bold", 8)
+        self.draw(self.headers)
+        self.canvas.setFont("Helvetica", 8)
+
+    def draw(self, values):
+        for index, value in enumerate(values):
+            text = "" if value is None else str(value)
+            self.canvas.drawString(self.MARGIN + index * self.column_width, self.y, text[:40])
+        self.y -= self.LINE_HEIGHT
+
+    def write(self, rows):
+        for row in rows:
+            if self.y < self.MARGIN:
+                self.canvas.showPage()
+                self.new_page()
+            self.draw(row)
+
+    def close(self):
+        self.canvas.save()
+
+
+WRITERS = {"csv": CsvWriter, "xlsx": XlsxWriter, "pdf": PdfWriter}
+
+
+def set_job(db, job_id: str, **values):
+    db.execute(update(ExportJob).where(ExportJob.id == job_id).values(**values))
+    db.commit()
+
+
+def is_stale(job: ExportJob) -> bool:
+    """Whether an unfinished job has outlived EXPORT_JOB_TIMEOUT_SECONDS; see expire_stale_jobs."""
+    if job.status == "queued":
+        since = job.created_at
+    elif job.status == "running":
+        since = job.started_at
+    else:
+        return False
+    if since is None:
+        return False
+    if since.tzinfo is None:
+        since = since.replace(tzinfo=timezone.utc)
+    return datetime.now(timezone.utc) - since > timedelta(seconds=EXPORT_JOB_TIMEOUT_SECONDS)
+
+
+STALE_JOB_ERROR = "Timed out: the worker running the export stopped"
+
+
+def expire_stale_jobs(db, user_id: int):
+    """
+    Mark the user's jobs that have been queued or running for longer than
+    EXPORT_JOB_TIMEOUT_SECONDS as failed: the worker that had them has
+    exited or been recycled.
+    """
+    now = datetime.now(timezone.utc)
+    cutoff = now - timedelta(seconds=EXPORT_JOB_TIMEOUT_SECONDS)
+    db.execute(
+        update(ExportJob)
+        .where(
+            ExportJob.user_id == user_id,
+            or_(
+                and_(ExportJob.status == "queued", ExportJob.created_at < cutoff),
+                and_(ExportJob.status == "running", ExportJob.started_at < cutoff),
+            ),
+        )
+        .values(status="failed", error=STALE_JOB_ERROR, finished_at=now)
+    )
+    db.commit()
+
+
+def run_job(job_id: str):
+    db = SessionLocal()
+    replica = replicas.choose()
+    read_db = replica.sessionmaker() if replica else SessionLocal()
+    path = None
+    try:
+        job = db.get(ExportJob, job_id)
+        headers, build = REPORTS[job.report]
+        statement, count = build(job.user_id, json.loads(job.parameters or "{}"))
+        total_rows = read_db.execute(count).scalar() if count is not None else None
+        set_job(db, job_id, status="running", started_at=datetime.now(timezone.utc), total_rows=total_rows)
+
+        descriptor, path = tempfile.mkstemp(suffix=f".{job.format}")
+        os.close(descriptor)
+        writer = WRITERS[job.format](path, headers)
+        rows_written = 0
+        try:
+            for chunk in read_db.execute(statement.execution_options(yield_per=CHUNK_SIZE)).partitions():
+                writer.write(chunk)
+                rows_written += len(chunk)
+                set_job(db, job_id, rows_written=rows_written)
+        finally:
+            writer.close()
+
+        file_key = f"{job.user_id}_{job_id}.{job.format}"
+        # Passed as a file object, so the upload streams it instead of reading it into memory.
+        with open(path, "rb") as f:
+            response = upload(EXPORT_BUCKET, file_key, f, {"content-type": CONTENT_TYPES[job.format]})
+        if not response.path:
+            raise RuntimeError(f"Failed to upload export: {response.error.message}")
+        set_job(
+            db, job_id,
+            status="done", file_key=file_key, rows_written=rows_written,
+            total_rows=rows_written, finished_at=datetime.now(timezone.utc),
+        )
+    except Exception as exc:
+        logger.exception("Export job %s failed", job_id)
+        db.rollback()
+        set_job(db, job_id, status="failed", error=str(exc)[:500], finished_at=datetime.now(timezone.utc))
+    finally:
+        if path:
+            os.remove(path)
+        read_db.close()
+        db.close()
+        _release()
+
+
+_executor = ThreadPoolExecutor(max_workers=EXPORT_WORKERS, thread_name_prefix="export")
+_pending = 0
+_pending_lock = Lock()
+
+
+def _release():
+    global _pending
+    with _pending_lock:
+        _pending -= 1
+
+
+def enqueue(job_id: str):
+    """Queue a job on this process's pool; raises QueueFull when it is at capacity."""
+    global _pending
+    with _pending_lock:
+        if _pending >= EXPORT_QUEUE_SIZE:
+            raise QueueFull()
+        _pending += 1
+    _executor.submit(run_job, job_id)
@@ -0,0 +1,291 @@
+"""
+Idempotency keys for POST /products/ and POST /users/.
+
+A request carrying an Idempotency-Key header runs once, whichever worker
+process it reaches. The first request to arrive claims the key by
+inserting its idempotency_keys row, keyed by token subject, path and key.
+When it finishes, its response is saved on the row together with a
+fingerprint of the request: a SHA-256 of method, path and body, with the
+multipart boundary removed, since clients pick a new one on every retry.
+The response is then kept for IDEMPOTENCY_TTL_SECONDS.
+
+A retry with the same key gets the saved response without reaching the
+endpoint, and so without touching products, users or storage. A duplicate
+that arrives while the first request is still running waits for it, by
+polling the row. Reusing a key for a different request is rejected with
+422. A claim whose request hasn't finished within IDEMPOTENCY_LOCK_SECONDS
+(its worker died, say) lapses, and the next attempt runs in its place.
+
+Server errors (5xx), failures, responses sent before the body was read and
+responses larger than IDEMPOTENCY_MAX_BODY are not saved: their claim is
+dropped, so the next attempt runs normally. Saved responses take up at
+most IDEMPOTENCY_MAX_BYTES in total; past that, those closest to expiry
+are dropped first.
+"""
+from datetime import datetime, timedelta, timezone
+import asyncio
+import hashlib
+import json
+import os
+
+from dotenv import load_dotenv
+from fastapi.responses import JSONResponse
+from sqlalchemy import delete, func, select, update
+from sqlalchemy.exc import IntegrityError
+from starlette.datastructures import Headers
+
+from app.auth import get_token_subject
+from app.database import SessionLocal
+from app.models import IdempotencyKey
+
+load_dotenv()
+
+IDEMPOTENCY_ENABLED = os.getenv("IDEMPOTENCY_ENABLED", "true").lower() == "true"
+IDEMPOTENCY_TTL_SECONDS = float(os.getenv("IDEMPOTENCY_TTL_SECONDS", str(24 * 3600)))
+IDEMPOTENCY_LOCK_SECONDS = float(os.getenv("IDEMPOTENCY_LOCK_SECONDS", "60"))
+IDEMPOTENCY_MAX_BODY = int(os.getenv("IDEMPOTENCY_MAX_BODY", str(1024 * 1024)))
+IDEMPOTENCY_MAX_BYTES = int(os.getenv("IDEMPOTENCY_MAX_BYTES", str(256 * 1024 * 1024)))
+# Delays between checks on a request with the same key that is still running.
+POLL_INTERVAL_SECONDS = 0.05
+MAX_POLL_INTERVAL_SECONDS = 1.0
+
+IDEMPOTENT_PATHS = ("/products", "/products/", "/users", "/users/")
+MAX_KEY_LENGTH = 255
+
+
+class Fingerprint:
+    """SHA-256 of a request, fed the body chunk by chunk with the multipart boundary removed."""
+
+    def __init__(self, scope, headers: Headers):
+        self.digest = hashlib.sha256()
+        content_type = headers.get("content-type", "")
+        media_type, _, params = content_type.partition(";")
+        self.boundary = b""
+        for param in params.split(";"):
+            name, _, value = param.strip().partition("=")
+            if name.lower() == "boundary" and value:
+                self.boundary = value.strip('"').encode("latin-1")
+        self.digest.update(f"{scope['method']} {scope['path']} {media_type.strip()}\n".encode("latin-1"))
+        self.tail = b""
+
+    def update(self, chunk: bytes):
+        if not self.boundary:
+            self.digest.update(chunk)
+            return
+        data = (self.tail + chunk).replace(self.boundary, b"")
+        # Hold back enough bytes to catch a boundary split across chunks.
+        keep = len(self.boundary) - 1
+        self.tail = data[-keep:] if keep else b""
+        self.digest.update(data[:len(data) - len(self.tail)])
+
+    def hexdigest(self) -> str:
+        self.digest.update(self.tail.replace(self.boundary, b"") if self.boundary else self.tail)
+        self.tail = b""
+        return self.digest.hexdigest()
+
+
+class StoredResponse:
+    def __init__(self, fingerprint: str, status: int, headers: list, body: bytes):
+        self.fingerprint = fingerprint
+        self.status = status
+        self.headers = headers
+        self.body = body
+
+
+# Returned by claim_key when another request holds the key.
+IN_FLIGHT = object()
+
+
+def key_filter(key):
+    subject, path, idempotency_key = key
+    return (
+        IdempotencyKey.subject == (subject or ""),
+        IdempotencyKey.path == path,
+        IdempotencyKey.idempotency_key == idempotency_key,
+    )
+
+
+def claim_key(key):
+    """
+    Claim key for this request. Returns None once claimed, the saved
+    response if the key has already been used, or IN_FLIGHT while another
+    request holds it.
+    """
+    subject, path, idempotency_key = key
+    now = datetime.now(timezone.utc)
+    db = SessionLocal()
+    try:
+        db.execute(delete(IdempotencyKey).where(*key_filter(key), IdempotencyKey.expires_at < now))
+        try:
+            with db.begin_nested():
+                db.add(IdempotencyKey(
+                    subject=subject or "", path=path, idempotency_key=idempotency_key,
+                    status="in_flight", expires_at=now + timedelta(seconds=IDEMPOTENCY_LOCK_SECONDS),
+                ))
+        except IntegrityError:
+            row = db.execute(select(IdempotencyKey).where(*key_filter(key))).scalar_one_or_none()
+            db.commit()
+            if row is None or row.status != "done":
+                return IN_FLIGHT
+            headers = [(name.encode("latin-1"), value.encode("latin-1")) for name, value in json.loads(row.response_headers)]
+            return StoredResponse(row.fingerprint, row.response_status, headers, row.response_body)
+        db.commit()
+        return None
+    finally:
+        db.close()
+
+
+def save_response(key, stored: StoredResponse):
+    """Save the response on the claimed row, then keep the total within IDEMPOTENCY_MAX_BYTES."""
+    now = datetime.now(timezone.utc)
+    db = SessionLocal()
+    try:
+        db.execute(
+            update(IdempotencyKey)
+            .where(*key_filter(key))
+            .values(
+                status="done",
+                fingerprint=stored.fingerprint,
+                response_status=stored.status,
+                response_headers=json.dumps([(name.decode("latin-1"), value.decode("latin-1")) for name, value in stored.headers]),
+                response_body=stored.body,
+                body_size=len(stored.body),
+                expires_at=now + timedelta(seconds=IDEMPOTENCY_TTL_SECONDS),
+            )
+        )
+        db.execute(delete(IdempotencyKey).where(IdempotencyKey.status == "done", IdempotencyKey.expires_at < now))
+        excess = db.execute(select(func.coalesce(func.sum(IdempotencyKey.body_size), 0))).scalar() - IDEMPOTENCY_MAX_BYTES
+        if excess > 0:
+            rows = db.execute(
+                select(IdempotencyKey.subject, IdempotencyKey.path, IdempotencyKey.idempotency_key, IdempotencyKey.body_size)
+                .where(IdempotencyKey.status == "done")
+                .order_by(IdempotencyKey.expires_at)
+            )
+            for subject, path, idempotency_key, body_size in rows.all():
+                if excess <= 0:
+                    break
+                db.execute(delete(IdempotencyKey).where(*key_filter((subject, path, idempotency_key))))
+                excess -= body_size
+        db.commit()
+    finally:
+        db.close()
+
+
+def release_key(key):
+    """Drop the claim of a request whose response isn't saved, so the next attempt runs."""
+    db = SessionLocal()
+    try:
+        db.execute(delete(IdempotencyKey).where(*key_filter(key), IdempotencyKey.status == "in_flight"))
+        db.commit()
+    finally:
+        db.close()
+
+
+def request_key(scope):
+    if scope["type"] != "http" or scope["method"] != "POST" or scope["path"] not in IDEMPOTENT_PATHS:
+        return None
+    idempotency_key = Headers(scope=scope).get("idempotency-key")
+    if not idempotency_key:
+        return None
+    # POST /users/ is unauthenticated, so its keys share one namespace.
+    return get_token_subject(scope), scope["path"].rstrip("/"), idempotency_key
+
+
+async def fingerprint_body(scope, receive) -> str:
+    fingerprint = Fingerprint(scope, Headers(scope=scope))
+    while True:
+        message = await receive()
+        if message["type"] != "http.request":
+            break
+        fingerprint.update(message.get("body", b""))
+        if not message.get("more_body", False):
+            break
+    return fingerprint.hexdigest()
+
+
+class IdempotencyMiddleware:
+    def __init__(self, app):
+        self.app = app
+
+    async def claim(self, key):
+        """Claim key, waiting while another request holds it. Returns the saved response, if any."""
+        delay = POLL_INTERVAL_SECONDS
+        while True:
+            claimed = await asyncio.to_thread(claim_key, key)
+            if claimed is not IN_FLIGHT:
+                return claimed
+            await asyncio.sleep(delay)
+            delay = min(delay * 2, MAX_POLL_INTERVAL_SECONDS)
+
+    async def replay(self, scope, receive, send, stored: StoredResponse):
+        if await fingerprint_body(scope, receive) != stored.fingerprint:
+            response = JSONResponse(
+                status_code=422,
+                content={"detail": "Idempotency-Key was already used for a different request"},
+            )
+            await response(scope, receive, send)
+            return
+        headers = stored.headers + [(b"idempotent-replayed", b"true")]
+        await send({"type": "http.response.start", "status": stored.status, "headers": headers})
+        await send({"type": "http.response.body", "body": stored.body})
+
+    async def __call__(self, scope, receive, send):
+        key = request_key(scope) if IDEMPOTENCY_ENABLED else None
+        if key is None:
+            await self.app(scope, receive, send)
+            return
+        if len(key[2]) > MAX_KEY_LENGTH:
+            response = JSONResponse(status_code=400, content={"detail": "Idempotency-Key is too long"})
+            await response(scope, receive, send)
+            return
+
+        stored = await self.claim(key)
+        if stored is not None:
+            await self.replay(scope, receive, send, stored)
+            return
+
+        fingerprint = Fingerprint(scope, Headers(scope=scope))
+        status = headers = None
+        chunks = []
+        size = 0
+        storable = True
+        body_read = False
+
+        async def receive_wrapper():
+            nonlocal body_read
+            message = await receive()
+            if message["type"] == "http.request":
+                fingerprint.update(message.get("body", b""))
+                body_read = not message.get("more_body", False)
+            return message
+
+        async def send_wrapper(message):
+            nonlocal status, headers, size, storable
+            if message["type"] == "http.response.start":
+                # Copied now: outer middlewares (compression) may rewrite the
+                # message once it is sent, but the body kept here is the raw one.
+                status, headers = message["status"], list(message["headers"])
+                storable = status < 500
+            elif message["type"] == "http.response.body" and storable:
+                body = message.get("body", b"")
+                size += len(body)
+                if size > IDEMPOTENCY_MAX_BODY:
+                    storable = False
+                    chunks.clear()
+                else:
+                    chunks.append(body)
+            await send(message)
+
+        saved = False
+        try:
+            await self.app(scope, receive_wrapper, send_wrapper)
+            # A response sent before the whole body was read (e.g. a 401) has
+            # no complete fingerprint to check retries against.
+            if storable and body_read and status is not None:
+                await asyncio.to_thread(save_response, key, StoredResponse(
+                    fingerprint.hexdigest(), status, headers, b"".join(chunks),
+                ))
+                saved = True
+        finally:
+            if not saved:
+                await asyncio.to_thread(release_key, key)
@@ -0,0 +1,100 @@
+"""
+Content-addressed image storage.
+
+Uploads are hashed (SHA-256) while they are read and stored under
+`<sha256>.<ext>`. The stored_objects table maps (bucket, hash) to the
+object, so uploading bytes that are already in the bucket skips the storage
+call and returns the existing object's URL.
+
+Clients can also upload straight to storage with a signed URL and then
+confirm the key. Those objects bypass the API, so they are not hashed or
+deduplicated.
+"""
+from datetime import datetime, timezone
+import hashlib
+import uuid
+
+from fastapi import HTTPException, UploadFile
+from sqlalchemy import update
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.orm import Session
+
+from app.metrics import IMAGE_UPLOADS
+from app.models import StoredObject
+from app.supabase import object_info, public_url, upload
+
+CHUNK_SIZE = 1024 * 1024
+
+
+def read_and_hash(file: UploadFile):
+    digest = hashlib.sha256()
+    chunks = []
+    file.file.seek(0)
+    while chunk := file.file.read(CHUNK_SIZE):
+        digest.update(chunk)
+        chunks.append(chunk)
+    return digest.hexdigest(), b"".join(chunks)
+
+
+def file_extension(filename: str) -> str:
+    extension = filename.rsplit(".", 1)[-1].lower() if filename and "." in filename else ""
+    return extension if extension.isalnum() else ""
+
+
+def store_image(db: Session, bucket_name: str, file: UploadFile) -> str:
+    """
+    Store an uploaded image, or reuse an identical one already in the
+    bucket, and return its public URL. The stored_objects row is written in
+    the caller's transaction.
+    """
+    sha256, content = read_and_hash(file)
+
+    existing = db.query(StoredObject).filter(
+        StoredObject.bucket == bucket_name, StoredObject.sha256 == sha256
+    ).first()
+    # No row updated means the garbage collector deleted it in the meantime
+    # and is removing the object, so the content is stored again.
+    if existing and db.execute(
+        update(StoredObject)
+        .where(StoredObject.id == existing.id)
+        .values(last_used_at=datetime.now(timezone.utc))
+    ).rowcount:
+        IMAGE_UPLOADS.labels(bucket_name, "deduplicated").inc()
+        return public_url(bucket_name, existing.key)
+
+    extension = file_extension(file.filename)
+    key = f"{sha256}.{extension}" if extension else sha256
+    # The object may exist without a row if a previous transaction rolled
+    # back; the content is the same, so overwriting it is harmless.
+    response = upload(bucket_name, key, content, {"upsert": "true"})
+    if not response.path:
+        raise HTTPException(status_code=500, detail=f"Failed to upload image: {response.error.message}")
+    IMAGE_UPLOADS.labels(bucket_name, "stored").inc()
+
+    try:
+        with db.begin_nested():
+            db.add(StoredObject(bucket=bucket_name, sha256=sha256, key=key, size=len(content)))
+    except IntegrityError:
+        # A concurrent upload of the same content recorded it first.
+        pass
+    return public_url(bucket_name, key)
+
+
+def direct_upload_key(user_id: int, filename: str) -> str:
+    """Key for an object the client uploads itself; the prefix ties it to the user."""
+    extension = file_extension(filename)
+    key = f"{user_id}_{uuid.uuid4().hex}"
+    return f"{key}.{extension}" if extension else key
+
+
+def confirm_direct_upload(user_id: int, bucket_name: str, key: str) -> str:
+    """
+    Check that a direct upload belongs to the user and has arrived in
+    storage, and return its public URL.
+    """
+    if not key.startswith(f"{user_id}_") or "/" in key:
+        raise HTTPException(status_code=403, detail="Upload key does not belong to this user")
+    if object_info(bucket_name, key) is None:
+        raise HTTPException(status_code=409, detail="The image has not been uploaded yet")
+    IMAGE_UPLOADS.labels(bucket_name, "direct").inc()
+    return public_url(bucket_name, key)
@@ -1,12 +1,19 @@
 from fastapi import FastAPI
 from fastapi.exceptions import RequestValidationError, ResponseValidationError
 from fastapi.responses import JSONResponse
-from app.database import engine
-from app import models
-from app.routers import users, reports, products, categories
+from app.database import engine, engines
+from app import models, metrics, query_log, reorder, snapshots, storage_gc
+from app.admission import AdmissionControlMiddleware
+from app.compression import CompressionMiddleware
+from app.idempotency import IdempotencyMiddleware
+from app.singleflight import SingleFlightMiddleware
+from app.routers import users, reports, products, categories, admin, storage
+from app.supabase import STORAGE_BACKEND
 from fastapi.middleware.cors import CORSMiddleware
 from fastapi.staticfiles import StaticFiles
 from pydantic import ValidationError
+from sqlalchemy.exc import IntegrityError
+import asyncio
 import uvicorn
 import os 
 
@@ -22,6 +29,14 @@ app.mount("/uploads", StaticFiles(directory="uploads"), name="uploads")
 
 origins = os.getenv("ALLOWED_ORIGINS").split(",")
 
+# Starlette wraps middleware in reverse order: the last one added runs first.
+# Admission control sits inside CORS so that 429/503 responses still carry
+# CORS headers, and inside single-flight and idempotency so that coalesced
+# duplicates and replayed retries don't take a slot.
+app.add_middleware(AdmissionControlMiddleware)
+app.add_middleware(SingleFlightMiddleware)
+app.add_middleware(IdempotencyMiddleware)
+
 app.add_middleware(
     CORSMiddleware,
     allow_origins=origins,
@@ -30,10 +45,36 @@ app.add_middleware(
     allow_headers=["*"],
 )
 
+app.add_middleware(CompressionMiddleware)
+
+for db_engine in engines:
+    metrics.instrument_engine(db_engine)
+    query_log.install(db_engine)
+app.add_middleware(metrics.PrometheusMiddleware)
+
+@app.on_event("startup")
+async def start_storage_gc():
+    if storage_gc.STORAGE_GC_INTERVAL_SECONDS > 0:
+        app.state.storage_gc_task = asyncio.create_task(storage_gc.run_periodically())
+
+@app.on_event("startup")
+async def start_inventory_snapshots():
+    if snapshots.INVENTORY_SNAPSHOT_INTERVAL_SECONDS > 0:
+        app.state.inventory_snapshot_task = asyncio.create_task(snapshots.run_periodically())
+
+@app.on_event("startup")
+async def start_reorder_refresh():
+    if reorder.REORDER_REFRESH_INTERVAL_SECONDS > 0:
+        app.state.reorder_refresh_task = asyncio.create_task(reorder.run_periodically())
+
 @app.get("/")
 async def root():
     return {"message": "CORS is configured!"}
 
+@app.get("/metrics", include_in_schema=False)
+def get_metrics():
+    return metrics.metrics_response()
+
 @app.exception_handler(RequestValidationError)
 async def validation_exception_handler(request, exc):
     errors = [
@@ -81,10 +122,21 @@ async def response_validation_exception_handler(request, exc: ValidationError):
         }
     )
 
+@app.exception_handler(IntegrityError)
+async def integrity_error_handler(request, exc: IntegrityError):
+    # E.g. a duplicate product code once codes are unique per user.
+    return JSONResponse(
+        status_code=409,
+        content={"detail": "Conflicts with an existing record"},
+    )
+
 app.include_router(users.router)
 app.include_router(reports.router)
 app.include_router(products.router)
 app.include_router(categories.router)
+app.include_router(admin.router)
+if STORAGE_BACKEND == "local":
+    app.include_router(storage.router)
 
 
 if __name__ == "__main__":
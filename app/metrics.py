@@ -0,0 +1,201 @@
+"""
+Prometheus instrumentation: per-route request metrics, database queries and
+time per request, storage call latency and image deduplication.
+
+For multi-worker deployments set PROMETHEUS_MULTIPROC_DIR to an empty,
+writable directory before the workers start. Every worker then writes its
+samples there and /metrics aggregates all of them.
+"""
+from contextlib import contextmanager
+from contextvars import ContextVar
+from time import perf_counter
+import os
+
+from fastapi import Response
+from prometheus_client import (
+    CONTENT_TYPE_LATEST,
+    CollectorRegistry,
+    Counter,
+    Gauge,
+    Histogram,
+    REGISTRY,
+    generate_latest,
+    multiprocess,
+)
+from sqlalchemy import event
+from starlette.routing import Match
+
+MULTIPROCESS = bool(os.getenv("PROMETHEUS_MULTIPROC_DIR"))
+
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.075, 0.1, 0.25, 0.5, 0.75, 1.0, 2.5, 5.0, 10.0)
+SIZE_BUCKETS = (256, 1024, 4096, 16384, 65536, 262144, 1048576, 4194304)
+QUERY_COUNT_BUCKETS = (0, 1, 2, 3, 4, 5, 8, 13, 21, 50, 100)
+
+REQUEST_LATENCY = Histogram(
+    "http_request_duration_seconds",
+    "HTTP request latency by route template",
+    ["method", "route", "status"],
+    buckets=LATENCY_BUCKETS,
+)
+REQUESTS_TOTAL = Counter(
+    "http_requests_total",
+    "HTTP requests by route template and status code",
+    ["method", "route", "status"],
+)
+REQUESTS_IN_FLIGHT = Gauge(
+    "http_requests_in_flight",
+    "HTTP requests currently being served",
+    multiprocess_mode="livesum",
+)
+RESPONSE_SIZE = Histogram(
+    "http_response_size_bytes",
+    "HTTP response body size by route template",
+    ["method", "route"],
+    buckets=SIZE_BUCKETS,
+)
+DB_QUERIES = Histogram(
+    "db_queries_per_request",
+    "Database statements executed per request",
+    ["method", "route"],
+    buckets=QUERY_COUNT_BUCKETS,
+)
+DB_TIME = Histogram(
+    "db_time_per_request_seconds",
+    "Time spent executing database statements per request",
+    ["method", "route"],
+    buckets=LATENCY_BUCKETS,
+)
+STORAGE_LATENCY = Histogram(
+    "storage_call_duration_seconds",
+    "Storage backend call latency",
+    ["operation", "bucket", "outcome"],
+    buckets=LATENCY_BUCKETS,
+)
+
+IMAGE_UPLOADS = Counter(
+    "image_uploads_total",
+    "Image uploads by bucket: stored, deduplicated against an existing object, or uploaded directly",
+    ["bucket", "outcome"],
+)
+
+
+class RequestStats:
+    def __init__(self, scope=None):
+        self.scope = scope
+        self.user_id = None
+        self.queries = 0
+        self.db_time = 0.0
+
+
+# Holds a mutable RequestStats so statements executed in threadpool workers,
+# which run in a copy of the request context, still add to the same object.
+request_stats: ContextVar = ContextVar("request_stats", default=None)
+
+
+def route_template(scope) -> str:
+    route = scope.get("route")
+    if route is None:
+        # Answered before routing, e.g. by admission control or a replayed
+        # single-flight or idempotent response: match the route here.
+        route = match_route(scope)
+    return getattr(route, "path", None) or "unmatched"
+
+
+def match_route(scope):
+    app = scope.get("app")
+    partial = None
+    for route in getattr(app, "routes", ()):
+        match, _ = route.matches(scope)
+        if match == Match.FULL:
+            return route
+        if match == Match.PARTIAL and partial is None:
+            partial = route
+    return partial
+
+
+def set_request_user(user_id: int):
+    stats = request_stats.get()
+    if stats is not None:
+        stats.user_id = user_id
+
+
+class PrometheusMiddleware:
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        stats = RequestStats(scope)
+        token = request_stats.set(stats)
+        status_code = 500
+        response_size = 0
+
+        async def send_wrapper(message):
+            nonlocal status_code, response_size
+            if message["type"] == "http.response.start":
+                status_code = message["status"]
+            elif message["type"] == "http.response.body":
+                response_size += len(message.get("body", b""))
+            await send(message)
+
+        REQUESTS_IN_FLIGHT.inc()
+        started = perf_counter()
+        try:
+            await self.app(scope, receive, send_wrapper)
+        finally:
+            elapsed = perf_counter() - started
+            REQUESTS_IN_FLIGHT.dec()
+            request_stats.reset(token)
+
+            method = scope["method"]
+            route = route_template(scope)
+            status = str(status_code)
+            REQUEST_LATENCY.labels(method, route, status).observe(elapsed)
+            REQUESTS_TOTAL.labels(method, route, status).inc()
+            RESPONSE_SIZE.labels(method, route).observe(response_size)
+            DB_QUERIES.labels(method, route).observe(stats.queries)
+            DB_TIME.labels(method, route).observe(stats.db_time)
+
+
+def instrument_engine(engine):
+    @event.listens_for(engine, "before_cursor_execute")
+    def _before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+        conn.info.setdefault("query_start_time", []).append(perf_counter())
+
+    @event.listens_for(engine, "after_cursor_execute")
+    def _after_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+        elapsed = perf_counter() - conn.info["query_start_time"].pop()
+        stats = request_stats.get()
+        if stats is not None:
+            stats.queries += 1
+            stats.db_time += elapsed
+
+    @event.listens_for(engine, "handle_error")
+    def _handle_error(context):
+        if context.connection is not None:
+            started = context.connection.info.get("query_start_time")
+            if started:
+                started.pop()
+
+
+@contextmanager
+def storage_timer(operation: str, bucket_name: str):
+    started = perf_counter()
+    outcome = "error"
+    try:
+        yield
+        outcome = "ok"
+    finally:
+        STORAGE_LATENCY.labels(operation, bucket_name, outcome).observe(perf_counter() - started)
+
+
+def metrics_response() -> Response:
+    if MULTIPROCESS:
+        registry = CollectorRegistry()
+        multiprocess.MultiProcessCollector(registry)
+    else:
+        registry = REGISTRY
+    return Response(content=generate_latest(registry), media_type=CONTENT_TYPE_LATEST)
@@ -1,4 +1,4 @@
-from sqlalchemy import Column, Integer, String, Float, ForeignKey, DateTime, Text
+from sqlalchemy import Column, Integer, BigInteger, String, Float, ForeignKey, Date, DateTime, Text, LargeBinary, UniqueConstraint, Index
 from sqlalchemy.orm import relationship, validates
 from app.database import Base
 from sqlalchemy.sql import func
@@ -21,6 +21,7 @@ class User(Base):
 
 class Category(Base):
     __tablename__ = "categories"
+    __table_args__ = (Index("ix_categories_user_id_name", "user_id", "name"),)
 
     id = Column(Integer, primary_key=True, index=True)
     name = Column(String(50), unique=False, index=True, nullable=False)
@@ -35,7 +36,24 @@ class Category(Base):
 
 
 class Product(Base):
+    # On Postgres this table can be hash-partitioned by user_id (see
+    # migrations/versions/0001_partition_products_by_user.py). Queries must
+    # keep filtering on user_id so the planner prunes to one partition.
     __tablename__ = "products"
+    # Codes can be made unique per user with the optional
+    # uq_products_user_id_code index (see migration 0002). The
+    # (user_id, <column>, id) indexes serve sorted product pages (0004), the
+    # (user_id, created_at/updated_at) ones the reorder cache check (0005).
+    __table_args__ = (
+        Index("ix_products_user_id_code", "user_id", "code"),
+        Index("ix_products_user_id_name_id", "user_id", "name", "id"),
+        Index("ix_products_user_id_price_id", "user_id", "price", "id"),
+        Index("ix_products_user_id_stock_id", "user_id", "stock", "id"),
+        Index("ix_products_user_id_sales_id", "user_id", "sales", "id"),
+        Index("ix_products_user_id_category_id_id", "user_id", "category_id", "id"),
+        Index("ix_products_user_id_created_at", "user_id", "created_at"),
+        Index("ix_products_user_id_updated_at", "user_id", "updated_at"),
+    )
 
     id = Column(Integer, primary_key=True, index=True)
     name = Column(String(100), index=True, nullable=False)
@@ -45,7 +63,7 @@ class Product(Base):
     image = Column(String(255), nullable=True)
     sales = Column(Integer, default=0)
     category_id = Column(Integer, ForeignKey("categories.id", ondelete="SET NULL"), nullable=True)
-    user_id = Column(Integer, ForeignKey("users.id", ondelete="CASCADE"), nullable=False)
+    user_id = Column(Integer, ForeignKey("users.id", ondelete="CASCADE"), nullable=False, index=True)
     code = Column(String(50), unique=False, nullable=False)
     created_at = Column(DateTime(timezone=True), server_default=func.now())
     updated_at = Column(DateTime(timezone=True), onupdate=func.now())
@@ -53,3 +71,107 @@ class Product(Base):
     category = relationship("Category", back_populates="products", foreign_keys=[category_id])
     owner = relationship("User", back_populates="products")
 
+
+class StoredObject(Base):
+    """
+    One row per distinct image in a bucket, keyed by the SHA-256 of its
+    content, so an upload of bytes that are already stored reuses the object.
+    """
+    __tablename__ = "stored_objects"
+    __table_args__ = (UniqueConstraint("bucket", "sha256", name="uq_stored_objects_bucket_sha256"),)
+
+    id = Column(Integer, primary_key=True)
+    bucket = Column(String(63), nullable=False)
+    sha256 = Column(String(64), nullable=False)
+    key = Column(String(255), nullable=False)
+    size = Column(BigInteger, nullable=False)
+    created_at = Column(DateTime(timezone=True), server_default=func.now())
+    # Bumped on every upload that reuses the object, so the garbage collector
+    # doesn't remove an object that has just been attached to a new row.
+    last_used_at = Column(DateTime(timezone=True), server_default=func.now())
+
+
+class InventorySnapshot(Base):
+    """
+    Daily stock per user and category, delta-encoded: a row is only written
+    on the days the figures change, and holds until the next row for the
+    same user and category. category_id is not a foreign key so history
+    survives deleted categories; None is uncategorized stock.
+    """
+    __tablename__ = "inventory_snapshots"
+    __table_args__ = (Index("ix_inventory_snapshots_user_id_date", "user_id", "snapshot_date"),)
+
+    id = Column(Integer, primary_key=True)
+    user_id = Column(Integer, ForeignKey("users.id", ondelete="CASCADE"), nullable=False)
+    category_id = Column(Integer, nullable=True)
+    snapshot_date = Column(Date, nullable=False)
+    product_count = Column(Integer, nullable=False)
+    stock_units = Column(BigInteger, nullable=False)
+    stock_value = Column(Float, nullable=False)
+
+
+class InventorySnapshotRun(Base):
+    """Days the snapshot job has covered; also keeps two workers from taking the same day."""
+    __tablename__ = "inventory_snapshot_runs"
+
+    snapshot_date = Column(Date, primary_key=True)
+    rows_written = Column(Integer, nullable=True)
+    created_at = Column(DateTime(timezone=True), server_default=func.now())
+
+
+class ScheduledRun(Base):
+    """Periods a periodic in-app job has run in; keeps two workers from running the same period."""
+    __tablename__ = "scheduled_runs"
+
+    job = Column(String(50), primary_key=True)
+    period = Column(BigInteger, primary_key=True)
+    created_at = Column(DateTime(timezone=True), server_default=func.now())
+
+
+class RecentWrite(Base):
+    """Last commit per token subject, so every worker keeps its reads on the primary; see app/database.py."""
+    __tablename__ = "recent_writes"
+
+    subject = Column(String(100), primary_key=True)
+    written_at = Column(DateTime(timezone=True), nullable=False)
+
+
+class IdempotencyKey(Base):
+    """
+    A claimed Idempotency-Key and, once its request has finished, the
+    response to replay; see app/idempotency.py.
+    """
+    __tablename__ = "idempotency_keys"
+
+    # Empty for unauthenticated requests (POST /users/).
+    subject = Column(String(100), primary_key=True)
+    path = Column(String(50), primary_key=True)
+    idempotency_key = Column(String(255), primary_key=True)
+    status = Column(String(20), nullable=False, default="in_flight")
+    fingerprint = Column(String(64), nullable=True)
+    response_status = Column(Integer, nullable=True)
+    response_headers = Column(Text, nullable=True)
+    response_body = Column(LargeBinary, nullable=True)
+    body_size = Column(Integer, nullable=False, default=0)
+    # Lease of an in-flight claim, then the time to keep the response until.
+    expires_at = Column(DateTime(timezone=True), nullable=False, index=True)
+    created_at = Column(DateTime(timezone=True), server_default=func.now())
+
+
+class ExportJob(Base):
+    """A report export rendered in the background; see app/exports.py."""
+    __tablename__ = "export_jobs"
+
+    id = Column(String(32), primary_key=True)
+    user_id = Column(Integer, ForeignKey("users.id", ondelete="CASCADE"), nullable=False, index=True)
+    report = Column(String(50), nullable=False)
+    format = Column(String(10), nullable=False)
+    parameters = Column(Text, nullable=True)
+    status = Column(String(20), nullable=False, default="queued")
+    rows_written = Column(Integer, nullable=False, default=0)
+    total_rows = Column(Integer, nullable=True)
+    file_key = Column(String(255), nullable=True)
+    error = Column(Text, nullable=True)
+    created_at = Column(DateTime(timezone=True), server_default=func.now())
+    started_at = Column(DateTime(timezone=True), nullable=True)
+    finished_at = Column(DateTime(timezone=True), nullable=True)
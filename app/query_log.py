@@ -0,0 +1,141 @@
+"""
+Slow-query log.
+
+Statements slower than SLOW_QUERY_THRESHOLD_MS are logged with redacted
+bind parameters and the route and user of the request that ran them. A
+SLOW_QUERY_EXPLAIN_SAMPLE_RATE fraction of slow SELECTs is re-run under
+EXPLAIN (ANALYZE, BUFFERS) on Postgres, or EXPLAIN QUERY PLAN on SQLite, to
+capture the plan. The SLOW_QUERY_LOG_SIZE slowest queries are kept in memory
+and served by /admin/slow_queries.
+"""
+from datetime import datetime, timezone
+from itertools import count
+from threading import Lock
+from time import perf_counter
+import heapq
+import logging
+import os
+import random
+
+from dotenv import load_dotenv
+from sqlalchemy import event
+
+from app.metrics import request_stats, route_template
+
+load_dotenv()
+
+SLOW_QUERY_THRESHOLD_MS = float(os.getenv("SLOW_QUERY_THRESHOLD_MS", "200"))
+SLOW_QUERY_EXPLAIN_SAMPLE_RATE = float(os.getenv("SLOW_QUERY_EXPLAIN_SAMPLE_RATE", "0.1"))
+SLOW_QUERY_LOG_SIZE = int(os.getenv("SLOW_QUERY_LOG_SIZE", "50"))
+
+logger = logging.getLogger("app.slow_queries")
+
+_worst = []
+_sequence = count()
+_lock = Lock()
+
+
+def redact(value):
+    """Keep numbers, dates and NULLs, which help reading a plan; hide anything textual."""
+    if isinstance(value, dict):
+        return {key: redact(item) for key, item in value.items()}
+    if isinstance(value, (list, tuple)):
+        return [redact(item) for item in value]
+    if isinstance(value, str):
+        return f"<str len={len(value)}>"
+    if isinstance(value, (bytes, bytearray, memoryview)):
+        return f"<bytes len={len(value)}>"
+    if value is None or isinstance(value, (bool, int, float, datetime)):
+        return value.isoformat() if isinstance(value, datetime) else value
+    return f"<{type(value).__name__}>"
+
+
+def explain(conn, cursor, statement, parameters):
+    if conn.dialect.name == "postgresql":
+        prefix = "EXPLAIN (ANALYZE, BUFFERS) "
+    elif conn.dialect.name == "sqlite":
+        prefix = "EXPLAIN QUERY PLAN "
+    else:
+        return None
+
+    # A failing statement would abort the request's Postgres transaction, so
+    # the EXPLAIN runs inside a savepoint that is rolled back on error.
+    use_savepoint = conn.dialect.name == "postgresql"
+    explain_cursor = cursor.connection.cursor()
+    try:
+        if use_savepoint:
+            explain_cursor.execute("SAVEPOINT slow_query_explain")
+        explain_cursor.execute(prefix + statement, parameters)
+        plan = "\n".join(" ".join(str(column) for column in row) for row in explain_cursor.fetchall())
+        if use_savepoint:
+            explain_cursor.execute("RELEASE SAVEPOINT slow_query_explain")
+        return plan
+    except Exception as exc:
+        logger.debug("Could not explain slow query: %s", exc)
+        if use_savepoint:
+            explain_cursor.execute("ROLLBACK TO SAVEPOINT slow_query_explain")
+        return None
+    finally:
+        explain_cursor.close()
+
+
+def record(entry: dict):
+    with _lock:
+        item = (entry["duration_ms"], next(_sequence), entry)
+        if len(_worst) < SLOW_QUERY_LOG_SIZE:
+            heapq.heappush(_worst, item)
+        elif item[0] > _worst[0][0]:
+            heapq.heapreplace(_worst, item)
+
+
+def worst_queries():
+    with _lock:
+        return [entry for _, _, entry in sorted(_worst, key=lambda item: item[0], reverse=True)]
+
+
+def clear():
+    with _lock:
+        _worst.clear()
+
+
+def install(engine):
+    @event.listens_for(engine, "before_cursor_execute")
+    def _before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+        conn.info.setdefault("slow_query_start_time", []).append(perf_counter())
+
+    @event.listens_for(engine, "after_cursor_execute")
+    def _after_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+        duration_ms = (perf_counter() - conn.info["slow_query_start_time"].pop()) * 1000
+        if duration_ms < SLOW_QUERY_THRESHOLD_MS:
+            return
+
+        stats = request_stats.get()
+        plan = None
+        # EXPLAIN ANALYZE executes the statement again, so only plain SELECTs are sampled.
+        is_select = statement.lstrip()[:6].upper() == "SELECT"
+        if not executemany and is_select and random.random() < SLOW_QUERY_EXPLAIN_SAMPLE_RATE:
+            plan = explain(conn, cursor, statement, parameters)
+
+        entry = {
+            "statement": statement,
+            "parameters": redact(parameters),
+            "duration_ms": round(duration_ms, 3),
+            "route": route_template(stats.scope) if stats is not None and stats.scope else None,
+            "user_id": stats.user_id if stats is not None else None,
+            "occurred_at": datetime.now(timezone.utc),
+            "plan": plan,
+        }
+        record(entry)
+        logger.warning(
+            "Slow query (%.1f ms) route=%s user=%s: %s params=%s",
+            duration_ms, entry["route"], entry["user_id"], statement, entry["parameters"],
+        )
+        if plan:
+            logger.warning("Plan for slow query:\n%s", plan)
+
+    @event.listens_for(engine, "handle_error")
+    def _handle_error(context):
+        if context.connection is not None:
+            started = context.connection.info.get("slow_query_start_time")
+            if started:
+                started.pop()
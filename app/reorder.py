@@ -0,0 +1,236 @@
+"""
+Reorder suggestions: sales velocity, days of stock cover and reorder points.
+
+Velocity is a product's lifetime sales per day since it was created, with
+products younger than REORDER_MIN_AGE_DAYS treated as that old. From it:
+
+    days_of_cover  = stock / velocity
+    reorder_point  = velocity * (REORDER_LEAD_TIME_DAYS + REORDER_SAFETY_DAYS)
+    order_quantity = velocity * (lead time + safety + REORDER_REVIEW_DAYS) - stock
+
+Products are read in columnar chunks of REORDER_CHUNK_SIZE rows and computed
+with NumPy arrays. Results are cached per tenant in this process, along
+with a fingerprint of the tenant's products (row count, latest created and
+updated times), which indexes answer without reading the products. Every
+product write sets updated_at, so it changes the fingerprint and
+invalidates the cache.
+
+    python -m app.reorder
+
+computes every tenant in one pass ordered by user_id and prints a summary.
+With REORDER_REFRESH_INTERVAL_SECONDS set, the app does the same
+periodically to warm its cache. Only one worker refreshes per interval (see
+app/scheduling.py), so the others fill their caches on first request.
+"""
+from collections import OrderedDict
+from datetime import datetime, timezone
+from threading import Lock
+import asyncio
+import logging
+import os
+import sys
+
+import numpy as np
+from dotenv import load_dotenv
+from sqlalchemy import func, select
+
+from app.database import SessionLocal
+from app.models import Product
+from app.scheduling import claim_period
+
+load_dotenv()
+
+REORDER_LEAD_TIME_DAYS = float(os.getenv("REORDER_LEAD_TIME_DAYS", "7"))
+REORDER_SAFETY_DAYS = float(os.getenv("REORDER_SAFETY_DAYS", "3"))
+REORDER_REVIEW_DAYS = float(os.getenv("REORDER_REVIEW_DAYS", "30"))
+REORDER_MIN_AGE_DAYS = float(os.getenv("REORDER_MIN_AGE_DAYS", "7"))
+REORDER_CHUNK_SIZE = int(os.getenv("REORDER_CHUNK_SIZE", "20000"))
+REORDER_CACHE_SIZE = int(os.getenv("REORDER_CACHE_SIZE", "256"))
+REORDER_REFRESH_INTERVAL_SECONDS = float(os.getenv("REORDER_REFRESH_INTERVAL_SECONDS", "0"))
+
+COLUMNS = (Product.user_id, Product.id, Product.stock, Product.sales, Product.created_at)
+# Answered from the (user_id, created_at) and (user_id, updated_at) indexes
+# and an index-only count, without reading the tenant's rows.
+FINGERPRINT = (
+    func.count(Product.id),
+    func.max(Product.created_at),
+    func.max(Product.updated_at),
+)
+
+logger = logging.getLogger("app.reorder")
+
+_cache = OrderedDict()
+_lock = Lock()
+
+
+class Suggestions:
+    """Per-product results of one tenant, as parallel arrays."""
+
+    def __init__(self, product_ids, stock, velocity, days_of_cover, reorder_point, order_quantity):
+        self.product_ids = product_ids
+        self.stock = stock
+        self.velocity = velocity
+        self.days_of_cover = days_of_cover
+        self.reorder_point = reorder_point
+        self.order_quantity = order_quantity
+
+    @classmethod
+    def concatenate(cls, parts):
+        if not parts:
+            empty = np.array([], dtype=np.float64)
+            return cls(np.array([], dtype=np.int64), empty, empty, empty, empty, empty)
+        return cls(*(np.concatenate([getattr(part, name) for part in parts]) for name in (
+            "product_ids", "stock", "velocity", "days_of_cover", "reorder_point", "order_quantity",
+        )))
+
+    def __len__(self):
+        return len(self.product_ids)
+
+    def needs_reorder(self):
+        """Mask of selling products whose stock is at or below the reorder point."""
+        return (self.velocity > 0) & (self.stock <= self.reorder_point)
+
+
+def compute(product_ids, stock, sales, created_at, now: float) -> Suggestions:
+    """Vectorised computation over one chunk of columns."""
+    age_days = np.maximum((now - created_at) / 86400.0, REORDER_MIN_AGE_DAYS)
+    velocity = sales / age_days
+    with np.errstate(divide="ignore", invalid="ignore"):
+        days_of_cover = np.where(velocity > 0, stock / velocity, np.inf)
+    reorder_point = np.ceil(velocity * (REORDER_LEAD_TIME_DAYS + REORDER_SAFETY_DAYS))
+    target = velocity * (REORDER_LEAD_TIME_DAYS + REORDER_SAFETY_DAYS + REORDER_REVIEW_DAYS)
+    order_quantity = np.maximum(np.ceil(target - stock), 0)
+    return Suggestions(product_ids, stock, velocity, days_of_cover, reorder_point, order_quantity)
+
+
+def to_columns(chunk, now: float):
+    """Transpose a chunk of rows into NumPy columns."""
+    user_ids, product_ids, stock, sales, created_at = zip(*chunk)
+    return (
+        np.array(user_ids, dtype=np.int64),
+        np.array(product_ids, dtype=np.int64),
+        np.array(stock, dtype=np.float64),
+        np.array([value or 0 for value in sales], dtype=np.float64),
+        np.array([epoch(value, now) for value in created_at], dtype=np.float64),
+    )
+
+
+def epoch(value: datetime, default: float) -> float:
+    if value is None:
+        return default
+    # SQLite returns naive datetimes, in UTC.
+    return (value if value.tzinfo else value.replace(tzinfo=timezone.utc)).timestamp()
+
+
+def fingerprint(db, user_id: int):
+    return tuple(str(value) for value in db.execute(select(*FINGERPRINT).where(Product.user_id == user_id)).one())
+
+
+def cache_put(user_id: int, key, suggestions: Suggestions):
+    with _lock:
+        _cache[user_id] = (key, suggestions)
+        _cache.move_to_end(user_id)
+        while len(_cache) > REORDER_CACHE_SIZE:
+            _cache.popitem(last=False)
+
+
+def cache_get(user_id: int, key):
+    with _lock:
+        cached = _cache.get(user_id)
+        if cached is None or cached[0] != key:
+            return None
+        _cache.move_to_end(user_id)
+        return cached[1]
+
+
+def suggestions_for_user(db, user_id: int) -> Suggestions:
+    """Cached suggestions for a tenant, recomputed if its products changed."""
+    # Taken before reading the data, so a write in between can only make the
+    # cache look stale, never hide a change.
+    key = fingerprint(db, user_id)
+    cached = cache_get(user_id, key)
+    if cached is not None:
+        return cached
+
+    now = datetime.now(timezone.utc).timestamp()
+    result = db.execute(
+        select(*COLUMNS).where(Product.user_id == user_id).execution_options(yield_per=REORDER_CHUNK_SIZE)
+    )
+    parts = []
+    for chunk in result.partitions():
+        _, product_ids, stock, sales, created_at = to_columns(chunk, now)
+        parts.append(compute(product_ids, stock, sales, created_at, now))
+    suggestions = Suggestions.concatenate(parts)
+    cache_put(user_id, key, suggestions)
+    return suggestions
+
+
+def compute_all(db):
+    """
+    (user_id, fingerprint, Suggestions) for every tenant, from one pass over products
+    ordered by user_id. Chunks are computed whole and split at tenant
+    boundaries afterwards.
+    """
+    keys = {
+        row[0]: tuple(str(value) for value in row[1:])
+        for row in db.execute(select(Product.user_id, *FINGERPRINT).group_by(Product.user_id))
+    }
+    now = datetime.now(timezone.utc).timestamp()
+    result = db.execute(
+        select(*COLUMNS).order_by(Product.user_id).execution_options(yield_per=REORDER_CHUNK_SIZE)
+    )
+
+    current_user, parts = None, []
+    for chunk in result.partitions():
+        user_ids, product_ids, stock, sales, created_at = to_columns(chunk, now)
+        computed = compute(product_ids, stock, sales, created_at, now)
+        boundaries = np.flatnonzero(np.diff(user_ids)) + 1
+        for start, end in zip(np.r_[0, boundaries], np.r_[boundaries, len(user_ids)]):
+            user_id = int(user_ids[start])
+            if user_id != current_user:
+                if current_user is not None:
+                    yield current_user, keys.get(current_user), Suggestions.concatenate(parts)
+                current_user, parts = user_id, []
+            parts.append(Suggestions(*(
+                getattr(computed, name)[start:end] for name in (
+                    "product_ids", "stock", "velocity", "days_of_cover", "reorder_point", "order_quantity",
+                )
+            )))
+    if current_user is not None:
+        yield current_user, keys.get(current_user), Suggestions.concatenate(parts)
+
+
+def refresh_all() -> dict:
+    """Recompute every tenant and warm the cache; returns products to reorder per tenant."""
+    db = SessionLocal()
+    try:
+        summary = {}
+        for user_id, key, suggestions in compute_all(db):
+            if key is not None:
+                cache_put(user_id, key, suggestions)
+            summary[user_id] = (len(suggestions), int(np.count_nonzero(suggestions.needs_reorder())))
+        return summary
+    finally:
+        db.close()
+
+
+async def run_periodically(interval: float = REORDER_REFRESH_INTERVAL_SECONDS):
+    while True:
+        try:
+            # Only one worker refreshes per interval.
+            if await asyncio.to_thread(claim_period, "reorder_refresh", interval):
+                await asyncio.to_thread(refresh_all)
+        except Exception:
+            logger.exception("Reorder suggestions refresh failed")
+        await asyncio.sleep(interval)
+
+
+def main(argv=None):
+    summary = refresh_all()
+    for user_id, (products, to_reorder) in sorted(summary.items()):
+        print(f"user {user_id}: {to_reorder} of {products} products at or below their reorder point")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,41 @@
+from fastapi import APIRouter, Depends, Query
+from app import query_log, storage_gc
+from app.auth import get_current_admin
+from app.models import User
+from app.schemas import SlowQuery, StorageGcReport
+from typing import List, Optional
+
+router = APIRouter(
+    prefix="/admin",
+    tags=["admin"],
+)
+
+
+@router.get("/slow_queries", response_model=List[SlowQuery])
+def get_slow_queries(
+    current_user: User = Depends(get_current_admin),
+):
+    """
+    The slowest queries seen by this worker, slowest first.
+    """
+    return query_log.worst_queries()
+
+
+@router.delete("/slow_queries", status_code=204)
+def clear_slow_queries(
+    current_user: User = Depends(get_current_admin),
+):
+    query_log.clear()
+    return
+
+
+@router.post("/storage_gc", response_model=StorageGcReport)
+def run_storage_gc(
+    dry_run: bool = Query(False, description="Only report what would be removed"),
+    grace_seconds: Optional[float] = Query(None, ge=0, description="Defaults to STORAGE_GC_GRACE_SECONDS"),
+    current_user: User = Depends(get_current_admin),
+):
+    """
+    Remove images that no product or user refers to anymore.
+    """
+    return storage_gc.collect(grace_seconds, dry_run)
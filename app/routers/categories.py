@@ -1,9 +1,10 @@
 from fastapi import APIRouter, HTTPException, Depends, status
 from sqlalchemy.orm import Session
-from app.database import get_db
+from sqlalchemy import insert
+from app.database import get_db, get_read_db
 from app.models import Category, User
 from app.schemas import CategoryCreate, CategoryResponse
-from app.auth import get_current_user 
+from app.auth import get_current_user, get_current_read_user
 from typing import List
 
 router = APIRouter(
@@ -18,19 +19,20 @@ def create_category(
     db: Session = Depends(get_db),
     current_user: User = Depends(get_current_user), 
 ):
-    new_category = Category(**category.dict(), user_id=current_user.id)
-
-    db.add(new_category)
+    row = db.execute(
+        insert(Category)
+        .values(**category.dict(), user_id=current_user.id)
+        .returning(*Category.__table__.c)
+    ).one()
     db.commit()
-    db.refresh(new_category)
 
-    return new_category
+    return dict(row._mapping)
 
 
 @router.get("/", response_model=List[CategoryResponse])
 def get_categories(
-    db: Session = Depends(get_db),
-    current_user: User = Depends(get_current_user),
+    db: Session = Depends(get_read_db),
+    current_user: User = Depends(get_current_read_user),
 ):
     categories = db.query(Category).filter(Category.user_id == current_user.id).all()
     
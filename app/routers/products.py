@@ -1,26 +1,185 @@
-from fastapi import APIRouter, HTTPException, Depends, Query, Form, UploadFile, File, Request
-from sqlalchemy.orm import Session
-from sqlalchemy import or_
-from app.database import get_db
+from fastapi import APIRouter, HTTPException, Depends, Query, Form, UploadFile, File, Request, Response, Header
+from sqlalchemy.orm import Session, joinedload, selectinload
+from sqlalchemy import and_, case, func, or_, insert, true, update
+from app.database import get_db, get_read_db
 from app.models import Product, User, Category
-from app.schemas import ProductCreate, ProductResponse, ProductPaginatedResponse, ProductUpdateInput
-from app.auth import get_current_user
-from typing import List, Optional
+from app.schemas import ProductCreate, ProductResponse, ProductPaginatedResponse, ProductUpdateInput, ProductNormalizedResponse, ProductNormalizedPaginatedResponse, CategoryResponse, ProductPatch, UploadUrlRequest, UploadUrlResponse, UploadConfirm, ResolveCodesRequest, ResolveCodesResponse, ProductBatchGetRequest, ProductBatchGetResponse, ProductSuggestion, ProductFilters, ProductFacetsResponse, CategoryFacet, PriceFacet, StockFacet
+from app.auth import get_current_user, get_current_read_user
+from typing import List, Optional, Union
+from datetime import datetime, timedelta, timezone
 import os
 from math import ceil
 from dotenv import load_dotenv
 from pydantic import ValidationError
-from app.supabase import SUPABASE_URL, SUPABASE_KEY, create_client
-import uuid
+from app.images import confirm_direct_upload, direct_upload_key, store_image
+from app.supabase import create_upload_url
+from starlette.concurrency import run_in_threadpool
 
 load_dotenv()
-supabase = create_client(SUPABASE_URL, SUPABASE_KEY)
 
 router = APIRouter(
     prefix="/products",
     tags=["products"],
 )
 
+
+def product_response(db: Session, row) -> ProductResponse:
+    """
+    Build a ProductResponse from an INSERT/UPDATE ... RETURNING row instead of
+    refreshing the ORM object; only the category has to be looked up.
+    """
+    values = dict(row._mapping)
+    category = None
+    if values["category_id"] is not None:
+        category = db.query(Category).filter(
+            Category.id == values["category_id"], Category.user_id == values["user_id"]
+        ).first()
+    return ProductResponse(
+        **values,
+        category=CategoryResponse.from_orm(category) if category else None,
+    )
+
+
+def check_category(db: Session, category_id: Optional[int], user_id: int):
+    """404 unless the category is one of the user's; None (no category) is fine."""
+    if category_id is None:
+        return
+    exists = db.query(Category.id).filter(Category.id == category_id, Category.user_id == user_id).first()
+    if not exists:
+        raise HTTPException(status_code=404, detail="Category not found")
+
+
+EPOCH = datetime(1970, 1, 1, tzinfo=timezone.utc)
+
+
+def product_etag(updated_at: Optional[datetime]) -> str:
+    """
+    Version tag of a product: its updated_at in microseconds since the epoch,
+    or 0 if it was never updated.
+    """
+    if updated_at is None:
+        return '"0"'
+    if updated_at.tzinfo is None:
+        updated_at = updated_at.replace(tzinfo=timezone.utc)
+    return f'"{(updated_at - EPOCH) // timedelta(microseconds=1)}"'
+
+
+def version_condition(if_match: str):
+    """SQL condition matching the version in an If-Match header, or None for '*'."""
+    tag = if_match.strip()
+    if tag == "*":
+        return None
+    try:
+        microseconds = int(tag.removeprefix("W/").strip('"'))
+    except ValueError:
+        raise HTTPException(status_code=400, detail="Invalid If-Match header")
+    if microseconds == 0:
+        return Product.updated_at.is_(None)
+    return Product.updated_at == EPOCH + timedelta(microseconds=microseconds)
+
+
+# Upper bounds of the price facet buckets; the last bucket is open-ended.
+PRICE_BUCKETS = (10, 25, 50, 100, 250, 500)
+# Stock at or below this (and above zero) counts as "low" in the stock
+# facet, the same level as low_stock_products on the dashboard.
+LOW_STOCK_LEVEL = 10
+STOCK_BANDS = ("out_of_stock", "low", "in_stock")
+FACETS = ("category", "price", "stock")
+
+
+def filter_conditions(filters: ProductFilters) -> dict:
+    """
+    SQL conditions of the filters, keyed by the facet they narrow
+    ("category", "price" or "stock"), or None for those no facet counts.
+    """
+    conditions = {None: [], "category": [], "price": [], "stock": []}
+
+    if filters.category:
+        # A plain column comparison; Product.category.has() compiled to a
+        # correlated EXISTS on categories.
+        conditions["category"].append(Product.category_id.in_(filters.category))
+    if filters.low_stock_threshold is not None:
+        conditions["stock"].append(Product.stock < filters.low_stock_threshold)
+    if filters.search:
+        conditions[None].append(
+            or_(
+                Product.name.ilike(f"%{filters.search}%"),
+                Product.description.ilike(f"%{filters.search}%")
+            )
+        )
+
+    ranges = (
+        ("price", Product.price, filters.price_min, filters.price_max),
+        ("stock", Product.stock, filters.stock_min, filters.stock_max),
+        (None, Product.sales, filters.sales_min, filters.sales_max),
+    )
+    for facet, column, minimum, maximum in ranges:
+        if minimum is not None:
+            conditions[facet].append(column >= minimum)
+        if maximum is not None:
+            conditions[facet].append(column <= maximum)
+    return conditions
+
+
+def filter_products(query, filters: ProductFilters, user_id: int):
+    query = query.filter(Product.user_id == user_id)
+    for conditions in filter_conditions(filters).values():
+        if conditions:
+            query = query.filter(*conditions)
+    return query
+
+
+SORT_COLUMNS = {
+    "name": Product.name,
+    "price": Product.price,
+    "stock": Product.stock,
+    "sales": Product.sales,
+    "code": Product.code,
+    "description": Product.description,
+    "category": Category.name,
+}
+
+
+def parse_order_by(order_by: Optional[str], order: Optional[str]):
+    """[(key, descending), ...] from e.g. "category,-sales,name"."""
+    sort_keys = []
+    for key in (order_by or "").split(","):
+        key = key.strip()
+        if not key:
+            continue
+        descending = order == "desc"
+        if key[0] in "+-":
+            descending = key[0] == "-"
+            key = key[1:]
+        if key not in SORT_COLUMNS:
+            raise HTTPException(status_code=400, detail=f"Invalid sort key: {key}")
+        if key not in (seen[0] for seen in sort_keys):
+            sort_keys.append((key, descending))
+    return sort_keys
+
+
+def order_clauses(sort_keys):
+    """
+    ORDER BY for the sort keys, always ending with Product.id so pages are
+    stable. The id follows the direction of the last key, which lets
+    Postgres walk the (user_id, <key>, id) indexes from migration 0004 in
+    one direction.
+    """
+    clauses = [
+        SORT_COLUMNS[key].desc() if descending else SORT_COLUMNS[key].asc()
+        for key, descending in sort_keys
+    ]
+    last_descending = sort_keys[-1][1] if sort_keys else False
+    clauses.append(Product.id.desc() if last_descending else Product.id.asc())
+    return clauses
+
+
+def like_prefix(value: str) -> str:
+    """Lower-cased LIKE pattern matching values that start with value."""
+    escaped = value.lower().replace("\\", "\\\\").replace("%", "\\%").replace("_", "\\_")
+    return f"{escaped}%"
+
+
 @router.post("/", response_model=ProductResponse)
 def create_product(
     name: str = Form(...),
@@ -35,24 +194,13 @@ def create_product(
     current_user: User = Depends(get_current_user)
 ):
     category_id_int = int(category_id) if category_id else None
+    check_category(db, category_id_int, current_user.id)
     image_url = None
 
     if image:
-        bucket_name = "product_images"
-        
-        unique_id = uuid.uuid4().hex
-        file_extension = image.filename.split(".")[-1]  
-        file_name = f"{current_user.id}_{unique_id}.{file_extension}"
-        
-        file_content = image.file.read()
-
-        response = supabase.storage.from_(bucket_name).upload(file_name, file_content)
-        if not response.path:  
-            raise HTTPException(status_code=500, detail=f"Failed to upload image: {response.error.message}")
-        
-        image_url = f"{SUPABASE_URL}/storage/v1/object/public/{bucket_name}/{file_name}"
-
-    new_product = Product(
+        image_url = store_image(db, "product_images", image)
+
+    values = dict(
         name=name,
         description=description,
         price=price,
@@ -65,58 +213,48 @@ def create_product(
     )
 
     try:
-        ProductResponse.from_orm(new_product)
+        ProductResponse.from_orm(Product(**values))
     except ValidationError as e:
         raise e
     
-    db.add(new_product)
+    row = db.execute(insert(Product).values(**values).returning(*Product.__table__.c)).one()
+    response = product_response(db, row)
     db.commit()
-    db.refresh(new_product)
     
-    return new_product
+    return response
 
 
-@router.get("/", response_model=ProductPaginatedResponse)
+@router.get("/", response_model=Union[ProductPaginatedResponse, ProductNormalizedPaginatedResponse])
 def get_products(
     request: Request,
-    category: Optional[str] = None,
-    low_stock_threshold: Optional[int] = Query(None, description="Filter products with stock below this threshold"),
-    search: Optional[str] = Query(None, description="Search products by name or description"),
-    order_by: Optional[str] = Query(None, description="Order by a specific field: name, price, stock, or category"),
-    order: Optional[str] = Query("asc", description="Sort order: asc or desc"),
+    filters: ProductFilters = Depends(),
+    order_by: Optional[str] = Query(
+        None,
+        description="Comma-separated sort keys: name, price, stock, sales, code, description or category "
+        "(category name). Prefix a key with - to sort it descending, e.g. category,-sales,name",
+    ),
+    order: Optional[str] = Query("asc", description="Sort order for keys without a prefix: asc or desc"),
     page: int = Query(1, ge=1, description="Page number, starting from 1"),
     page_size: int = Query(10, ge=1, le=100, description="Number of items per page (max 100)"),
-    db: Session = Depends(get_db),
-    current_user: User = Depends(get_current_user)
+    shape: str = Query("embedded", pattern="^(embedded|normalized)$", description="Response shape: embedded (category nested in every product) or normalized (categories returned once, keyed by id)"),
+    db: Session = Depends(get_read_db),
+    current_user: User = Depends(get_current_read_user)
 ):
-    query = db.query(Product).filter(Product.user_id == current_user.id)
-    
-    if category:
-        query = query.filter(Product.category.has(id=category))
-    
-    if low_stock_threshold is not None:
-        query = query.filter(Product.stock < low_stock_threshold)
+    query = filter_products(db.query(Product), filters, current_user.id)
     
-    if search:
-        query = query.filter(
-            or_(
-                Product.name.ilike(f"%{search}%"),
-                Product.description.ilike(f"%{search}%")
-            )
-        )
-    
-    if order_by in ["name", "price", "stock", "category", "sales", "code", 'description']:
-        order_function = Product.__table__.columns.get(order_by)
-        if order_function is not None:
-            if order == "desc":
-                query = query.order_by(order_function.desc())
-            else:
-                query = query.order_by(order_function.asc())
+    sort_keys = parse_order_by(order_by, order)
 
     total_items = query.count()
+
+    if any(key == "category" for key, _ in sort_keys):
+        query = query.outerjoin(Category, Category.id == Product.category_id)
+    query = query.order_by(*order_clauses(sort_keys))
     total_pages = ceil(total_items / page_size)
     offset = (page - 1) * page_size
     paginated_query = query.offset(offset).limit(page_size)
+
+    if shape != "normalized":
+        paginated_query = paginated_query.options(selectinload(Product.category))
     
     products = paginated_query.all()
 
@@ -125,6 +263,22 @@ def get_products(
             normalized_path = product.image.replace("\\", "/")
             product.image = f"{normalized_path.split('uploads/')[-1]}"
 
+    if shape == "normalized":
+        category_ids = {product.category_id for product in products if product.category_id is not None}
+        categories = (
+            db.query(Category).filter(Category.id.in_(category_ids), Category.user_id == current_user.id).all()
+            if category_ids
+            else []
+        )
+        return ProductNormalizedPaginatedResponse(
+            page=page,
+            page_size=page_size,
+            total_pages=total_pages,
+            total_items=total_items,
+            products=[ProductNormalizedResponse.from_orm(product) for product in products],
+            categories={category.id: CategoryResponse.from_orm(category) for category in categories},
+        )
+
     serialized_products = [ProductResponse.from_orm(product) for product in products]
 
     return ProductPaginatedResponse(
@@ -136,71 +290,310 @@ def get_products(
     )
 
 
+@router.get("/facets", response_model=ProductFacetsResponse)
+def get_product_facets(
+    filters: ProductFilters = Depends(),
+    db: Session = Depends(get_read_db),
+    current_user: User = Depends(get_current_read_user)
+):
+    """
+    Counts per category, price bucket and stock band, from a single GROUP BY
+    query. Each facet counts the products matching every filter except its
+    own (e.g. the category counts ignore the selected categories), so
+    unselected values show how many products selecting them would add.
+    total_items matches every filter.
+    """
+    price_bucket = case(
+        *((Product.price < bound, index) for index, bound in enumerate(PRICE_BUCKETS)),
+        else_=len(PRICE_BUCKETS),
+    )
+    stock_band = case(
+        (Product.stock <= 0, 0),
+        (Product.stock <= LOW_STOCK_LEVEL, 1),
+        else_=2,
+    )
+    conditions = filter_conditions(filters)
+    # Whether a product passes each facet's own filters, so that one query
+    # can count every facet without them.
+    matches = [
+        case((and_(true(), *conditions[facet]), 1), else_=0).label(f"matches_{facet}")
+        for facet in FACETS
+    ]
+    # The CASE expressions are computed in a subquery and grouped by name:
+    # repeated in GROUP BY they would get their own bind parameters, and
+    # Postgres wouldn't recognise them as the selected expressions.
+    matching = (
+        db.query(
+            Product.category_id,
+            price_bucket.label("price_bucket"),
+            stock_band.label("stock_band"),
+            *matches,
+        )
+        .filter(Product.user_id == current_user.id, *conditions[None])
+        .subquery()
+    )
+    group = (
+        matching.c.category_id,
+        Category.name,
+        matching.c.price_bucket,
+        matching.c.stock_band,
+        *(matching.c[f"matches_{facet}"] for facet in FACETS),
+    )
+    rows = (
+        db.query(*group, func.count())
+        .select_from(matching)
+        .outerjoin(Category, Category.id == matching.c.category_id)
+        .group_by(*group)
+        .all()
+    )
+
+    categories = {}
+    price_counts = [0] * (len(PRICE_BUCKETS) + 1)
+    stock_counts = [0] * len(STOCK_BANDS)
+    total_items = 0
+    for category_id, category_name, bucket, band, in_category, in_price, in_stock, count in rows:
+        if in_price and in_stock:
+            if category_id in categories:
+                categories[category_id].count += count
+            else:
+                categories[category_id] = CategoryFacet(id=category_id, name=category_name, count=count)
+        if in_category and in_stock:
+            price_counts[bucket] += count
+        if in_category and in_price:
+            stock_counts[band] += count
+        if in_category and in_price and in_stock:
+            total_items += count
+
+    bounds = (0,) + PRICE_BUCKETS + (None,)
+    return ProductFacetsResponse(
+        total_items=total_items,
+        categories=sorted(categories.values(), key=lambda facet: -facet.count),
+        price=[
+            PriceFacet(min=bounds[index], max=bounds[index + 1], count=count)
+            for index, count in enumerate(price_counts)
+        ],
+        stock=[StockFacet(band=band, count=count) for band, count in zip(STOCK_BANDS, stock_counts)],
+    )
+
+@router.get("/suggest", response_model=List[ProductSuggestion])
+def suggest_products(
+    q: str = Query(..., min_length=1, max_length=100, description="Prefix of a product name or code"),
+    limit: int = Query(10, ge=1, le=20, description="Number of suggestions (max 20)"),
+    db: Session = Depends(get_read_db),
+    current_user: User = Depends(get_current_read_user)
+):
+    """
+    Autocomplete: the best-selling products whose name or code starts with
+    q (case-insensitive). Uses the prefix indexes from migration 0003.
+    """
+    prefix = like_prefix(q)
+    rows = (
+        db.query(Product.id, Product.name, Product.code)
+        .filter(
+            Product.user_id == current_user.id,
+            or_(
+                func.lower(Product.name).like(prefix, escape="\\"),
+                func.lower(Product.code).like(prefix, escape="\\"),
+            ),
+        )
+        .order_by(Product.sales.desc(), Product.id)
+        .limit(limit)
+        .all()
+    )
+    return [ProductSuggestion(id=row.id, name=row.name, code=row.code) for row in rows]
+
+@router.get("/by-code/{code}", response_model=ProductResponse)
+def get_product_by_code(
+    code: str,
+    db: Session = Depends(get_read_db),
+    current_user: User = Depends(get_current_read_user)
+):
+    """
+    Look up a product by its code (SKU or barcode). If codes aren't unique,
+    the oldest product with the code is returned.
+    """
+    product = (
+        db.query(Product)
+        .options(joinedload(Product.category))
+        .filter(Product.user_id == current_user.id, Product.code == code)
+        .order_by(Product.id)
+        .first()
+    )
+    if not product:
+        raise HTTPException(status_code=404, detail="Product not found")
+    return product
+
+@router.post("/resolve-codes", response_model=ResolveCodesResponse)
+def resolve_codes(
+    body: ResolveCodesRequest,
+    db: Session = Depends(get_read_db),
+    current_user: User = Depends(get_current_read_user)
+):
+    """
+    Resolve a batch of scanned codes in one query. Codes without a product
+    are returned in missing.
+    """
+    codes = list(dict.fromkeys(body.codes))
+    products = (
+        db.query(Product)
+        .options(joinedload(Product.category))
+        .filter(Product.user_id == current_user.id, Product.code.in_(codes))
+        .order_by(Product.id.desc())
+        .all()
+    )
+    # Ordered newest first so the oldest product wins, as in get_product_by_code.
+    found = {product.code: product for product in products}
+    return ResolveCodesResponse(
+        products={code: ProductResponse.from_orm(found[code]) for code in codes if code in found},
+        missing=[code for code in codes if code not in found],
+    )
+
+@router.post("/batch-get", response_model=ProductBatchGetResponse)
+def batch_get_products(
+    body: ProductBatchGetRequest,
+    db: Session = Depends(get_read_db),
+    current_user: User = Depends(get_current_read_user)
+):
+    """
+    Fetch up to 500 products by id in one query, in the order requested.
+    Ids that don't exist or belong to another user are returned in missing.
+    """
+    ids = list(dict.fromkeys(body.ids))
+    products = (
+        db.query(Product)
+        .options(joinedload(Product.category))
+        .filter(Product.user_id == current_user.id, Product.id.in_(ids))
+        .all()
+    )
+    found = {product.id: product for product in products}
+    return ProductBatchGetResponse(
+        products=[ProductResponse.from_orm(found[product_id]) for product_id in ids if product_id in found],
+        missing=[product_id for product_id in ids if product_id not in found],
+    )
+
 @router.get("/{product_id}", response_model=ProductResponse)
 def get_product(
     product_id: int,
-    db: Session = Depends(get_db),
-    current_user: User = Depends(get_current_user)
+    response: Response,
+    db: Session = Depends(get_read_db),
+    current_user: User = Depends(get_current_read_user)
 ):
     product = db.query(Product).filter(Product.id == product_id, Product.user_id == current_user.id).first()
     if not product:
         raise HTTPException(status_code=404, detail="Product not found")
+    response.headers["ETag"] = product_etag(product.updated_at)
     return product
 
 @router.put("/{product_id}", response_model=ProductResponse)
 async def update_product(
     request: Request,
     product_id: int,
+    response: Response,
     product: ProductUpdateInput = Depends(),
     db: Session = Depends(get_db),
     current_user: User = Depends(get_current_user),
 ):
-    db_product = db.query(Product).filter(
-        Product.id == product_id, Product.user_id == current_user.id
-    ).first()
-    if not db_product:
-        raise HTTPException(status_code=404, detail="Product not found")
-    
+    values = {}
+    check_category(db, product.category_id, current_user.id)
+
     if product.image:
-        bucket_name = "product_images"
-        
-        unique_id = uuid.uuid4().hex
-        file_extension = product.image.filename.split(".")[-1] 
-        file_name = f"{product_id}_{unique_id}.{file_extension}"
-        
-        file_content = await product.image.read()
-        
-        response = supabase.storage.from_(bucket_name).upload(file_name, file_content)
-        if not response.path:  
-            raise HTTPException(status_code=500, detail=f"Failed to upload image: {response.error.message}")
-        
-        image_url = f"{SUPABASE_URL}/storage/v1/object/public/{bucket_name}/{file_name}"
-        db_product.image = image_url
+        # Don't upload an image for a product that doesn't exist.
+        exists = db.query(Product.id).filter(
+            Product.id == product_id, Product.user_id == current_user.id
+        ).first()
+        if not exists:
+            raise HTTPException(status_code=404, detail="Product not found")
+
+        values["image"] = await run_in_threadpool(store_image, db, "product_images", product.image)
 
     if product.name:
-        db_product.name = product.name
+        values["name"] = product.name
     if product.description:
-        db_product.description = product.description
+        values["description"] = product.description
     if product.price:
-        db_product.price = product.price
+        values["price"] = product.price
     if product.stock:
-        db_product.stock = product.stock
+        values["stock"] = product.stock
     if product.sales:
-        db_product.sales = product.sales
+        values["sales"] = product.sales
     if product.code:
-        db_product.code = product.code
+        values["code"] = product.code
     if product.category_id:
-        db_product.category_id = product.category_id
+        values["category_id"] = product.category_id
+    # Set from Python so the stored value round-trips exactly into ETags.
+    values["updated_at"] = datetime.now(timezone.utc)
+
+    row = db.execute(
+        update(Product)
+        .where(Product.id == product_id, Product.user_id == current_user.id)
+        .values(**values)
+        .returning(*Product.__table__.c)
+    ).first()
+    if not row:
+        raise HTTPException(status_code=404, detail="Product not found")
     
     try:
-        ProductResponse.from_orm(db_product)  
+        result = product_response(db, row)
     except ValidationError as e:
+        db.rollback()
         raise 
 
     db.commit()
-    db.refresh(db_product)
 
-    return db_product
+    response.headers["ETag"] = product_etag(row.updated_at)
+    return result
+
+@router.patch("/{product_id}", response_model=ProductResponse)
+def patch_product(
+    product_id: int,
+    patch: ProductPatch,
+    response: Response,
+    if_match: Optional[str] = Header(None, description="ETag of the version being edited; '*' matches any"),
+    db: Session = Depends(get_db),
+    current_user: User = Depends(get_current_user),
+):
+    """
+    Update only the supplied fields with a single UPDATE ... RETURNING. With an
+    If-Match header (or updated_at in the body) the update only applies if
+    the product hasn't changed since that version, otherwise 412.
+    """
+    values = patch.dict(exclude_unset=True)
+    expected_updated_at = values.pop("updated_at", None)
+    if not values:
+        raise HTTPException(status_code=400, detail="No fields to update")
+    check_category(db, values.get("category_id"), current_user.id)
+    values["updated_at"] = datetime.now(timezone.utc)
+
+    conditions = [Product.id == product_id, Product.user_id == current_user.id]
+    if if_match is not None:
+        condition = version_condition(if_match)
+        if condition is not None:
+            conditions.append(condition)
+    elif expected_updated_at is not None:
+        conditions.append(Product.updated_at == expected_updated_at)
+
+    row = db.execute(
+        update(Product).where(*conditions).values(**values).returning(*Product.__table__.c)
+    ).first()
+
+    if not row:
+        exists = db.query(Product.id).filter(
+            Product.id == product_id, Product.user_id == current_user.id
+        ).first()
+        if not exists:
+            raise HTTPException(status_code=404, detail="Product not found")
+        raise HTTPException(status_code=412, detail="Product was modified by someone else")
+
+    try:
+        result = product_response(db, row)
+    except ValidationError:
+        db.rollback()
+        raise
+
+    db.commit()
+
+    response.headers["ETag"] = product_etag(row.updated_at)
+    return result
 
 @router.delete("/{product_id}", status_code=204)
 def delete_product(
@@ -214,3 +607,43 @@ def delete_product(
     db.delete(product)
     db.commit()
     return
+
+@router.post("/{product_id}/image/upload_url", response_model=UploadUrlResponse)
+def create_image_upload_url(
+    product_id: int,
+    body: UploadUrlRequest,
+    db: Session = Depends(get_db),
+    current_user: User = Depends(get_current_user),
+):
+    """
+    Signed URL to upload a product image straight to storage. PUT the file
+    to upload_url, then attach it with POST /products/{product_id}/image/confirm.
+    """
+    exists = db.query(Product.id).filter(Product.id == product_id, Product.user_id == current_user.id).first()
+    if not exists:
+        raise HTTPException(status_code=404, detail="Product not found")
+    return create_upload_url("product_images", direct_upload_key(current_user.id, body.filename))
+
+@router.post("/{product_id}/image/confirm", response_model=ProductResponse)
+def confirm_image_upload(
+    product_id: int,
+    body: UploadConfirm,
+    response: Response,
+    db: Session = Depends(get_db),
+    current_user: User = Depends(get_current_user),
+):
+    image_url = confirm_direct_upload(current_user.id, "product_images", body.key)
+    row = db.execute(
+        update(Product)
+        .where(Product.id == product_id, Product.user_id == current_user.id)
+        .values(image=image_url, updated_at=datetime.now(timezone.utc))
+        .returning(*Product.__table__.c)
+    ).first()
+    if not row:
+        raise HTTPException(status_code=404, detail="Product not found")
+
+    result = product_response(db, row)
+    db.commit()
+
+    response.headers["ETag"] = product_etag(row.updated_at)
+    return result
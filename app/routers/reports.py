@@ -1,11 +1,18 @@
-from fastapi import APIRouter, Depends, Query
+from fastapi import APIRouter, Depends, HTTPException, Query, Request
+from fastapi.responses import StreamingResponse
 from sqlalchemy.orm import Session
-from sqlalchemy import func
+from sqlalchemy import case, func, select
 from .. import schemas, models, auth
-from app.database import get_db
+from app.database import get_db, get_read_db, open_read_session
 from datetime import datetime, date, time, timedelta
 from typing import List, Optional
-from app.models import Product
+import json
+from app.models import InventorySnapshot, InventorySnapshotRun, Product
+from app.snapshots import latest_snapshots
+from app import exports, reorder
+from app.supabase import download_url
+import uuid
+import numpy as np
 
 
 router = APIRouter(
@@ -21,8 +28,8 @@ from datetime import datetime, date, time
 def get_dashboard_metrics(
     start_date: Optional[date] = None,
     end_date: Optional[date] = None,
-    db: Session = Depends(get_db),
-    current_user: models.User = Depends(auth.get_current_user),
+    db: Session = Depends(get_read_db),
+    current_user: models.User = Depends(auth.get_current_read_user),
 ):
     """
     Fetch metrics for the dashboard, including sales summary.
@@ -60,8 +67,8 @@ def get_dashboard_metrics(
 def products_by_category(
     start_date: Optional[date] = None,
     end_date: Optional[date] = None,
-    db: Session = Depends(get_db),
-    current_user: models.User = Depends(auth.get_current_user),
+    db: Session = Depends(get_read_db),
+    current_user: models.User = Depends(auth.get_current_read_user),
 ):
     """
     Get a breakdown of the number of products by category within a date range.
@@ -90,8 +97,8 @@ def most_sold_products(
     start_date: Optional[date] = None,
     end_date: Optional[date] = None,
     limit: int = Query(10, description="Number of top products to return"),
-    db: Session = Depends(get_db),
-    current_user: models.User = Depends(auth.get_current_user),
+    db: Session = Depends(get_read_db),
+    current_user: models.User = Depends(auth.get_current_read_user),
 ):
     """
     Get a list of the most sold products within a date range.
@@ -128,8 +135,8 @@ def most_sold_categories(
     start_date: Optional[date] = None,
     end_date: Optional[date] = None,
     limit: int = Query(10, description="Number of top categories to return"),
-    db: Session = Depends(get_db),
-    current_user: models.User = Depends(auth.get_current_user),
+    db: Session = Depends(get_read_db),
+    current_user: models.User = Depends(auth.get_current_read_user),
 ):
     """
     Get a list of the most sold categories within a date range.
@@ -164,8 +171,8 @@ def most_sold_categories(
 def sales_over_time(
     start_date: str = None,
     end_date: str = None, 
-    db: Session = Depends(get_db),
-    current_user: models.User = Depends(auth.get_current_user),
+    db: Session = Depends(get_read_db),
+    current_user: models.User = Depends(auth.get_current_read_user),
     ):
     if not start_date:
         start_date = (datetime.utcnow() - timedelta(days=30)).isoformat()
@@ -188,4 +195,327 @@ def sales_over_time(
         func.date(Product.created_at)
     ).all()
     
-    return [{"date": record.date, "total_sales": record.total_sales} for record in data]
\ No newline at end of file
+    return [{"date": record.date, "total_sales": record.total_sales} for record in data]
+
+
+@router.get("/stock_value_over_time", response_model=List[schemas.StockValuePoint])
+def stock_value_over_time(
+    start_date: Optional[date] = Query(None, description="Defaults to a year before end_date"),
+    end_date: Optional[date] = Query(None, description="Defaults to today"),
+    category_id: Optional[int] = Query(None, description="Only this category"),
+    db: Session = Depends(get_read_db),
+    current_user: models.User = Depends(auth.get_current_read_user),
+):
+    """
+    Daily stock value from the inventory snapshots, for the days the
+    snapshot job has covered. Reads only the user's snapshot rows: the
+    latest ones before start_date plus the changes within the range.
+    """
+    end_date = end_date or datetime.utcnow().date()
+    start_date = start_date or end_date - timedelta(days=364)
+    if start_date > end_date:
+        raise HTTPException(status_code=400, detail="start_date must not be after end_date")
+    if (end_date - start_date).days > 3 * 366:
+        raise HTTPException(status_code=400, detail="The range can span at most three years")
+
+    first_run, last_run = db.query(
+        func.min(InventorySnapshotRun.snapshot_date), func.max(InventorySnapshotRun.snapshot_date)
+    ).filter(InventorySnapshotRun.snapshot_date <= end_date).one()
+    if first_run is None:
+        return []
+
+    current = {
+        key: figures
+        for key, figures in latest_snapshots(db, start_date, current_user.id).items()
+        if category_id is None or key[1] == category_id
+    }
+    changes = db.query(InventorySnapshot).filter(
+        InventorySnapshot.user_id == current_user.id,
+        InventorySnapshot.snapshot_date >= start_date,
+        InventorySnapshot.snapshot_date <= end_date,
+    )
+    if category_id is not None:
+        changes = changes.filter(InventorySnapshot.category_id == category_id)
+    changes_by_day = {}
+    for change in changes.order_by(InventorySnapshot.snapshot_date):
+        changes_by_day.setdefault(change.snapshot_date, []).append(change)
+
+    points = []
+    day = start_date
+    while day <= min(end_date, last_run):
+        for change in changes_by_day.get(day, []):
+            current[(change.user_id, change.category_id)] = (change.product_count, change.stock_units, change.stock_value)
+        if day >= first_run:
+            points.append(schemas.StockValuePoint(
+                date=day,
+                stock_value=round(sum(figures[2] for figures in current.values()), 2),
+                stock_units=sum(figures[1] for figures in current.values()),
+                product_count=sum(figures[0] for figures in current.values()),
+            ))
+        day += timedelta(days=1)
+    return points
+
+
+def abc_statement(user_id: int, a_cutoff: float, b_cutoff: float):
+    """
+    Products by revenue (sales * price), highest first, with their running
+    share of the total revenue and ABC class, in one pass of window
+    functions. A product belongs to the class its cumulative share starts
+    in, so the product that crosses a cut-off is still counted below it.
+    """
+    revenue = func.coalesce(Product.sales, 0) * Product.price
+    ranked = select(
+        Product.id,
+        Product.name,
+        Product.code,
+        revenue.label("revenue"),
+        func.row_number().over(order_by=(revenue.desc(), Product.id)).label("rank"),
+        func.sum(revenue).over(
+            order_by=(revenue.desc(), Product.id), rows=(None, 0)
+        ).label("cumulative"),
+        func.sum(revenue).over().label("total"),
+    ).where(Product.user_id == user_id).subquery()
+
+    share_before = (ranked.c.cumulative - ranked.c.revenue) / func.nullif(ranked.c.total, 0)
+    return select(
+        ranked.c.rank,
+        ranked.c.id,
+        ranked.c.name,
+        ranked.c.code,
+        ranked.c.revenue,
+        ranked.c.total,
+        func.coalesce(ranked.c.cumulative / func.nullif(ranked.c.total, 0), 0).label("cumulative_share"),
+        case(
+            (func.coalesce(share_before, 0) < a_cutoff, "A"),
+            (func.coalesce(share_before, 0) < b_cutoff, "B"),
+            else_="C",
+        ).label("abc_class"),
+    ).order_by(ranked.c.rank).execution_options(yield_per=2000)
+
+
+def abc_product(row) -> schemas.AbcProduct:
+    return schemas.AbcProduct(
+        rank=row.rank,
+        id=row.id,
+        name=row.name,
+        code=row.code,
+        revenue=round(row.revenue or 0, 2),
+        cumulative_share=round(row.cumulative_share, 6),
+        abc_class=row.abc_class,
+    )
+
+
+@router.get("/abc_analysis", response_model=schemas.AbcAnalysis)
+def abc_analysis(
+    request: Request,
+    a_cutoff: float = Query(0.8, gt=0, lt=1, description="Cumulative revenue share covered by class A"),
+    b_cutoff: float = Query(0.95, gt=0, le=1, description="Cumulative revenue share covered by classes A and B"),
+    format: str = Query("json", pattern="^(json|ndjson)$", description="json, or ndjson to stream one product per line"),
+    token: str = Depends(auth.oauth2_scheme),
+):
+    """
+    ABC (Pareto) classification of the user's products by revenue. With
+    format=ndjson the products are streamed as they are read, without a
+    summary, so memory stays flat for large catalogues.
+    """
+    if b_cutoff <= a_cutoff:
+        raise HTTPException(status_code=400, detail="b_cutoff must be greater than a_cutoff")
+
+    # The session has to outlive the endpoint when streaming, so it is
+    # opened here instead of through get_read_db. The user is loaded through
+    # it too, so the request uses one session (and one replica).
+    db, _ = open_read_session(request)
+    try:
+        current_user = auth.user_from_token(token, db)
+    except Exception:
+        db.close()
+        raise
+    statement = abc_statement(current_user.id, a_cutoff, b_cutoff)
+
+    if format == "ndjson":
+        def stream():
+            try:
+                for row in db.execute(statement):
+                    yield json.dumps(abc_product(row).dict()) + "\n"
+            finally:
+                db.close()
+
+        return StreamingResponse(stream(), media_type="application/x-ndjson")
+
+    try:
+        products = []
+        classes = {name: {"product_count": 0, "revenue": 0.0} for name in ("A", "B", "C")}
+        total_revenue = 0.0
+        for row in db.execute(statement):
+            product = abc_product(row)
+            products.append(product)
+            classes[product.abc_class]["product_count"] += 1
+            classes[product.abc_class]["revenue"] += row.revenue or 0
+            total_revenue = row.total or 0
+    finally:
+        db.close()
+
+    return schemas.AbcAnalysis(
+        total_revenue=round(total_revenue, 2),
+        a_cutoff=a_cutoff,
+        b_cutoff=b_cutoff,
+        classes={
+            name: schemas.AbcClassSummary(
+                product_count=summary["product_count"],
+                revenue=round(summary["revenue"], 2),
+                revenue_share=round(summary["revenue"] / total_revenue, 6) if total_revenue else 0.0,
+            )
+            for name, summary in classes.items()
+        },
+        products=products,
+    )
+
+
+@router.get("/reorder_suggestions", response_model=List[schemas.ReorderSuggestion])
+def reorder_suggestions(
+    include_all: bool = Query(False, description="Include products that don't need reordering yet"),
+    limit: int = Query(100, ge=1, le=1000, description="Maximum number of products to return"),
+    db: Session = Depends(get_read_db),
+    current_user: models.User = Depends(auth.get_current_read_user),
+):
+    """
+    Products ordered by days of stock cover, shortest first, with their
+    reorder point and a suggested order quantity. Computed with NumPy and
+    cached until the user's products change (see app/reorder.py).
+    """
+    suggestions = reorder.suggestions_for_user(db, current_user.id)
+    selected = np.arange(len(suggestions)) if include_all else np.flatnonzero(suggestions.needs_reorder())
+    selected = selected[np.argsort(suggestions.days_of_cover[selected], kind="stable")][:limit]
+
+    product_ids = suggestions.product_ids[selected].tolist()
+    names = {
+        row.id: row
+        for row in db.query(models.Product.id, models.Product.name, models.Product.code).filter(
+            models.Product.user_id == current_user.id, models.Product.id.in_(product_ids)
+        )
+    } if product_ids else {}
+    needs_reorder = suggestions.needs_reorder()
+
+    results = []
+    for index in selected:
+        product = names.get(int(suggestions.product_ids[index]))
+        if product is None:
+            continue
+        days_of_cover = float(suggestions.days_of_cover[index])
+        results.append(schemas.ReorderSuggestion(
+            product_id=product.id,
+            name=product.name,
+            code=product.code,
+            stock=int(suggestions.stock[index]),
+            daily_sales=round(float(suggestions.velocity[index]), 3),
+            days_of_cover=round(days_of_cover, 1) if np.isfinite(days_of_cover) else None,
+            reorder_point=int(suggestions.reorder_point[index]),
+            order_quantity=int(suggestions.order_quantity[index]),
+            needs_reorder=bool(needs_reorder[index]),
+        ))
+    return results
+
+
+def export_job_response(job: models.ExportJob) -> schemas.ExportJobResponse:
+    # Reported without writing: polling is frequent, and the row is updated
+    # by expire_stale_jobs on the user's next export.
+    if exports.is_stale(job):
+        return schemas.ExportJobResponse(
+            id=job.id,
+            report=job.report,
+            format=job.format,
+            status="failed",
+            rows_written=job.rows_written or 0,
+            total_rows=job.total_rows,
+            progress=None,
+            download_url=None,
+            error=exports.STALE_JOB_ERROR,
+            created_at=job.created_at,
+            finished_at=None,
+        )
+    if job.status == "done":
+        progress = 1.0
+    elif job.total_rows:
+        progress = round(job.rows_written / job.total_rows, 4)
+    else:
+        progress = None
+    return schemas.ExportJobResponse(
+        id=job.id,
+        report=job.report,
+        format=job.format,
+        status=job.status,
+        rows_written=job.rows_written or 0,
+        total_rows=job.total_rows,
+        progress=progress,
+        download_url=(
+            download_url(exports.EXPORT_BUCKET, job.file_key, exports.EXPORT_URL_EXPIRE_SECONDS)
+            if job.status == "done" else None
+        ),
+        error=job.error,
+        created_at=job.created_at,
+        finished_at=job.finished_at,
+    )
+
+
+@router.post("/exports", response_model=schemas.ExportJobResponse, status_code=202)
+def create_export(
+    body: schemas.ExportRequest,
+    db: Session = Depends(get_db),
+    current_user: models.User = Depends(auth.get_current_user),
+):
+    """
+    Queue a report export. Poll GET /reports/exports/{id} until its status
+    is done, then download the file from download_url.
+    """
+    if body.format not in exports.available_formats():
+        raise HTTPException(status_code=400, detail=f"{body.format} exports are not available on this server")
+
+    exports.expire_stale_jobs(db, current_user.id)
+    active = db.query(func.count(models.ExportJob.id)).filter(
+        models.ExportJob.user_id == current_user.id,
+        models.ExportJob.status.in_(("queued", "running")),
+    ).scalar()
+    if active >= exports.EXPORT_MAX_ACTIVE_PER_USER:
+        raise HTTPException(status_code=429, detail="Too many exports in progress")
+
+    parameters = {
+        key: value.isoformat()
+        for key, value in (("start_date", body.start_date), ("end_date", body.end_date))
+        if value is not None
+    }
+    job = models.ExportJob(
+        id=uuid.uuid4().hex,
+        user_id=current_user.id,
+        report=body.report,
+        format=body.format,
+        parameters=json.dumps(parameters),
+        status="queued",
+        rows_written=0,
+    )
+    db.add(job)
+    db.commit()
+
+    try:
+        exports.enqueue(job.id)
+    except exports.QueueFull:
+        db.delete(job)
+        db.commit()
+        raise HTTPException(status_code=503, detail="The export queue is full", headers={"Retry-After": "30"})
+
+    db.refresh(job)
+    return export_job_response(job)
+
+
+@router.get("/exports/{job_id}", response_model=schemas.ExportJobResponse)
+def get_export(
+    job_id: str,
+    db: Session = Depends(get_db),
+    current_user: models.User = Depends(auth.get_current_user),
+):
+    # Read from the primary: a lagging replica would report stale progress.
+    job = db.query(models.ExportJob).filter(
+        models.ExportJob.id == job_id, models.ExportJob.user_id == current_user.id
+    ).first()
+    if not job:
+        raise HTTPException(status_code=404, detail="Export not found")
+    return export_job_response(job)
@@ -0,0 +1,32 @@
+from fastapi import APIRouter, HTTPException, Query, Request
+from app.supabase import supabase
+import os
+
+# Stand-in for Supabase's signed upload endpoint when STORAGE_BACKEND=local,
+# so the direct upload flow can run without a storage service.
+router = APIRouter(
+    prefix="/storage",
+    tags=["storage"],
+    include_in_schema=False,
+)
+
+
+@router.put("/upload/{bucket_name}/{file_name}")
+async def upload_to_signed_url(
+    bucket_name: str,
+    file_name: str,
+    request: Request,
+    token: str = Query(...),
+):
+    bucket = supabase.storage.from_(bucket_name)
+    if not bucket.verify_upload_token(file_name, token):
+        raise HTTPException(status_code=403, detail="Invalid or expired upload token")
+
+    full_path = bucket._path(file_name)
+    os.makedirs(os.path.dirname(full_path), exist_ok=True)
+    partial_path = f"{full_path}.part"
+    with open(partial_path, "wb") as f:
+        async for chunk in request.stream():
+            f.write(chunk)
+    os.replace(partial_path, full_path)
+    return {"Key": f"{bucket_name}/{file_name}"}
@@ -1,17 +1,18 @@
 from fastapi import APIRouter, Depends, HTTPException, status, File, UploadFile, Form
 from sqlalchemy.orm import Session
+from sqlalchemy import insert, update
 from app import schemas, models, database, auth
 from fastapi.security import OAuth2PasswordRequestForm
 from app.database import engine, get_db
 from sqlalchemy.orm import sessionmaker
 import os
 from pydantic import ValidationError
-from app.supabase import create_client, SUPABASE_URL, SUPABASE_KEY
+from app.images import confirm_direct_upload, direct_upload_key, store_image
+from app.supabase import create_upload_url
+from starlette.concurrency import run_in_threadpool
 from dotenv import load_dotenv
-import uuid
 
 load_dotenv()
-supabase = create_client(SUPABASE_URL, SUPABASE_KEY)
 
 SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
 
@@ -42,33 +43,23 @@ async def create_user(
     if db_user:
         raise HTTPException(status_code=400, detail="Email is already registered")
     
-    bucket_name = "profile_images"
-    unique_id = uuid.uuid4().hex
-    file_extension = profile_image.filename.split(".")[-1]
-    file_name = f"{validated_user.email}_{unique_id}.{file_extension}"
-    
-    file_content = await profile_image.read() 
-
-    response = supabase.storage.from_(bucket_name).upload(file_name, file_content)
-    if not response.path:  
-        raise HTTPException(status_code=500, detail=f"Failed to upload profile image: {response.error.message}")
-
-    profile_image_url = f"{SUPABASE_URL}/storage/v1/object/public/{bucket_name}/{file_name}"
+    profile_image_url = await run_in_threadpool(store_image, db, "profile_images", profile_image)
 
     hashed_password = auth.get_password_hash(validated_user.password)
     
-    new_user = models.User(
-        name=validated_user.name,
-        email=validated_user.email,
-        profile_image=profile_image_url,
-        hashed_password=hashed_password
-    )
-
-    db.add(new_user)
+    row = db.execute(
+        insert(models.User)
+        .values(
+            name=validated_user.name,
+            email=validated_user.email,
+            profile_image=profile_image_url,
+            hashed_password=hashed_password
+        )
+        .returning(*models.User.__table__.c)
+    ).one()
     db.commit()
-    db.refresh(new_user)
     
-    return new_user
+    return dict(row._mapping)
     
 @router.post("/token", response_model=schemas.Token)
 def login_for_access_token(
@@ -85,5 +76,38 @@ def login_for_access_token(
     return {"access_token": access_token, "token_type": "bearer"}
 
 @router.get("/me/", response_model=schemas.User)
-def read_users_me(current_user: schemas.User = Depends(auth.get_current_user)):
-    return current_user
\ No newline at end of file
+def read_users_me(current_user: schemas.User = Depends(auth.get_current_read_user)):
+    # Built on a copy: changing current_user would be flushed with the next
+    # commit of a write session.
+    user = schemas.User.from_orm(current_user)
+    if user.profile_image:
+        normalized_path = user.profile_image.replace("\\", "/")
+        user.profile_image = f"{normalized_path.split('uploads/')[-1]}"
+    return user
+
+@router.post("/me/profile_image/upload_url", response_model=schemas.UploadUrlResponse)
+def create_profile_image_upload_url(
+    body: schemas.UploadUrlRequest,
+    current_user: schemas.User = Depends(auth.get_current_user),
+):
+    """
+    Signed URL to upload a new profile image straight to storage. PUT the
+    file to upload_url, then attach it with POST /users/me/profile_image/confirm.
+    """
+    return create_upload_url("profile_images", direct_upload_key(current_user.id, body.filename))
+
+@router.post("/me/profile_image/confirm", response_model=schemas.User)
+def confirm_profile_image_upload(
+    body: schemas.UploadConfirm,
+    db: Session = Depends(get_db),
+    current_user: schemas.User = Depends(auth.get_current_user),
+):
+    profile_image_url = confirm_direct_upload(current_user.id, "profile_images", body.key)
+    row = db.execute(
+        update(models.User)
+        .where(models.User.id == current_user.id)
+        .values(profile_image=profile_image_url)
+        .returning(*models.User.__table__.c)
+    ).one()
+    db.commit()
+    return dict(row._mapping)
@@ -0,0 +1,41 @@
+"""
+Periodic jobs shared by several app workers.
+
+Every worker (gunicorn process) runs the same startup tasks. Jobs that
+should run once per interval across the deployment claim the current
+period first: time is cut into periods of the job's interval, and the
+first worker to insert the (job, period) row in scheduled_runs runs it.
+The others get an IntegrityError and skip that period, like
+snapshots.take_snapshot does with its day.
+"""
+import time
+
+from sqlalchemy import delete
+from sqlalchemy.exc import IntegrityError
+
+from app.database import SessionLocal
+from app.models import ScheduledRun
+
+# Claims older than this many periods are pruned.
+KEEP_PERIODS = 10
+
+
+def claim_period(job: str, interval: float, now: float = None) -> bool:
+    """
+    Claim the current period of job. True if this worker should run it,
+    False if another worker already has.
+    """
+    period = int((time.time() if now is None else now) // interval)
+    db = SessionLocal()
+    try:
+        try:
+            with db.begin_nested():
+                db.add(ScheduledRun(job=job, period=period))
+        except IntegrityError:
+            db.rollback()
+            return False
+        db.execute(delete(ScheduledRun).where(ScheduledRun.job == job, ScheduledRun.period < period - KEEP_PERIODS))
+        db.commit()
+        return True
+    finally:
+        db.close()
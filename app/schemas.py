@@ -1,7 +1,7 @@
 from pydantic import BaseModel, Field, PositiveInt, PositiveFloat, constr, EmailStr, field_validator, FieldValidationInfo
-from typing import Optional, List
+from typing import Any, Dict, Optional, List
 from datetime import datetime, date
-from fastapi import Form,  UploadFile
+from fastapi import Form, Query, UploadFile
 
 class UserBase(BaseModel):
     name: str = Field(..., min_length=3, max_length=50, description="Name must be between 3 and 50 characters")
@@ -20,6 +20,7 @@ class User(UserBase):
 
     class Config:
         orm_mode = True
+        from_attributes = True
 
 
 class Token(BaseModel):
@@ -88,9 +89,10 @@ class ProductBase(BaseModel):
         description="Product price must be a positive number.",
         example=29.99,
     )
-    stock: PositiveInt = Field(
+    stock: int = Field(
         ...,
-        description="Number of items in stock (must be greater than 0).",
+        ge=0,
+        description="Number of items in stock (must not be negative).",
         example=150,
     )
     sales: int = Field(
@@ -184,10 +186,64 @@ class ProductUpdateInput:
         self.code = code
         self.category_id = category_id
     
+class ProductFilters:
+    """Filters shared by the product list and its facet counts."""
+
+    def __init__(
+        self,
+        category: Optional[List[int]] = Query(
+            None,
+            description="Category ids; repeat the parameter to match any of several categories.",
+        ),
+        low_stock_threshold: Optional[int] = Query(None, description="Filter products with stock below this threshold"),
+        search: Optional[str] = Query(None, description="Search products by name or description"),
+        price_min: Optional[float] = Query(None, ge=0, description="Minimum price, inclusive"),
+        price_max: Optional[float] = Query(None, ge=0, description="Maximum price, inclusive"),
+        stock_min: Optional[int] = Query(None, ge=0, description="Minimum stock, inclusive"),
+        stock_max: Optional[int] = Query(None, ge=0, description="Maximum stock, inclusive"),
+        sales_min: Optional[int] = Query(None, ge=0, description="Minimum sales, inclusive"),
+        sales_max: Optional[int] = Query(None, ge=0, description="Maximum sales, inclusive"),
+    ):
+        self.category = category
+        self.low_stock_threshold = low_stock_threshold
+        self.search = search
+        self.price_min = price_min
+        self.price_max = price_max
+        self.stock_min = stock_min
+        self.stock_max = stock_max
+        self.sales_min = sales_min
+        self.sales_max = sales_max
+
+
 class ProductCreate(ProductBase):
     pass
 
 
+class ProductPatch(BaseModel):
+    """
+    Partial update: only the fields present in the body are written, so zero
+    and empty values are applied instead of ignored.
+    """
+    name: Optional[str] = Field(None, min_length=3, max_length=100)
+    description: Optional[str] = Field(None, max_length=500)
+    price: Optional[PositiveFloat] = None
+    stock: Optional[int] = Field(None, ge=0)
+    sales: Optional[int] = Field(None, ge=0)
+    code: Optional[str] = Field(None, max_length=50)
+    category_id: Optional[int] = None
+    updated_at: Optional[datetime] = Field(
+        None,
+        description="Version check: the update only applies if the product's updated_at still has this value. "
+        "The If-Match header takes precedence.",
+    )
+
+    @field_validator("name", "price", "stock", "sales", "code")
+    def not_null(cls, value, info: FieldValidationInfo):
+        if value is None:
+            raise ValueError(f"{info.field_name} cannot be null")
+        return value
+
+
 class ProductResponse(ProductBase):
     id: Optional[int]
     category: Optional[CategoryResponse]
@@ -205,6 +261,26 @@ class ProductPaginatedResponse(BaseModel):
     products: List[ProductResponse]
 
 
+class ProductNormalizedResponse(ProductBase):
+    id: Optional[int]
+
+    class Config:
+        orm_mode = True
+        from_attributes = True
+
+
+class ProductNormalizedPaginatedResponse(BaseModel):
+    page: int
+    page_size: int
+    total_pages: int
+    total_items: int
+    products: List[ProductNormalizedResponse]
+    categories: Dict[int, CategoryResponse] = Field(
+        ...,
+        description="Categories referenced by the products on this page, keyed by id.",
+    )
+
+
 class MostSoldProduct(BaseModel):
     id: int
     name: str
@@ -220,6 +296,70 @@ class MostSoldCategory(BaseModel):
     class Config:
         orm_mode = True
 
+class StockValuePoint(BaseModel):
+    date: date
+    stock_value: float
+    stock_units: int
+    product_count: int
+
+
+class AbcProduct(BaseModel):
+    rank: int
+    id: int
+    name: str
+    code: Optional[str]
+    revenue: float
+    cumulative_share: float
+    abc_class: str
+
+
+class AbcClassSummary(BaseModel):
+    product_count: int
+    revenue: float
+    revenue_share: float
+
+
+class AbcAnalysis(BaseModel):
+    total_revenue: float
+    a_cutoff: float
+    b_cutoff: float
+    classes: Dict[str, AbcClassSummary]
+    products: List[AbcProduct]
+
+
+class ReorderSuggestion(BaseModel):
+    product_id: int
+    name: str
+    code: Optional[str]
+    stock: int
+    daily_sales: float
+    days_of_cover: Optional[float] = Field(..., description="None for products that don't sell.")
+    reorder_point: int
+    order_quantity: int
+    needs_reorder: bool
+
+
+class ExportRequest(BaseModel):
+    report: str = Field(..., pattern="^(inventory|products_by_category|sales_over_time)$")
+    format: str = Field("csv", pattern="^(csv|xlsx|pdf)$")
+    start_date: Optional[date] = Field(None, description="sales_over_time only; defaults to 30 days before end_date")
+    end_date: Optional[date] = Field(None, description="sales_over_time only; defaults to today")
+
+
+class ExportJobResponse(BaseModel):
+    id: str
+    report: str
+    format: str
+    status: str = Field(..., description="queued, running, done or failed")
+    rows_written: int
+    total_rows: Optional[int]
+    progress: Optional[float] = Field(..., description="Fraction of rows written, when the total is known")
+    download_url: Optional[str]
+    error: Optional[str]
+    created_at: Optional[datetime]
+    finished_at: Optional[datetime]
+
+
 class DashboardMetrics(BaseModel):
     total_products: int
     low_stock_products: int
@@ -241,3 +381,92 @@ class ProductCreateRequest(BaseModel):
     code: str
     category_id: Optional[int]
     fake_created_at: Optional[datetime] = Field(None, description="Manually set the created_at timestamp")
+
+
+class SlowQuery(BaseModel):
+    statement: str
+    parameters: Any
+    duration_ms: float
+    route: Optional[str]
+    user_id: Optional[int]
+    occurred_at: datetime
+    plan: Optional[str]
+
+
+class StorageGcBucketReport(BaseModel):
+    bucket: str
+    scanned: int
+    orphaned: int
+    removed: int
+    bytes_reclaimed: int
+
+
+class StorageGcReport(BaseModel):
+    dry_run: bool
+    grace_seconds: float
+    buckets: List[StorageGcBucketReport]
+    removed: int
+    bytes_reclaimed: int
+
+
+class UploadUrlRequest(BaseModel):
+    filename: str = Field(..., max_length=255, description="Name of the file to upload; only its extension is kept.")
+
+
+class UploadUrlResponse(BaseModel):
+    upload_url: str
+    token: str
+    key: str
+    expires_in: int
+
+
+class UploadConfirm(BaseModel):
+    key: str = Field(..., max_length=255, description="Key returned with the upload URL.")
+
+
+class ResolveCodesRequest(BaseModel):
+    codes: List[str] = Field(..., min_length=1, max_length=500, description="Scanned product codes, at most 500.")
+
+
+class ResolveCodesResponse(BaseModel):
+    products: Dict[str, ProductResponse]
+    missing: List[str]
+
+
+class ProductBatchGetRequest(BaseModel):
+    ids: List[int] = Field(..., min_length=1, max_length=500, description="Product ids, at most 500.")
+
+
+class ProductBatchGetResponse(BaseModel):
+    products: List[ProductResponse]
+    missing: List[int]
+
+
+class ProductSuggestion(BaseModel):
+    id: int
+    name: str
+    code: Optional[str]
+
+
+class CategoryFacet(BaseModel):
+    id: Optional[int] = Field(..., description="None for products without a category.")
+    name: Optional[str]
+    count: int
+
+
+class PriceFacet(BaseModel):
+    min: float
+    max: Optional[float] = Field(..., description="Exclusive upper bound; None for the last bucket.")
+    count: int
+
+
+class StockFacet(BaseModel):
+    band: str = Field(..., description="out_of_stock, low or in_stock")
+    count: int
+
+
+class ProductFacetsResponse(BaseModel):
+    total_items: int
+    categories: List[CategoryFacet]
+    price: List[PriceFacet]
+    stock: List[StockFacet]
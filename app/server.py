@@ -0,0 +1,116 @@
+"""
+Production server: gunicorn managing uvicorn workers.
+
+    python -m app.server
+
+The app is imported once in the master (preload) and forked into WEB_CONCURRENCY
+workers, so imported code is shared copy-on-write. Workers run on uvloop
+and httptools when they are installed. Each worker is recycled after
+MAX_REQUESTS requests (plus up to MAX_REQUESTS_JITTER, so they don't all
+restart together) to bound memory growth. On SIGTERM, workers stop
+accepting connections and get GRACEFUL_TIMEOUT seconds to finish in-flight
+requests.
+
+`uvicorn app.main:app --reload` remains the development server.
+"""
+import glob
+import multiprocessing
+import os
+import tempfile
+
+from dotenv import load_dotenv
+from gunicorn.app.base import BaseApplication
+from uvicorn.workers import UvicornWorker
+
+load_dotenv()
+
+HOST = os.getenv("HOST", "0.0.0.0")
+PORT = int(os.getenv("PORT", "8000"))
+WEB_CONCURRENCY = int(os.getenv("WEB_CONCURRENCY", str(min(multiprocessing.cpu_count() * 2 + 1, 8))))
+BACKLOG = int(os.getenv("BACKLOG", "2048"))
+KEEPALIVE = int(os.getenv("KEEPALIVE", "5"))
+TIMEOUT = int(os.getenv("TIMEOUT", "60"))
+GRACEFUL_TIMEOUT = int(os.getenv("GRACEFUL_TIMEOUT", "30"))
+MAX_REQUESTS = int(os.getenv("MAX_REQUESTS", "10000"))
+MAX_REQUESTS_JITTER = int(os.getenv("MAX_REQUESTS_JITTER", "1000"))
+LOG_LEVEL = os.getenv("LOG_LEVEL", "info")
+
+
+class Worker(UvicornWorker):
+    # "auto" picks uvloop and httptools when they are installed.
+    CONFIG_KWARGS = {"loop": "auto", "http": "auto", "lifespan": "on"}
+
+
+def post_fork(server, worker):
+    # Connections opened in the master while preloading must not be shared
+    # with the workers; drop them from each worker's pools without closing
+    # them, which would close the master's sockets.
+    from app.database import engines
+
+    for engine in engines:
+        engine.dispose(close=False)
+
+
+def child_exit(server, worker):
+    from prometheus_client import multiprocess
+
+    multiprocess.mark_process_dead(worker.pid)
+
+
+class Server(BaseApplication):
+    def __init__(self, app_uri: str, options: dict):
+        self.app_uri = app_uri
+        self.options = options
+        super().__init__()
+
+    def load_config(self):
+        for key, value in self.options.items():
+            self.cfg.set(key, value)
+
+    def load(self):
+        from app.main import app
+
+        return app
+
+
+def prepare_metrics_dir():
+    """
+    Give the workers a shared PROMETHEUS_MULTIPROC_DIR without samples from
+    a previous run. It has to be set before prometheus_client is imported,
+    i.e. before preloading the app. Only the *.db sample files are deleted,
+    in case the setting points at a directory that holds anything else.
+    """
+    directory = os.getenv("PROMETHEUS_MULTIPROC_DIR")
+    if directory:
+        os.makedirs(directory, exist_ok=True)
+        for path in glob.glob(os.path.join(directory, "*.db")):
+            os.remove(path)
+    else:
+        os.environ["PROMETHEUS_MULTIPROC_DIR"] = tempfile.mkdtemp(prefix="prometheus-")
+
+
+def options() -> dict:
+    return {
+        "bind": f"{HOST}:{PORT}",
+        "workers": WEB_CONCURRENCY,
+        "worker_class": "app.server.Worker",
+        "preload_app": True,
+        "backlog": BACKLOG,
+        "keepalive": KEEPALIVE,
+        "timeout": TIMEOUT,
+        "graceful_timeout": GRACEFUL_TIMEOUT,
+        "max_requests": MAX_REQUESTS,
+        "max_requests_jitter": MAX_REQUESTS_JITTER,
+        "loglevel": LOG_LEVEL,
+        "post_fork": post_fork,
+        "child_exit": child_exit,
+    }
+
+
+def main():
+    prepare_metrics_dir()
+    Server("app.main:app", options()).run()
+
+
+if __name__ == "__main__":
+    main()
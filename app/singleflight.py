@@ -0,0 +1,95 @@
+"""
+Request coalescing (single-flight) for read endpoints.
+
+Identical concurrent GET requests to /reports/* and /products/ are keyed by
+(token subject, path, normalised query string). The first request runs
+normally. Duplicates that arrive while it is in flight wait for it and
+replay its response, so they never reach the database. Only successful
+(2xx) responses are shared: if the first request fails, is rejected (e.g.
+a 503 from admission control) or its body exceeds SINGLEFLIGHT_MAX_BODY,
+the waiting duplicates run on their own.
+"""
+from urllib.parse import parse_qsl, urlencode
+import asyncio
+import os
+
+from dotenv import load_dotenv
+
+from app.auth import get_token_subject
+
+load_dotenv()
+
+SINGLEFLIGHT_ENABLED = os.getenv("SINGLEFLIGHT_ENABLED", "true").lower() == "true"
+SINGLEFLIGHT_MAX_BODY = int(os.getenv("SINGLEFLIGHT_MAX_BODY", str(8 * 1024 * 1024)))
+
+COALESCED_PATHS = ("/products", "/products/")
+COALESCED_PREFIXES = ("/reports/",)
+
+
+def flight_key(scope):
+    if scope["type"] != "http" or scope["method"] != "GET":
+        return None
+    path = scope["path"]
+    if path not in COALESCED_PATHS and not path.startswith(COALESCED_PREFIXES):
+        return None
+    subject = get_token_subject(scope)
+    if subject is None:
+        return None
+    query = parse_qsl(scope.get("query_string", b"").decode("latin-1"), keep_blank_values=True)
+    return subject, path.rstrip("/"), urlencode(sorted(query))
+
+
+class SingleFlightMiddleware:
+    def __init__(self, app):
+        self.app = app
+        self.in_flight = {}
+
+    async def __call__(self, scope, receive, send):
+        key = flight_key(scope) if SINGLEFLIGHT_ENABLED else None
+        if key is None:
+            await self.app(scope, receive, send)
+            return
+
+        flight = self.in_flight.get(key)
+        if flight is not None:
+            response = await asyncio.shield(flight)
+            if response is not None:
+                status, headers, body = response
+                await send({"type": "http.response.start", "status": status, "headers": headers})
+                await send({"type": "http.response.body", "body": body})
+                return
+            await self.app(scope, receive, send)
+            return
+
+        flight = asyncio.get_running_loop().create_future()
+        self.in_flight[key] = flight
+        status = headers = None
+        chunks = []
+        size = 0
+        shareable = True
+
+        async def send_wrapper(message):
+            nonlocal status, headers, size, shareable
+            if message["type"] == "http.response.start":
+                # Copied now: outer middlewares (compression) may rewrite the
+                # message once it is sent, but the body kept here is the raw one.
+                status, headers = message["status"], list(message["headers"])
+                shareable = 200 <= message["status"] < 300
+            elif message["type"] == "http.response.body" and shareable:
+                body = message.get("body", b"")
+                size += len(body)
+                if size > SINGLEFLIGHT_MAX_BODY:
+                    shareable = False
+                    chunks.clear()
+                else:
+                    chunks.append(body)
+            await send(message)
+
+        response = None
+        try:
+            await self.app(scope, receive, send_wrapper)
+            if shareable and status is not None:
+                response = (status, headers, b"".join(chunks))
+        finally:
+            del self.in_flight[key]
+            flight.set_result(response)
@@ -0,0 +1,154 @@
+"""
+Daily inventory snapshots.
+
+Once a day the job aggregates stock per user and category (product count,
+units, value at current prices) in one pass over products. It compares the
+result with each pair's latest snapshot and bulk-inserts rows only for the
+pairs whose figures changed (delta encoding). /reports/stock_value_over_time
+reads these rows and never touches products.
+
+    python -m app.snapshots [--date 2026-10-19] [--force]
+
+It can also run every INVENTORY_SNAPSHOT_INTERVAL_SECONDS inside the app
+(off by default). The inventory_snapshot_runs row for the day is claimed
+first, so several workers or a cron job running the same day write it once.
+"""
+from datetime import date, datetime, timezone
+import argparse
+import asyncio
+import logging
+import os
+import sys
+
+from dotenv import load_dotenv
+from sqlalchemy import delete, func, insert, select, update
+from sqlalchemy.exc import IntegrityError
+
+from app.database import SessionLocal
+from app.models import InventorySnapshot, InventorySnapshotRun, Product
+
+load_dotenv()
+
+INVENTORY_SNAPSHOT_INTERVAL_SECONDS = float(os.getenv("INVENTORY_SNAPSHOT_INTERVAL_SECONDS", "0"))
+INSERT_BATCH_SIZE = 5000
+
+logger = logging.getLogger("app.snapshots")
+
+
+def current_stock(db):
+    rows = db.execute(
+        select(
+            Product.user_id,
+            Product.category_id,
+            func.count(Product.id),
+            func.coalesce(func.sum(Product.stock), 0),
+            func.coalesce(func.sum(Product.stock * Product.price), 0),
+        ).group_by(Product.user_id, Product.category_id)
+    )
+    return {(user_id, category_id): (count, int(units), round(float(value), 2)) for user_id, category_id, count, units, value in rows}
+
+
+def latest_snapshots(db, before: date, user_id: int = None):
+    """Latest figures per (user_id, category_id) from snapshots taken before a day."""
+    ranked = select(
+        InventorySnapshot.user_id,
+        InventorySnapshot.category_id,
+        InventorySnapshot.product_count,
+        InventorySnapshot.stock_units,
+        InventorySnapshot.stock_value,
+        func.row_number().over(
+            partition_by=(InventorySnapshot.user_id, InventorySnapshot.category_id),
+            order_by=InventorySnapshot.snapshot_date.desc(),
+        ).label("position"),
+    ).where(InventorySnapshot.snapshot_date < before)
+    if user_id is not None:
+        ranked = ranked.where(InventorySnapshot.user_id == user_id)
+    ranked = ranked.subquery()
+    rows = db.execute(select(ranked).where(ranked.c.position == 1))
+    return {
+        (row.user_id, row.category_id): (row.product_count, row.stock_units, round(row.stock_value, 2))
+        for row in rows
+    }
+
+
+def take_snapshot(day: date = None, force: bool = False):
+    """
+    Snapshot today's stock (or record it under day). Returns the number of
+    rows written, or None if the day had already been taken.
+    """
+    day = day or datetime.now(timezone.utc).date()
+    db = SessionLocal()
+    try:
+        if force:
+            db.execute(delete(InventorySnapshot).where(InventorySnapshot.snapshot_date == day))
+            db.execute(delete(InventorySnapshotRun).where(InventorySnapshotRun.snapshot_date == day))
+        try:
+            with db.begin_nested():
+                db.add(InventorySnapshotRun(snapshot_date=day))
+        except IntegrityError:
+            logger.info("Inventory snapshot for %s was already taken", day)
+            db.rollback()
+            return None
+
+        current = current_stock(db)
+        previous = latest_snapshots(db, day)
+        empty = (0, 0, 0.0)
+
+        rows = []
+        for key in current.keys() | previous.keys():
+            figures = current.get(key, empty)
+            if figures != previous.get(key, empty):
+                user_id, category_id = key
+                product_count, stock_units, stock_value = figures
+                rows.append({
+                    "user_id": user_id,
+                    "category_id": category_id,
+                    "snapshot_date": day,
+                    "product_count": product_count,
+                    "stock_units": stock_units,
+                    "stock_value": stock_value,
+                })
+
+        for start in range(0, len(rows), INSERT_BATCH_SIZE):
+            db.execute(insert(InventorySnapshot), rows[start:start + INSERT_BATCH_SIZE])
+        db.execute(
+            update(InventorySnapshotRun)
+            .where(InventorySnapshotRun.snapshot_date == day)
+            .values(rows_written=len(rows))
+        )
+        db.commit()
+    finally:
+        db.close()
+
+    logger.info("Inventory snapshot for %s: %d changed rows written", day, len(rows))
+    return len(rows)
+
+
+async def run_periodically(interval: float = INVENTORY_SNAPSHOT_INTERVAL_SECONDS):
+    while True:
+        try:
+            await asyncio.to_thread(take_snapshot)
+        except Exception:
+            logger.exception("Inventory snapshot failed")
+        await asyncio.sleep(interval)
+
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description="Record today's stock per user and category.")
+    parser.add_argument("--date", type=date.fromisoformat, default=None, help="day to record the snapshot under (default: today, UTC)")
+    parser.add_argument("--force", action="store_true", help="replace a snapshot already taken for the day")
+    return parser.parse_args(argv)
+
+
+def main(argv=None):
+    args = parse_args(argv)
+    written = take_snapshot(args.date, args.force)
+    if written is None:
+        print("Snapshot already taken for this day; use --force to replace it")
+    else:
+        print(f"{written} changed rows written")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
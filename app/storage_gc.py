@@ -0,0 +1,235 @@
+"""
+Garbage collection of orphaned images.
+
+Replacing a product image or deleting a product or user leaves the old
+object in storage. This job pages through the product_images and
+profile_images buckets STORAGE_GC_BATCH_SIZE objects at a time and removes
+those that no Product.image or User.profile_image points to, once they are
+older than STORAGE_GC_GRACE_SECONDS and not reused by a deduplicated upload
+within that time. The grace period covers uploads whose row has not been
+committed yet, so it must be longer than any request.
+
+    python -m app.storage_gc [--dry-run] [--grace-seconds N]
+
+It can also run every STORAGE_GC_INTERVAL_SECONDS inside the app (off by
+default; one worker per interval, see app/scheduling.py) or be triggered
+through POST /admin/storage_gc.
+"""
+from datetime import datetime, timedelta, timezone
+import argparse
+import asyncio
+import logging
+import os
+import sys
+
+from dotenv import load_dotenv
+from sqlalchemy import delete, select
+
+from app import supabase
+from app.database import SessionLocal
+from app.models import Product, StoredObject, User
+from app.scheduling import claim_period
+
+load_dotenv()
+
+STORAGE_GC_GRACE_SECONDS = float(os.getenv("STORAGE_GC_GRACE_SECONDS", str(24 * 3600)))
+STORAGE_GC_BATCH_SIZE = int(os.getenv("STORAGE_GC_BATCH_SIZE", "1000"))
+STORAGE_GC_INTERVAL_SECONDS = float(os.getenv("STORAGE_GC_INTERVAL_SECONDS", "0"))
+
+# Bucket -> column holding the public URLs of its objects.
+BUCKETS = {
+    "product_images": Product.image,
+    "profile_images": User.profile_image,
+}
+
+logger = logging.getLogger("app.storage_gc")
+
+
+def object_key(bucket_name: str, url: str):
+    """
+    Key of the object a stored URL points to, read from its `<bucket>/<key>`
+    end, so it doesn't depend on the public URL prefix the URL was stored with.
+    """
+    path = url.replace("\\", "/").split("?", 1)[0]
+    _, found, key = path.rpartition(f"{bucket_name}/")
+    return key if found and key else None
+
+
+def referenced_objects(db, bucket_name: str, column) -> set:
+    """Names of the objects in the bucket that rows still point to."""
+    names = set()
+    rows = db.execute(select(column).where(column.is_not(None)).execution_options(yield_per=STORAGE_GC_BATCH_SIZE))
+    for (url,) in rows:
+        key = object_key(bucket_name, url)
+        if key:
+            names.add(key)
+    return names
+
+
+def created_at(obj: dict):
+    value = obj.get("created_at") or obj.get("updated_at")
+    if not value:
+        return None
+    created = datetime.fromisoformat(value.replace("Z", "+00:00"))
+    return created if created.tzinfo else created.replace(tzinfo=timezone.utc)
+
+
+def reused_objects(db, bucket_name: str, keys: list, cutoff: datetime) -> set:
+    """Keys among keys that a deduplicated upload reused within the grace period."""
+    if not keys:
+        return set()
+    return {
+        key for (key,) in db.query(StoredObject.key).filter(
+            StoredObject.bucket == bucket_name, StoredObject.key.in_(keys), StoredObject.last_used_at > cutoff
+        )
+    }
+
+
+def remove_orphans(db, bucket_name: str, orphans: list, cutoff: datetime) -> tuple:
+    """
+    Delete the deduplication rows of the orphans that no upload reused
+    within the grace period, then remove from storage only the objects whose
+    row was deleted here, or that never had one. Returns the objects removed
+    and the number that were due for removal.
+
+    The rows stay locked until the objects are gone, so an upload that
+    dedupes onto one of them meanwhile waits, finds the row deleted and
+    stores the content again.
+    """
+    keys = [obj["name"] for obj in orphans]
+    if not keys:
+        return [], 0
+    deleted = set(db.execute(
+        delete(StoredObject)
+        .where(
+            StoredObject.bucket == bucket_name,
+            StoredObject.key.in_(keys),
+            StoredObject.last_used_at <= cutoff,
+        )
+        .returning(StoredObject.key)
+    ).scalars())
+    tracked = set(db.execute(
+        select(StoredObject.key).where(StoredObject.bucket == bucket_name, StoredObject.key.in_(keys))
+    ).scalars())
+    removable = [key for key in keys if key in deleted or key not in tracked]
+    try:
+        removed = (supabase.remove(bucket_name, removable) or []) if removable else []
+    finally:
+        # Even if the removal failed part way: a missing row only means the
+        # next upload of that content stores it again.
+        db.commit()
+    return removed, len(removable)
+
+
+def collect_bucket(db, bucket_name: str, column, cutoff: datetime, dry_run: bool) -> dict:
+    referenced = referenced_objects(db, bucket_name, column)
+    report = {"bucket": bucket_name, "scanned": 0, "orphaned": 0, "removed": 0, "bytes_reclaimed": 0}
+
+    offset = 0
+    while True:
+        objects = supabase.list_objects(bucket_name, STORAGE_GC_BATCH_SIZE, offset)
+        if not objects:
+            break
+        report["scanned"] += len(objects)
+
+        orphans = []
+        for obj in objects:
+            # Folders are listed without an id.
+            if obj.get("id") is None or obj["name"] in referenced:
+                continue
+            created = created_at(obj)
+            if created is None or created > cutoff:
+                continue
+            orphans.append(obj)
+
+        removed = 0
+        if dry_run:
+            reused = reused_objects(db, bucket_name, [obj["name"] for obj in orphans], cutoff)
+            orphans = [obj for obj in orphans if obj["name"] not in reused]
+            report["orphaned"] += len(orphans)
+            report["bytes_reclaimed"] += sum((obj.get("metadata") or {}).get("size", 0) for obj in orphans)
+        else:
+            sizes = {obj["name"]: (obj.get("metadata") or {}).get("size", 0) for obj in orphans}
+            removed_objects, orphaned = remove_orphans(db, bucket_name, orphans, cutoff)
+            report["orphaned"] += orphaned
+            for obj in removed_objects:
+                removed += 1
+                report["bytes_reclaimed"] += sizes.get(obj["name"], 0)
+            report["removed"] += removed
+
+        if len(objects) < STORAGE_GC_BATCH_SIZE:
+            break
+        # Removed objects no longer take up a position in the listing.
+        offset += len(objects) - removed
+
+    return report
+
+
+def collect(grace_seconds: float = None, dry_run: bool = False) -> dict:
+    """
+    Remove unreferenced objects older than the grace period from every
+    bucket. With dry_run, only report what would be removed.
+    """
+    if grace_seconds is None:
+        grace_seconds = STORAGE_GC_GRACE_SECONDS
+    cutoff = datetime.now(timezone.utc) - timedelta(seconds=grace_seconds)
+
+    db = SessionLocal()
+    try:
+        buckets = [
+            collect_bucket(db, bucket_name, column, cutoff, dry_run)
+            for bucket_name, column in BUCKETS.items()
+        ]
+    finally:
+        db.close()
+
+    report = {
+        "dry_run": dry_run,
+        "grace_seconds": grace_seconds,
+        "buckets": buckets,
+        "removed": sum(bucket["removed"] for bucket in buckets),
+        "bytes_reclaimed": sum(bucket["bytes_reclaimed"] for bucket in buckets),
+    }
+    logger.info(
+        "Storage GC%s: %d objects removed, %d bytes reclaimed",
+        " (dry run)" if dry_run else "", report["removed"], report["bytes_reclaimed"],
+    )
+    return report
+
+
+async def run_periodically(interval: float = STORAGE_GC_INTERVAL_SECONDS):
+    while True:
+        await asyncio.sleep(interval)
+        try:
+            # Only one worker collects per interval.
+            if await asyncio.to_thread(claim_period, "storage_gc", interval):
+                await asyncio.to_thread(collect)
+        except Exception:
+            logger.exception("Storage GC failed")
+
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description="Remove images no product or user refers to.")
+    parser.add_argument("--dry-run", action="store_true", help="only report what would be removed")
+    parser.add_argument(
+        "--grace-seconds", type=float, default=STORAGE_GC_GRACE_SECONDS,
+        help="keep unreferenced objects younger than this (default: %(default)s)",
+    )
+    return parser.parse_args(argv)
+
+
+def main(argv=None):
+    args = parse_args(argv)
+    report = collect(args.grace_seconds, args.dry_run)
+    for bucket in report["buckets"]:
+        print(
+            f"{bucket['bucket']}: scanned {bucket['scanned']}, orphaned {bucket['orphaned']}, "
+            f"removed {bucket['removed']}, {bucket['bytes_reclaimed']} bytes reclaimed"
+        )
+    verb = "would reclaim" if args.dry_run else "reclaimed"
+    print(f"Total: {verb} {report['bytes_reclaimed']} bytes")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
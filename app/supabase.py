@@ -1,6 +1,183 @@
 from supabase import create_client, Client
+from dotenv import load_dotenv
+from jose import JWTError, jwt
+from app.metrics import storage_timer
+from datetime import datetime, timedelta, timezone
 import os
+import shutil
+
+load_dotenv()
 
 SUPABASE_URL = os.getenv("SUPABASE_URL")
 SUPABASE_KEY = os.getenv("SUPABASE_SECRET_ACCESS_KEY")
-supabase: Client = create_client(SUPABASE_URL, SUPABASE_KEY)
+
+# "supabase" (default) or "local". The local backend writes objects under
+# LOCAL_STORAGE_DIR, which is served by the /uploads static mount.
+STORAGE_BACKEND = os.getenv("STORAGE_BACKEND", "supabase")
+LOCAL_STORAGE_DIR = os.getenv("LOCAL_STORAGE_DIR", "uploads")
+
+# Signed upload URLs: Supabase's expire after two hours. The local backend
+# signs its own with SECRET_KEY and accepts them on LOCAL_SIGNED_UPLOAD_URL.
+SIGNED_UPLOAD_EXPIRE_SECONDS = int(os.getenv("SIGNED_UPLOAD_EXPIRE_SECONDS", "600"))
+LOCAL_SIGNED_UPLOAD_URL = os.getenv("LOCAL_SIGNED_UPLOAD_URL", "/storage/upload")
+SECRET_KEY = os.getenv("SECRET_KEY")
+AUTH_ALGORITHM = os.getenv("AUTH_ALGORITHM")
+
+
+class LocalUploadResponse:
+    def __init__(self, path: str):
+        self.path = path
+        self.full_path = path
+        self.error = None
+
+
+class LocalBucket:
+    """Filesystem stand-in for a Supabase storage bucket."""
+
+    def __init__(self, root: str, bucket_name: str):
+        self.bucket_name = bucket_name
+        self.directory = os.path.join(root, bucket_name)
+
+    def _path(self, path: str) -> str:
+        full_path = os.path.normpath(os.path.join(self.directory, path))
+        if not full_path.startswith(os.path.normpath(self.directory) + os.sep):
+            raise ValueError(f"Invalid object path: {path}")
+        return full_path
+
+    def upload(self, path: str, file, file_options: dict = None):
+        full_path = self._path(path)
+        os.makedirs(os.path.dirname(full_path), exist_ok=True)
+        with open(full_path, "wb") as f:
+            if isinstance(file, bytes):
+                f.write(file)
+            else:
+                shutil.copyfileobj(file, f)
+        return LocalUploadResponse(f"{self.bucket_name}/{path}")
+
+    def get_public_url(self, path: str) -> str:
+        return public_url(self.bucket_name, path)
+
+    def list(self, path: str = None, options: dict = None):
+        """Files at the top of the bucket, in the shape Supabase returns them."""
+        options = options or {}
+        limit = options.get("limit", 100)
+        offset = options.get("offset", 0)
+        search = options.get("search", "")
+        if not os.path.isdir(self.directory):
+            return []
+        entries = sorted(
+            (entry for entry in os.scandir(self.directory) if entry.is_file() and entry.name.startswith(search)),
+            key=lambda entry: entry.name,
+        )
+        objects = []
+        for entry in entries[offset:offset + limit]:
+            stat = entry.stat()
+            modified = datetime.fromtimestamp(stat.st_mtime, timezone.utc).isoformat()
+            objects.append({
+                "name": entry.name,
+                "id": entry.name,
+                "created_at": modified,
+                "updated_at": modified,
+                "metadata": {"size": stat.st_size},
+            })
+        return objects
+
+    def create_signed_upload_url(self, path: str) -> dict:
+        self._path(path)
+        expires = datetime.now(timezone.utc) + timedelta(seconds=SIGNED_UPLOAD_EXPIRE_SECONDS)
+        token = jwt.encode(
+            {"bucket": self.bucket_name, "path": path, "exp": expires},
+            SECRET_KEY,
+            algorithm=AUTH_ALGORITHM,
+        )
+        return {
+            "signed_url": f"{LOCAL_SIGNED_UPLOAD_URL}/{self.bucket_name}/{path}?token={token}",
+            "token": token,
+            "path": path,
+        }
+
+    def verify_upload_token(self, path: str, token: str) -> bool:
+        try:
+            claims = jwt.decode(token, SECRET_KEY, algorithms=[AUTH_ALGORITHM])
+        except JWTError:
+            return False
+        return claims.get("bucket") == self.bucket_name and claims.get("path") == path
+
+    def remove(self, paths: list):
+        removed = []
+        for path in paths:
+            try:
+                os.remove(self._path(path))
+            except FileNotFoundError:
+                continue
+            removed.append({"name": path})
+        return removed
+
+
+class LocalStorage:
+    def __init__(self, root: str):
+        self.root = root
+
+    def from_(self, bucket_name: str) -> LocalBucket:
+        return LocalBucket(self.root, bucket_name)
+
+
+class LocalClient:
+    def __init__(self, root: str):
+        self.storage = LocalStorage(root)
+
+
+def public_url(bucket_name: str, file_name: str) -> str:
+    if STORAGE_BACKEND == "local":
+        return f"{LOCAL_STORAGE_DIR}/{bucket_name}/{file_name}"
+    return f"{SUPABASE_URL}/storage/v1/object/public/{bucket_name}/{file_name}"
+
+
+if STORAGE_BACKEND == "local":
+    supabase = LocalClient(LOCAL_STORAGE_DIR)
+else:
+    supabase: Client = create_client(SUPABASE_URL, SUPABASE_KEY)
+
+
+def upload(bucket_name: str, file_name: str, file_content, file_options: dict = None):
+    """Store file_content (bytes, or a binary file object to stream) under file_name."""
+    with storage_timer("upload", bucket_name):
+        return supabase.storage.from_(bucket_name).upload(file_name, file_content, file_options)
+
+
+def list_objects(bucket_name: str, limit: int, offset: int):
+    with storage_timer("list", bucket_name):
+        return supabase.storage.from_(bucket_name).list(
+            None, {"limit": limit, "offset": offset, "sortBy": {"column": "name", "order": "asc"}}
+        )
+
+
+def remove(bucket_name: str, file_names: list):
+    with storage_timer("remove", bucket_name):
+        return supabase.storage.from_(bucket_name).remove(file_names)
+
+
+def create_upload_url(bucket_name: str, file_name: str) -> dict:
+    """
+    Signed URL the client uploads the object to directly, without the bytes
+    passing through the API.
+    """
+    with storage_timer("sign_upload", bucket_name):
+        signed = supabase.storage.from_(bucket_name).create_signed_upload_url(file_name)
+    expires_in = SIGNED_UPLOAD_EXPIRE_SECONDS if STORAGE_BACKEND == "local" else 2 * 3600
+    return {"upload_url": signed["signed_url"], "token": signed["token"], "key": file_name, "expires_in": expires_in}
+
+
+def object_info(bucket_name: str, file_name: str):
+    """Listing entry of an object at the top of the bucket, or None if it doesn't exist."""
+    with storage_timer("list", bucket_name):
+        objects = supabase.storage.from_(bucket_name).list(None, {"limit": 100, "search": file_name})
+    return next((obj for obj in objects if obj["name"] == file_name), None)
+
+
+def download_url(bucket_name: str, file_name: str, expires_in: int) -> str:
+    """Time-limited URL for an object in a private bucket (public on the local backend)."""
+    if STORAGE_BACKEND == "local":
+        return public_url(bucket_name, file_name)
+    with storage_timer("sign_download", bucket_name):
+        return supabase.storage.from_(bucket_name).create_signed_url(file_name, expires_in)["signedURL"]
@@ -0,0 +1,216 @@
+"""
+End-to-end HTTP benchmark for the MyProducts API.
+
+Drives app.main:app either in-process through an ASGI transport (default) or
+against a running server (--base-url), seeds load users with seed.py when
+they don't exist yet, and reports p50/p95/p99 latency, throughput and
+queries per request for every endpoint of each scenario.
+
+Examples:
+    python -m benchmarks.run --scenarios mixed --requests 2000
+    python -m benchmarks.run --database-url postgresql://localhost/myproducts_bench
+    uvicorn app.main:app & python -m benchmarks.run --base-url http://127.0.0.1:8000
+    python -m benchmarks.run --save-baseline benchmarks/baseline.json
+    python -m benchmarks.run --baseline benchmarks/baseline.json --tolerance 0.25
+"""
+import argparse
+import asyncio
+import contextvars
+import os
+import sys
+import tempfile
+import time
+from collections import Counter, defaultdict
+
+import httpx
+
+from benchmarks import stats, workloads
+
+# Statement counts of the current request, by leading SQL keyword.
+_statements = contextvars.ContextVar("benchmark_statements", default=None)
+
+
+def configure_environment(args):
+    """Must run before anything under app/ is imported."""
+    os.environ["DATABASE_URL"] = args.database_url
+    os.environ.setdefault("SECRET_KEY", "benchmark-secret")
+    os.environ.setdefault("AUTH_ALGORITHM", "HS256")
+    os.environ.setdefault("ACCESS_TOKEN_EXPIRE_MINUTES", "600")
+    os.environ.setdefault("ALLOWED_ORIGINS", "*")
+    os.environ["STORAGE_BACKEND"] = "local"
+    # Admission control would turn a benchmark into a rate-limit test.
+    os.environ.setdefault("ADMISSION_ENABLED", "false")
+    os.environ.setdefault("LOCAL_STORAGE_DIR", os.path.join(tempfile.gettempdir(), "myproducts-bench"))
+
+
+def count_queries(engine):
+    """Count statements per request through a context variable set by each worker."""
+    from sqlalchemy import event
+
+    @event.listens_for(engine, "before_cursor_execute")
+    def _count(conn, cursor, statement, parameters, context, executemany):
+        counter = _statements.get()
+        if counter is not None:
+            counter[statement.lstrip().split(None, 1)[0].upper()] += 1
+
+
+async def send(client, tenant, call, track_queries: bool):
+    """Make one call; return the response, its latency and the statements it ran."""
+    counter = Counter()
+    token = _statements.set(counter) if track_queries else None
+    started = time.perf_counter()
+    try:
+        response = await client.request(
+            call.method,
+            call.url,
+            params=call.params,
+            data=call.data,
+            json=call.json,
+            files=call.files,
+            headers={"Authorization": f"Bearer {tenant.token}"},
+        )
+    finally:
+        if token is not None:
+            _statements.reset(token)
+    return response, time.perf_counter() - started, counter
+
+
+def seed_tenants(args):
+    import seed
+    from sqlalchemy import select
+    from app.database import SessionLocal, engine
+    from app.models import Base, User
+
+    Base.metadata.create_all(bind=engine)
+    emails = [f"{args.email_prefix}{i}@example.com" for i in range(args.users)]
+
+    db = SessionLocal()
+    try:
+        existing = db.execute(select(User.email).where(User.email.in_(emails))).scalars().all()
+    finally:
+        db.close()
+
+    if len(existing) < len(emails):
+        if existing:
+            sys.exit(f"Only {len(existing)} of {len(emails)} load users exist; use a fresh database")
+        seed.generate(seed.parse_args([
+            "--users", str(args.users),
+            "--products-per-user", str(args.products_per_user),
+            "--seed", str(args.seed),
+            "--email-prefix", args.email_prefix,
+        ]))
+    return emails
+
+
+async def login(client: httpx.AsyncClient, emails):
+    tenants = []
+    for email in emails:
+        response = await client.post(
+            "/users/token", data={"username": email, "password": "password123"}
+        )
+        response.raise_for_status()
+        token = response.json()["access_token"]
+        headers = {"Authorization": f"Bearer {token}"}
+
+        products = await client.get("/products/", params={"page_size": 100}, headers=headers)
+        categories = await client.get("/products/categories/", headers=headers)
+        tenants.append(workloads.Tenant(
+            email=email,
+            token=token,
+            product_ids=[p["id"] for p in products.json()["products"]],
+            category_ids=[c["id"] for c in categories.json()],
+        ))
+    return tenants
+
+
+async def run_scenario(client, calls, concurrency: int, track_queries: bool):
+    samples = defaultdict(list)
+    pending = iter(calls)
+
+    async def worker():
+        for tenant, call in pending:
+            response, latency, counter = await send(client, tenant, call, track_queries)
+            samples[call.label].append(
+                stats.Sample(latency, response.status_code, sum(counter.values()) if track_queries else None)
+            )
+
+    started = time.perf_counter()
+    await asyncio.gather(*(worker() for _ in range(concurrency)))
+    return samples, time.perf_counter() - started
+
+
+def make_client(args):
+    """Return (client, track_queries); statements can only be counted in-process."""
+    if args.base_url:
+        return httpx.AsyncClient(base_url=args.base_url, timeout=60), False
+
+    from app.main import app
+    from app.database import engines
+
+    for engine in engines:
+        count_queries(engine)
+    client = httpx.AsyncClient(transport=httpx.ASGITransport(app=app), base_url="http://bench", timeout=60)
+    return client, True
+
+
+async def main_async(args):
+    emails = seed_tenants(args)
+    client, track_queries = make_client(args)
+
+    results = {}
+    async with client:
+        tenants = await login(client, emails)
+        for scenario in args.scenarios:
+            if args.warmup:
+                warmup = workloads.generate_calls(scenario, tenants, args.warmup, args.seed + 1)
+                await run_scenario(client, warmup, args.concurrency, False)
+
+            calls = workloads.generate_calls(scenario, tenants, args.requests, args.seed)
+            samples, elapsed = await run_scenario(client, calls, args.concurrency, track_queries)
+            results[scenario] = stats.summarize(samples, elapsed)
+            stats.print_report(scenario, results[scenario], elapsed)
+    return results
+
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description="Benchmark the MyProducts API")
+    parser.add_argument("--scenarios", nargs="+", default=["list", "search", "sort", "report", "write", "mixed"],
+                        choices=sorted(workloads.SCENARIOS))
+    parser.add_argument("--requests", type=int, default=500, help="Requests per scenario")
+    parser.add_argument("--warmup", type=int, default=50, help="Unmeasured requests before each scenario")
+    parser.add_argument("--concurrency", type=int, default=8)
+    parser.add_argument("--base-url", default=None, help="Benchmark a running server instead of in-process")
+    parser.add_argument("--database-url", default=os.getenv("BENCH_DATABASE_URL", "sqlite:///./bench.db"),
+                        help="Database to seed (and, in-process, to serve from)")
+    parser.add_argument("--users", type=int, default=5)
+    parser.add_argument("--products-per-user", type=int, default=2000)
+    parser.add_argument("--email-prefix", default="benchuser")
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--baseline", default=None, help="Fail when results regress against this file")
+    parser.add_argument("--tolerance", type=float, default=0.2, help="Allowed p95 slowdown vs baseline")
+    parser.add_argument("--save-baseline", default=None, help="Write results to this file")
+    return parser.parse_args(argv)
+
+
+def main(argv=None):
+    args = parse_args(argv)
+    configure_environment(args)
+    results = asyncio.run(main_async(args))
+
+    if args.save_baseline:
+        stats.save_baseline(args.save_baseline, results)
+        print(f"\nBaseline written to {args.save_baseline}")
+
+    if args.baseline:
+        regressions = stats.compare(results, stats.load_baseline(args.baseline), args.tolerance)
+        if regressions:
+            print("\nRegressions against baseline:")
+            for regression in regressions:
+                print(f"  {regression}")
+            return 1
+        print("\nNo regressions against baseline.")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,92 @@
+"""
+Latency statistics, report printing and baseline comparison.
+"""
+import json
+import math
+from dataclasses import dataclass
+from typing import Dict, List, Optional
+
+
+@dataclass
+class Sample:
+    latency: float
+    status: int
+    queries: Optional[int]
+
+
+def percentile(values: List[float], pct: float) -> float:
+    if not values:
+        return 0.0
+    ordered = sorted(values)
+    rank = (len(ordered) - 1) * pct / 100.0
+    low, high = math.floor(rank), math.ceil(rank)
+    if low == high:
+        return ordered[low]
+    return ordered[low] + (ordered[high] - ordered[low]) * (rank - low)
+
+
+def summarize(samples: Dict[str, List[Sample]], elapsed: float) -> Dict[str, dict]:
+    summary = {}
+    for label, items in sorted(samples.items()):
+        latencies = [s.latency * 1000 for s in items]
+        queries = [s.queries for s in items if s.queries is not None]
+        summary[label] = {
+            "count": len(items),
+            "errors": sum(1 for s in items if s.status >= 400),
+            "p50_ms": round(percentile(latencies, 50), 3),
+            "p95_ms": round(percentile(latencies, 95), 3),
+            "p99_ms": round(percentile(latencies, 99), 3),
+            "rps": round(len(items) / elapsed, 2) if elapsed else 0.0,
+            "queries_per_request": round(sum(queries) / len(queries), 2) if queries else None,
+        }
+    return summary
+
+
+def print_report(scenario: str, summary: Dict[str, dict], elapsed: float):
+    total = sum(row["count"] for row in summary.values())
+    print(f"\n== {scenario}: {total} requests in {elapsed:.2f}s ({total / elapsed:.1f} req/s)")
+    header = f"{'endpoint':<34}{'count':>7}{'err':>6}{'p50 ms':>10}{'p95 ms':>10}{'p99 ms':>10}{'req/s':>9}{'q/req':>7}"
+    print(header)
+    print("-" * len(header))
+    for label, row in summary.items():
+        queries = "-" if row["queries_per_request"] is None else f"{row['queries_per_request']:.1f}"
+        print(
+            f"{label:<34}{row['count']:>7}{row['errors']:>6}{row['p50_ms']:>10.2f}"
+            f"{row['p95_ms']:>10.2f}{row['p99_ms']:>10.2f}{row['rps']:>9.1f}{queries:>7}"
+        )
+
+
+def load_baseline(path: str) -> dict:
+    with open(path) as f:
+        return json.load(f)
+
+
+def save_baseline(path: str, results: dict):
+    with open(path, "w") as f:
+        json.dump(results, f, indent=2, sort_keys=True)
+        f.write("\n")
+
+
+def compare(results: dict, baseline: dict, tolerance: float) -> List[str]:
+    """
+    Return a list of regressions: p95 latency above the baseline by more than
+    `tolerance`, errors where there were none, or more queries per request.
+    """
+    regressions = []
+    for scenario, rows in results.items():
+        for label, row in rows.items():
+            base = baseline.get(scenario, {}).get(label)
+            if not base:
+                continue
+            if row["p95_ms"] > base["p95_ms"] * (1 + tolerance):
+                regressions.append(
+                    f"{scenario} / {label}: p95 {row['p95_ms']:.2f} ms vs baseline {base['p95_ms']:.2f} ms"
+                )
+            if row["errors"] and not base["errors"]:
+                regressions.append(f"{scenario} / {label}: {row['errors']} errors vs none in baseline")
+            row_queries, base_queries = row["queries_per_request"], base.get("queries_per_request")
+            if row_queries is not None and base_queries is not None and row_queries > base_queries + 0.01:
+                regressions.append(
+                    f"{scenario} / {label}: {row_queries:.2f} queries/request vs baseline {base_queries:.2f}"
+                )
+    return regressions
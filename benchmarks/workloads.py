@@ -0,0 +1,154 @@
+"""
+Request mixes used by the benchmark runner.
+
+Each scenario is a list of (weight, factory) pairs. A factory receives a
+seeded random generator and a tenant and returns the Call to make, so a run
+is reproducible for a given --seed.
+"""
+import random
+from dataclasses import dataclass, field
+from typing import Callable, Dict, List, Optional, Tuple
+
+SEARCH_TERMS = ["mouse", "desk", "premium", "lamp", "shoes", "set", "eco", "charger", "watch"]
+SORT_KEYS = ["name", "price", "stock", "sales", "code"]
+REPORTS = [
+    "dashboard_metrics",
+    "products_by_category",
+    "most_sold_products",
+    "most_sold_categories",
+    "sales_over_time",
+]
+
+# 1x1 transparent PNG, enough to exercise the (stubbed) storage upload path.
+TINY_PNG = bytes.fromhex(
+    "89504e470d0a1a0a0000000d4948445200000001000000010806000000"
+    "1f15c4890000000d49444154789c6360000002000154a24f5d0000000049454e44ae426082"
+)
+
+
+@dataclass
+class Tenant:
+    email: str
+    token: str
+    product_ids: List[int] = field(default_factory=list)
+    category_ids: List[int] = field(default_factory=list)
+
+
+@dataclass
+class Call:
+    label: str
+    method: str
+    url: str
+    params: Optional[dict] = None
+    data: Optional[dict] = None
+    json: Optional[dict] = None
+    files: Optional[dict] = None
+
+
+def list_products(rng: random.Random, tenant: Tenant) -> Call:
+    return Call(
+        "GET /products (list)", "GET", "/products/",
+        params={"page": rng.randint(1, 5), "page_size": rng.choice([10, 25, 100])},
+    )
+
+
+def search_products(rng: random.Random, tenant: Tenant) -> Call:
+    return Call(
+        "GET /products (search)", "GET", "/products/",
+        params={"search": rng.choice(SEARCH_TERMS), "page_size": 25},
+    )
+
+
+def sort_products(rng: random.Random, tenant: Tenant) -> Call:
+    return Call(
+        "GET /products (sort)", "GET", "/products/",
+        params={
+            "order_by": rng.choice(SORT_KEYS),
+            "order": rng.choice(["asc", "desc"]),
+            "page": rng.randint(1, 20),
+            "page_size": 25,
+        },
+    )
+
+
+def filter_products(rng: random.Random, tenant: Tenant) -> Call:
+    params = {"low_stock_threshold": 10, "page_size": 25}
+    if tenant.category_ids:
+        params["category"] = rng.choice(tenant.category_ids)
+    return Call("GET /products (filter)", "GET", "/products/", params=params)
+
+
+def get_product(rng: random.Random, tenant: Tenant) -> Call:
+    product_id = rng.choice(tenant.product_ids) if tenant.product_ids else 1
+    return Call("GET /products/{id}", "GET", f"/products/{product_id}")
+
+
+def report(rng: random.Random, tenant: Tenant) -> Call:
+    name = rng.choice(REPORTS)
+    return Call(f"GET /reports/{name}", "GET", f"/reports/{name}")
+
+
+def create_product(rng: random.Random, tenant: Tenant) -> Call:
+    data = {
+        "name": f"Bench Product {rng.randint(0, 10 ** 6)}",
+        "description": "Created by the benchmark suite.",
+        "price": f"{rng.uniform(1, 500):.2f}",
+        "stock": str(rng.randint(1, 500)),
+        "sales": str(rng.randint(0, 50)),
+        "code": f"BENCH-{rng.randint(0, 10 ** 9)}",
+    }
+    if tenant.category_ids:
+        data["category_id"] = str(rng.choice(tenant.category_ids))
+    files = {"image": ("bench.png", TINY_PNG, "image/png")} if rng.random() < 0.2 else None
+    return Call("POST /products", "POST", "/products/", data=data, files=files)
+
+
+def update_product(rng: random.Random, tenant: Tenant) -> Call:
+    product_id = rng.choice(tenant.product_ids) if tenant.product_ids else 1
+    data = {
+        "name": f"Bench Updated {rng.randint(0, 10 ** 6)}",
+        "price": f"{rng.uniform(1, 500):.2f}",
+        "stock": str(rng.randint(1, 500)),
+        "code": f"BENCH-{rng.randint(0, 10 ** 9)}",
+    }
+    return Call("PUT /products/{id}", "PUT", f"/products/{product_id}", data=data)
+
+
+def create_category(rng: random.Random, tenant: Tenant) -> Call:
+    return Call(
+        "POST /products/categories", "POST", "/products/categories/",
+        json={"name": f"Bench Category {rng.randint(0, 10 ** 6)}"},
+    )
+
+
+Factory = Callable[[random.Random, Tenant], Call]
+
+SCENARIOS: Dict[str, List[Tuple[float, Factory]]] = {
+    "list": [(1.0, list_products)],
+    "search": [(1.0, search_products)],
+    "sort": [(0.8, sort_products), (0.2, filter_products)],
+    "report": [(1.0, report)],
+    "write": [(0.5, create_product), (0.4, update_product), (0.1, create_category)],
+    "mixed": [
+        (0.30, list_products),
+        (0.15, search_products),
+        (0.10, sort_products),
+        (0.05, filter_products),
+        (0.15, get_product),
+        (0.15, report),
+        (0.06, create_product),
+        (0.03, update_product),
+        (0.01, create_category),
+    ],
+}
+
+
+def generate_calls(scenario: str, tenants: List[Tenant], count: int, seed: int):
+    rng = random.Random(seed)
+    weights, factories = zip(*SCENARIOS[scenario])
+    calls = []
+    for _ in range(count):
+        tenant = rng.choice(tenants)
+        factory = rng.choices(factories, weights=weights)[0]
+        calls.append((tenant, factory(rng, tenant)))
+    return calls
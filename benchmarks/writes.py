@@ -0,0 +1,122 @@
+"""
+Write-throughput benchmark.
+
+Runs the write scenario in-process and breaks down the statements each
+write endpoint executes by kind (SELECT, INSERT, UPDATE, ...). This shows
+the database round trips per request directly, e.g. that creating a product
+is a single INSERT ... RETURNING with no follow-up SELECT to refresh it.
+
+Each run is compared with a baseline of statements per request and the
+round trips saved are printed per endpoint. The default baseline,
+benchmarks/writes_baseline.json, was recorded on the tree before writes
+used RETURNING (commit 2505883, each write followed by commit + refresh)
+with the arguments below on SQLite. Record another with --save-baseline
+and compare against it with --baseline. The run exits non-zero when an
+endpoint executes more statements than its baseline.
+
+    python -m benchmarks.writes --users 2 --products-per-user 200 --requests 300 --concurrency 1
+"""
+import asyncio
+import json
+import os
+import sys
+import time
+from collections import Counter, defaultdict
+
+from benchmarks import run, workloads
+
+KINDS = ["SELECT", "INSERT", "UPDATE", "DELETE"]
+DEFAULT_BASELINE = os.path.join(os.path.dirname(__file__), "writes_baseline.json")
+
+
+async def measure(args):
+    emails = run.seed_tenants(args)
+    args.base_url = None
+    client, _ = run.make_client(args)
+
+    statements = defaultdict(Counter)
+    requests = Counter()
+    errors = Counter()
+
+    async with client:
+        tenants = await run.login(client, emails)
+        calls = iter(workloads.generate_calls("write", tenants, args.requests, args.seed))
+
+        async def worker():
+            for tenant, call in calls:
+                response, _, counter = await run.send(client, tenant, call, True)
+                requests[call.label] += 1
+                statements[call.label].update(counter)
+                if response.status_code >= 400:
+                    errors[call.label] += 1
+
+        started = time.perf_counter()
+        await asyncio.gather(*(worker() for _ in range(args.concurrency)))
+        elapsed = time.perf_counter() - started
+
+    total = sum(requests.values())
+    print(f"\n== write throughput: {total} requests in {elapsed:.2f}s ({total / elapsed:.1f} writes/s)")
+    header = f"{'endpoint':<28}{'count':>7}{'err':>6}{'stmts/req':>11}" + "".join(f"{kind:>9}" for kind in KINDS)
+    print(header)
+    print("-" * len(header))
+    for label in sorted(requests):
+        count = requests[label]
+        per_kind = "".join(f"{statements[label][kind] / count:>9.2f}" for kind in KINDS)
+        print(
+            f"{label:<28}{count:>7}{errors[label]:>6}"
+            f"{sum(statements[label].values()) / count:>11.2f}{per_kind}"
+        )
+    print("\nStatement counts include authentication (one SELECT on users per request).")
+
+    return {
+        label: {kind: statements[label][kind] / requests[label] for kind in KINDS}
+        for label in requests
+    }
+
+
+def compare(results: dict, baseline: dict) -> list:
+    """Print statements per request against the baseline; return the endpoints that got worse."""
+    print(f"\n== statements per request vs baseline ({baseline.get('source', 'unknown')})")
+    header = f"{'endpoint':<28}{'before':>9}{'after':>9}{'saved':>9}" + "".join(f"{kind:>9}" for kind in KINDS)
+    print(header)
+    print("-" * len(header))
+    regressions = []
+    for label in sorted(results):
+        before = baseline["endpoints"].get(label)
+        if before is None:
+            print(f"{label:<28}{'-':>9}{sum(results[label].values()):>9.2f}")
+            continue
+        before_total = sum(before.values())
+        after_total = sum(results[label].values())
+        saved_per_kind = "".join(f"{before.get(kind, 0) - results[label][kind]:>+9.2f}" for kind in KINDS)
+        print(f"{label:<28}{before_total:>9.2f}{after_total:>9.2f}{before_total - after_total:>+9.2f}{saved_per_kind}")
+        # Allow for sampling noise in which calls each run happens to make.
+        if after_total > before_total + 0.05:
+            regressions.append(f"{label}: {after_total:.2f} statements per request, baseline {before_total:.2f}")
+    return regressions
+
+
+def main(argv=None):
+    args = run.parse_args(argv)
+    run.configure_environment(args)
+    results = asyncio.run(measure(args))
+
+    if args.save_baseline:
+        with open(args.save_baseline, "w") as f:
+            json.dump({"source": args.database_url, "endpoints": results}, f, indent=2, sort_keys=True)
+        print(f"\nBaseline written to {args.save_baseline}")
+        return 0
+
+    with open(args.baseline or DEFAULT_BASELINE) as f:
+        baseline = json.load(f)
+    regressions = compare(results, baseline)
+    if regressions:
+        print("\nMore statements than the baseline:")
+        for regression in regressions:
+            print(f"  {regression}")
+        return 1
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,224 @@
+"""Hash-partition products by user_id (Postgres only, opt-in)
+
+With `alembic -x partition=true upgrade head`, moves `products` to a
+declarative HASH (user_id) partitioned table without blocking writes for
+the duration of the copy:
+
+1. create `products_partitioned` with the same columns, a (id, user_id)
+   primary key, N hash partitions `products_p0 .. products_pN-1` and a
+   copy of every index `products` has;
+2. mirror every insert/update/delete on `products` into it with a trigger,
+   which also records the keys of removed rows in
+   `products_partition_deleted`;
+3. copy existing rows in id-range batches, each in its own transaction;
+4. drop the copies of rows that were removed while their batch was being
+   copied, using the recorded keys;
+5. under a short ACCESS EXCLUSIVE lock, do the same for rows removed since
+   step 4, then swap the table names. The lock only waits for the writes
+   in progress and covers work proportional to the rows removed during the
+   migration, not to the table. The old table is kept as
+   `products_unpartitioned` so it can be checked and dropped by hand.
+
+Every tenant query filters on `products.user_id = :id`, so Postgres prunes
+to a single partition. Partition count and batch size can be set with
+`-x partitions=32 -x batch_size=100000` (defaults: PRODUCTS_HASH_PARTITIONS
+or 16, and 50000). The tables must already exist (the app creates them on
+startup).
+
+Without `-x partition=true`, and on other databases, this revision is a
+no-op, and the later revisions work on either layout. To partition a
+database that is already past this revision:
+
+    alembic stamp base
+    alembic -x partition=true upgrade 0001_partition_products
+    alembic stamp head
+
+Revision ID: 0001_partition_products
+Revises:
+Create Date: 2026-10-19 09:00:00.000000
+
+"""
+from typing import Sequence, Union
+import os
+import re
+
+from alembic import context, op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = "0001_partition_products"
+down_revision: Union[str, None] = None
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+X_ARGS = context.get_x_argument(as_dictionary=True)
+PARTITION = X_ARGS.get("partition", "false").lower() == "true"
+PARTITIONS = int(X_ARGS.get("partitions", os.getenv("PRODUCTS_HASH_PARTITIONS", "16")))
+BATCH_SIZE = int(X_ARGS.get("batch_size", "50000"))
+
+
+def is_partitioned(bind, table: str) -> bool:
+    return bool(bind.execute(
+        sa.text("SELECT 1 FROM pg_partitioned_table pt JOIN pg_class c ON c.oid = pt.partrelid WHERE c.relname = :table"),
+        {"table": table},
+    ).scalar())
+
+
+def create_hash_partitions(parent: str, prefix: str, partitions: int):
+    """Also meant for future per-tenant tables, e.g. sales, partitioned the same way."""
+    for remainder in range(partitions):
+        op.execute(
+            f"CREATE TABLE {prefix}_p{remainder} PARTITION OF {parent} "
+            f"FOR VALUES WITH (MODULUS {partitions}, REMAINDER {remainder})"
+        )
+
+
+def copy_index_sql(definition: str, name: str) -> str:
+    """An index definition from pg_indexes, renamed and moved to products_partitioned."""
+    return re.sub(
+        r"^CREATE (UNIQUE )?INDEX \S+ ON (ONLY )?(\S+\.)?products ",
+        lambda match: f"CREATE {match.group(1) or ''}INDEX {name} ON products_partitioned ",
+        definition,
+    )
+
+
+# A batch can copy a row that a concurrent transaction is deleting, after
+# the trigger found nothing to delete, so the copy outlives the row. The
+# removed keys are kept to drop those copies; rows that are back in
+# products (moved back to the same user_id) are kept.
+DROP_REMOVED_SQL = (
+    "DELETE FROM products_partitioned p USING products_partition_deleted d "
+    "WHERE p.id = d.id AND p.user_id = d.user_id "
+    "AND NOT EXISTS (SELECT 1 FROM products o WHERE o.id = d.id AND o.user_id = d.user_id)"
+)
+
+
+def upgrade() -> None:
+    bind = op.get_bind()
+    if not PARTITION or bind.dialect.name != "postgresql" or is_partitioned(bind, "products"):
+        return
+
+    inspector = sa.inspect(bind)
+    if not inspector.has_table("products"):
+        raise RuntimeError("products does not exist yet; start the app once to create the schema")
+
+    columns = [column["name"] for column in inspector.get_columns("products")]
+    # Every index but the primary key, including those of later revisions
+    # when partitioning an existing database.
+    old_indexes = bind.execute(sa.text(
+        "SELECT indexname, indexdef FROM pg_indexes "
+        "WHERE schemaname = current_schema() AND tablename = 'products' AND indexname <> 'products_pkey'"
+    )).all()
+    column_list = ", ".join(columns)
+    new_values = ", ".join(f"NEW.{column}" for column in columns)
+    updates = ", ".join(f"{column} = EXCLUDED.{column}" for column in columns if column not in ("id", "user_id"))
+
+    op.execute(
+        "CREATE TABLE products_partitioned ("
+        "LIKE products INCLUDING DEFAULTS INCLUDING CONSTRAINTS INCLUDING STORAGE, "
+        "PRIMARY KEY (id, user_id)"
+        ") PARTITION BY HASH (user_id)"
+    )
+    create_hash_partitions("products_partitioned", "products", PARTITIONS)
+    op.execute(
+        "ALTER TABLE products_partitioned ADD CONSTRAINT products_partitioned_user_id_fkey "
+        "FOREIGN KEY (user_id) REFERENCES users (id) ON DELETE CASCADE"
+    )
+    op.execute(
+        "ALTER TABLE products_partitioned ADD CONSTRAINT products_partitioned_category_id_fkey "
+        "FOREIGN KEY (category_id) REFERENCES categories (id) ON DELETE SET NULL"
+    )
+    for index, definition in old_indexes:
+        op.execute(copy_index_sql(definition, index.replace("products", "products_partitioned", 1)))
+    op.execute("CREATE TABLE products_partition_deleted (id integer NOT NULL, user_id integer NOT NULL)")
+
+    # The trigger upserts the newest row version; the batch copy below never
+    # overwrites, so whichever of the two runs last, the newest version wins.
+    op.execute(f"""
+        CREATE FUNCTION products_partition_mirror() RETURNS trigger AS $$
+        BEGIN
+            IF TG_OP = 'DELETE' OR (TG_OP = 'UPDATE' AND OLD.user_id <> NEW.user_id) THEN
+                DELETE FROM products_partitioned WHERE id = OLD.id AND user_id = OLD.user_id;
+                INSERT INTO products_partition_deleted (id, user_id) VALUES (OLD.id, OLD.user_id);
+            END IF;
+            IF TG_OP IN ('INSERT', 'UPDATE') THEN
+                INSERT INTO products_partitioned ({column_list}) VALUES ({new_values})
+                ON CONFLICT (id, user_id) DO UPDATE SET {updates};
+            END IF;
+            RETURN NULL;
+        END
+        $$ LANGUAGE plpgsql
+    """)
+    op.execute(
+        "CREATE TRIGGER products_partition_mirror AFTER INSERT OR UPDATE OR DELETE ON products "
+        "FOR EACH ROW EXECUTE FUNCTION products_partition_mirror()"
+    )
+
+    with op.get_context().autocommit_block():
+        max_id = bind.execute(sa.text("SELECT COALESCE(MAX(id), 0) FROM products")).scalar()
+        for start in range(0, max_id, BATCH_SIZE):
+            bind.execute(
+                sa.text(
+                    f"INSERT INTO products_partitioned ({column_list}) "
+                    f"SELECT {column_list} FROM products WHERE id > :start AND id <= :end "
+                    "ON CONFLICT (id, user_id) DO NOTHING"
+                ),
+                {"start": start, "end": start + BATCH_SIZE},
+            )
+        bind.execute(sa.text(DROP_REMOVED_SQL))
+
+    op.execute("LOCK TABLE products IN ACCESS EXCLUSIVE MODE")
+    # Again for deletes that committed since, including those whose
+    # transaction was still open during the pass above.
+    op.execute(DROP_REMOVED_SQL)
+    op.execute("DROP TRIGGER products_partition_mirror ON products")
+    op.execute("DROP FUNCTION products_partition_mirror()")
+    op.execute("DROP TABLE products_partition_deleted")
+
+    op.execute("ALTER TABLE products RENAME TO products_unpartitioned")
+    op.execute("ALTER INDEX products_pkey RENAME TO products_unpartitioned_pkey")
+    for index, _ in old_indexes:
+        op.execute(f"ALTER INDEX {index} RENAME TO {index.replace('products', 'products_unpartitioned', 1)}")
+
+    op.execute("ALTER TABLE products_partitioned RENAME TO products")
+    op.execute("ALTER INDEX products_partitioned_pkey RENAME TO products_pkey")
+    for index, _ in old_indexes:
+        op.execute(f"ALTER INDEX {index.replace('products', 'products_partitioned', 1)} RENAME TO {index}")
+    op.execute("ALTER TABLE products RENAME CONSTRAINT products_partitioned_user_id_fkey TO products_user_id_fkey")
+    op.execute(
+        "ALTER TABLE products RENAME CONSTRAINT products_partitioned_category_id_fkey TO products_category_id_fkey"
+    )
+    op.execute("ALTER SEQUENCE products_id_seq OWNED BY products.id")
+
+
+def downgrade() -> None:
+    bind = op.get_bind()
+    if bind.dialect.name != "postgresql" or not is_partitioned(bind, "products"):
+        return
+
+    op.execute("DROP TABLE IF EXISTS products_unpartitioned")
+    op.execute("LOCK TABLE products IN ACCESS EXCLUSIVE MODE")
+    op.execute(
+        "CREATE TABLE products_unpartitioned ("
+        "LIKE products INCLUDING DEFAULTS INCLUDING CONSTRAINTS INCLUDING STORAGE, "
+        "PRIMARY KEY (id)"
+        ")"
+    )
+    op.execute("INSERT INTO products_unpartitioned SELECT * FROM products")
+    op.execute("ALTER SEQUENCE products_id_seq OWNED BY products_unpartitioned.id")
+    op.execute("DROP TABLE products")
+
+    op.execute("ALTER TABLE products_unpartitioned RENAME TO products")
+    op.execute("ALTER INDEX products_unpartitioned_pkey RENAME TO products_pkey")
+    op.execute(
+        "ALTER TABLE products ADD CONSTRAINT products_user_id_fkey "
+        "FOREIGN KEY (user_id) REFERENCES users (id) ON DELETE CASCADE"
+    )
+    op.execute(
+        "ALTER TABLE products ADD CONSTRAINT products_category_id_fkey "
+        "FOREIGN KEY (category_id) REFERENCES categories (id) ON DELETE SET NULL"
+    )
+    op.execute("CREATE INDEX ix_products_id ON products (id)")
+    op.execute("CREATE INDEX ix_products_name ON products (name)")
+    op.execute("CREATE INDEX ix_products_user_id ON products (user_id)")
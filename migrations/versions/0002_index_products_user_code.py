@@ -0,0 +1,68 @@
+"""Index products by (user_id, code)
+
+Backs GET /products/by-code/{code} and POST /products/resolve-codes. On
+Postgres the index is built with CREATE INDEX CONCURRENTLY, so writes
+continue while it builds. Partitioned tables don't support CONCURRENTLY,
+so there the index is built normally, one partition at a time.
+
+`alembic -x unique_codes=true upgrade head` also makes codes unique per
+user. The migration fails, listing a few offenders, if any user already
+has duplicate codes.
+
+Revision ID: 0002_products_user_code
+Revises: 0001_partition_products
+Create Date: 2026-10-19 14:00:00.000000
+
+"""
+from typing import Sequence, Union
+
+from alembic import context, op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = "0002_products_user_code"
+down_revision: Union[str, None] = "0001_partition_products"
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+X_ARGS = context.get_x_argument(as_dictionary=True)
+UNIQUE_CODES = X_ARGS.get("unique_codes", "false").lower() == "true"
+
+
+def is_partitioned(bind, table: str) -> bool:
+    return bool(bind.execute(
+        sa.text("SELECT 1 FROM pg_partitioned_table pt JOIN pg_class c ON c.oid = pt.partrelid WHERE c.relname = :table"),
+        {"table": table},
+    ).scalar())
+
+
+def create_index(bind, name: str, columns: str, unique: bool = False):
+    unique_sql = "UNIQUE " if unique else ""
+    if bind.dialect.name != "postgresql":
+        op.execute(f"CREATE {unique_sql}INDEX IF NOT EXISTS {name} ON products ({columns})")
+    elif is_partitioned(bind, "products"):
+        op.execute(f"CREATE {unique_sql}INDEX IF NOT EXISTS {name} ON products ({columns})")
+    else:
+        with op.get_context().autocommit_block():
+            op.execute(f"CREATE {unique_sql}INDEX CONCURRENTLY IF NOT EXISTS {name} ON products ({columns})")
+
+
+def upgrade() -> None:
+    bind = op.get_bind()
+    create_index(bind, "ix_products_user_id_code", "user_id, code")
+
+    if UNIQUE_CODES:
+        duplicates = bind.execute(sa.text(
+            "SELECT user_id, code, COUNT(*) FROM products "
+            "GROUP BY user_id, code HAVING COUNT(*) > 1 LIMIT 10"
+        )).all()
+        if duplicates:
+            listed = ", ".join(f"user {user_id} code {code!r} ({count}x)" for user_id, code, count in duplicates)
+            raise RuntimeError(f"Cannot make product codes unique per user, duplicates exist: {listed}")
+        create_index(bind, "uq_products_user_id_code", "user_id, code", unique=True)
+
+
+def downgrade() -> None:
+    op.execute("DROP INDEX IF EXISTS uq_products_user_id_code")
+    op.execute("DROP INDEX IF EXISTS ix_products_user_id_code")
@@ -0,0 +1,58 @@
+"""Prefix-search indexes for product suggestions (Postgres only)
+
+Backs GET /products/suggest, which matches `lower(name) LIKE 'abc%'` or
+`lower(code) LIKE 'abc%'` within one user's products. text_pattern_ops lets
+Postgres use a btree for LIKE prefixes under any collation. The indexes
+are built concurrently unless products is partitioned. On other databases
+this revision is a no-op.
+
+Revision ID: 0003_products_prefix_search
+Revises: 0002_products_user_code
+Create Date: 2026-10-19 15:00:00.000000
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = "0003_products_prefix_search"
+down_revision: Union[str, None] = "0002_products_user_code"
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+INDEXES = {
+    "ix_products_user_id_name_prefix": "user_id, lower(name) text_pattern_ops",
+    "ix_products_user_id_code_prefix": "user_id, lower(code) text_pattern_ops",
+}
+
+
+def is_partitioned(bind, table: str) -> bool:
+    return bool(bind.execute(
+        sa.text("SELECT 1 FROM pg_partitioned_table pt JOIN pg_class c ON c.oid = pt.partrelid WHERE c.relname = :table"),
+        {"table": table},
+    ).scalar())
+
+
+def upgrade() -> None:
+    bind = op.get_bind()
+    if bind.dialect.name != "postgresql":
+        return
+
+    if is_partitioned(bind, "products"):
+        for name, columns in INDEXES.items():
+            op.execute(f"CREATE INDEX IF NOT EXISTS {name} ON products ({columns})")
+        return
+
+    with op.get_context().autocommit_block():
+        for name, columns in INDEXES.items():
+            op.execute(f"CREATE INDEX CONCURRENTLY IF NOT EXISTS {name} ON products ({columns})")
+
+
+def downgrade() -> None:
+    if op.get_bind().dialect.name != "postgresql":
+        return
+    for name in INDEXES:
+        op.execute(f"DROP INDEX IF EXISTS {name}")
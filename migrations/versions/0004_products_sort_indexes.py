@@ -0,0 +1,67 @@
+"""Indexes for sorted product pages
+
+GET /products always sorts by its keys plus products.id. A
+(user_id, <key>, id) index per sortable column lets Postgres read a page
+in order within the tenant instead of sorting the whole catalogue. For
+order_by=category, (user_id, name) on categories and
+(user_id, category_id, id) on products let it walk categories by name and
+fetch each one's products in id order.
+
+Product indexes are built concurrently unless products is partitioned.
+
+Revision ID: 0004_products_sort_indexes
+Revises: 0003_products_prefix_search
+Create Date: 2026-10-19 16:00:00.000000
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = "0004_products_sort_indexes"
+down_revision: Union[str, None] = "0003_products_prefix_search"
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+PRODUCT_INDEXES = {
+    "ix_products_user_id_name_id": "user_id, name, id",
+    "ix_products_user_id_price_id": "user_id, price, id",
+    "ix_products_user_id_stock_id": "user_id, stock, id",
+    "ix_products_user_id_sales_id": "user_id, sales, id",
+    "ix_products_user_id_category_id_id": "user_id, category_id, id",
+}
+CATEGORY_INDEXES = {
+    "ix_categories_user_id_name": "user_id, name",
+}
+
+
+def is_partitioned(bind, table: str) -> bool:
+    return bool(bind.execute(
+        sa.text("SELECT 1 FROM pg_partitioned_table pt JOIN pg_class c ON c.oid = pt.partrelid WHERE c.relname = :table"),
+        {"table": table},
+    ).scalar())
+
+
+def create_indexes(bind, table: str, indexes: dict):
+    if bind.dialect.name != "postgresql" or is_partitioned(bind, table):
+        for name, columns in indexes.items():
+            op.execute(f"CREATE INDEX IF NOT EXISTS {name} ON {table} ({columns})")
+        return
+
+    with op.get_context().autocommit_block():
+        for name, columns in indexes.items():
+            op.execute(f"CREATE INDEX CONCURRENTLY IF NOT EXISTS {name} ON {table} ({columns})")
+
+
+def upgrade() -> None:
+    bind = op.get_bind()
+    create_indexes(bind, "products", PRODUCT_INDEXES)
+    create_indexes(bind, "categories", CATEGORY_INDEXES)
+
+
+def downgrade() -> None:
+    for name in list(PRODUCT_INDEXES) + list(CATEGORY_INDEXES):
+        op.execute(f"DROP INDEX IF EXISTS {name}")
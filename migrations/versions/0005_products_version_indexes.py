@@ -0,0 +1,53 @@
+"""Indexes for the reorder suggestions cache check
+
+app/reorder.py checks whether a tenant's cached suggestions are still
+current from its product count and latest created_at and updated_at.
+(user_id, created_at) and (user_id, updated_at) indexes answer the two
+maxima with one index probe each instead of reading the tenant's rows.
+
+Built concurrently unless products is partitioned.
+
+Revision ID: 0005_products_version_indexes
+Revises: 0004_products_sort_indexes
+Create Date: 2026-10-19 18:00:00.000000
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = "0005_products_version_indexes"
+down_revision: Union[str, None] = "0004_products_sort_indexes"
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+INDEXES = {
+    "ix_products_user_id_created_at": "user_id, created_at",
+    "ix_products_user_id_updated_at": "user_id, updated_at",
+}
+
+
+def is_partitioned(bind) -> bool:
+    return bool(bind.execute(
+        sa.text("SELECT 1 FROM pg_partitioned_table pt JOIN pg_class c ON c.oid = pt.partrelid WHERE c.relname = 'products'")
+    ).scalar())
+
+
+def upgrade() -> None:
+    bind = op.get_bind()
+    if bind.dialect.name != "postgresql" or is_partitioned(bind):
+        for name, columns in INDEXES.items():
+            op.execute(f"CREATE INDEX IF NOT EXISTS {name} ON products ({columns})")
+        return
+
+    with op.get_context().autocommit_block():
+        for name, columns in INDEXES.items():
+            op.execute(f"CREATE INDEX CONCURRENTLY IF NOT EXISTS {name} ON products ({columns})")
+
+
+def downgrade() -> None:
+    for name in INDEXES:
+        op.execute(f"DROP INDEX IF EXISTS {name}")
@@ -1,361 +1,211 @@
-from datetime import datetime, timedelta
-from sqlalchemy.orm import Session
-from app.models import Product, Category, User
-from sqlalchemy.exc import SQLAlchemyError
-from app.database import SessionLocal 
-
-EMAIL = "natan@gmail.com"
-
-def seed_database(db: Session):
-   
-    try:
-        with db.begin():  
-            user = db.query(User).filter(User.email == EMAIL ).first()
-            category_names = [
-                "Electronics", "Books", "Clothing", "Food", 
-                "Toys", "Sports", "Furniture", "Beauty"
-            ]
-            categories = []
-            for name in category_names:
-                category = Category(name=name, user_id=user.id) 
-                db.add(category)
-                categories.append(category)
-            db.commit()
-    except SQLAlchemyError as e:
-        print("An error occurred during seeding. Rolling back...")
-        print(str(e))
-
-    try:
-        with db.begin():
-            products = [
-                {
-                    "name": "Wireless Mouse",
-                    "description": "A sleek and ergonomic wireless mouse with adjustable DPI.",
-                    "price": 25.99,
-                    "stock": 100,
-                    "sales": 15,
-                    "code": "PROD-1",
-                    "category_id": 1,
-                    "fake_created_at": "2024-11-01T09:00:00Z"
-                },
-                {
-                    "name": "Gaming Keyboard",
-                    "description": "RGB backlit keyboard with mechanical switches.",
-                    "price": 49.99,
-                    "stock": 50,
-                    "sales": 10,
-                    "code": "PROD-2",
-                    "category_id": 1,
-                    "fake_created_at": "2024-11-02T10:30:00Z"
-                },
-                {
-                    "name": "Noise Cancelling Headphones",
-                    "description": "Premium headphones with active noise cancellation.",
-                    "price": 199.99,
-                    "stock": 30,
-                    "sales": 8,
-                    "code": "PROD-3",
-                    "category_id": 1,
-                    "fake_created_at": "2024-11-03T12:15:00Z"
-                },
-                {
-                    "name": "E-Reader",
-                    "description": "Lightweight e-reader with high-resolution display.",
-                    "price": 129.99,
-                    "stock": 20,
-                    "sales": 12,
-                    "code": "PROD-4",
-                    "category_id": 2,
-                    "fake_created_at": "2024-11-04T14:00:00Z"
-                },
-                {
-                    "name": "Classic Novel",
-                    "description": "A timeless classic, perfect for any library.",
-                    "price": 9.99,
-                    "stock": 200,
-                    "sales": 50,
-                    "code": "PROD-5",
-                    "category_id": 2,
-                    "fake_created_at": "2024-11-05T15:45:00Z"
-                },
-                {
-                    "name": "Stylish Backpack",
-                    "description": "Durable backpack with multiple compartments.",
-                    "price": 39.99,
-                    "stock": 70,
-                    "sales": 20,
-                    "code": "PROD-6",
-                    "category_id": 3,
-                    "fake_created_at": "2024-11-06T17:30:00Z"
-                },
-                {
-                    "name": "Running Shoes",
-                    "description": "Lightweight running shoes with superior cushioning.",
-                    "price": 89.99,
-                    "stock": 60,
-                    "sales": 30,
-                    "code": "PROD-7",
-                    "category_id": 3,
-                    "fake_created_at": "2024-11-07T09:15:00Z"
-                },
-                {
-                    "name": "Yoga Mat",
-                    "description": "Eco-friendly, non-slip yoga mat.",
-                    "price": 19.99,
-                    "stock": 150,
-                    "sales": 25,
-                    "code": "PROD-8",
-                    "category_id": 3,
-                    "fake_created_at": "2024-11-08T11:45:00Z"
-                },
-                {
-                    "name": "Organic Coffee Beans",
-                    "description": "Rich and aromatic, sourced from sustainable farms.",
-                    "price": 14.99,
-                    "stock": 80,
-                    "sales": 35,
-                    "code": "PROD-9",
-                    "category_id": 4,
-                    "fake_created_at": "2024-11-09T14:20:00Z"
-                },
-                {
-                    "name": "Chocolate Bar Pack",
-                    "description": "Assorted premium chocolate bars.",
-                    "price": 12.99,
-                    "stock": 120,
-                    "sales": 60,
-                    "code": "PROD-10",
-                    "category_id": 4,
-                    "fake_created_at": "2024-11-10T16:50:00Z"
-                },
-                {
-                    "name": "RC Drone",
-                    "description": "Compact and lightweight drone with HD camera.",
-                    "price": 99.99,
-                    "stock": 40,
-                    "sales": 15,
-                    "code": "PROD-11",
-                    "category_id": 5,
-                    "fake_created_at": "2024-11-11T09:00:00Z"
-                },
-                {
-                    "name": "Toy Building Blocks",
-                    "description": "Fun and creative building blocks for kids.",
-                    "price": 29.99,
-                    "stock": 90,
-                    "sales": 40,
-                    "code": "PROD-12",
-                    "category_id": 5,
-                    "fake_created_at": "2024-11-12T10:30:00Z"
-                },
-                {
-                    "name": "Soccer Ball",
-                    "description": "Professional-grade soccer ball.",
-                    "price": 24.99,
-                    "stock": 110,
-                    "sales": 50,
-                    "code": "PROD-13",
-                    "category_id": 6,
-                    "fake_created_at": "2024-11-13T12:00:00Z"
-                },
-                {
-                    "name": "Tennis Racket",
-                    "description": "Lightweight and durable tennis racket.",
-                    "price": 89.99,
-                    "stock": 30,
-                    "sales": 12,
-                    "code": "PROD-14",
-                    "category_id": 6,
-                    "fake_created_at": "2024-11-14T13:45:00Z"
-                },
-                {
-                    "name": "Office Desk",
-                    "description": "Stylish and ergonomic desk for home office.",
-                    "price": 149.99,
-                    "stock": 8,
-                    "sales": 8,
-                    "code": "PROD-15",
-                    "category_id": 7,
-                    "fake_created_at": "2024-11-15T15:30:00Z"
-                },
-                {
-                    "name": "Office Chair",
-                    "description": "Comfortable chair with lumbar support.",
-                    "price": 99.99,
-                    "stock": 45,
-                    "sales": 20,
-                    "code": "PROD-16",
-                    "category_id": 7,
-                    "fake_created_at": "2024-11-16T09:00:00Z"
-                },
-                {
-                    "name": "Lipstick",
-                    "description": "Long-lasting and vibrant shades.",
-                    "price": 14.99,
-                    "stock": 100,
-                    "sales": 30,
-                    "code": "PROD-17",
-                    "category_id": 8,
-                    "fake_created_at": "2024-10-17T11:30:00Z"
-                },
-                {
-                    "name": "Skincare Set",
-                    "description": "Hydrating and rejuvenating skincare products.",
-                    "price": 39.99,
-                    "stock": 60,
-                    "sales": 15,
-                    "code": "PROD-18",
-                    "category_id": 8,
-                    "fake_created_at": "2024-10-18T13:00:00Z"
-                },
-                {
-                    "name": "Fitness Tracker",
-                    "description": "Track your daily activity, heart rate, and sleep patterns.",
-                    "price": 59.99,
-                    "stock": 70,
-                    "sales": 25,
-                    "code": "PROD-19",
-                    "category_id": 6,
-                    "fake_created_at": "2024-10-19T10:15:00Z"
-                },
-                {
-                    "name": "Bluetooth Speaker",
-                    "description": "Portable speaker with high-quality sound and bass.",
-                    "price": 34.99,
-                    "stock": 80,
-                    "sales": 40,
-                    "code": "PROD-20",
-                    "category_id": 1,
-                    "fake_created_at": "2024-10-20T12:45:00Z"
-                },
-                {
-                    "name": "Cookware Set",
-                    "description": "Non-stick cookware set with durable build.",
-                    "price": 89.99,
-                    "stock": 50,
-                    "sales": 12,
-                    "code": "PROD-21",
-                    "category_id": 4,
-                    "fake_created_at": "2024-10-21T15:00:00Z"
-                },
-                {
-                    "name": "Smartphone",
-                    "description": "Latest model with cutting-edge technology.",
-                    "price": 699.99,
-                    "stock": 5,
-                    "sales": 5,
-                    "code": "PROD-22",
-                    "category_id": 1,
-                    "fake_created_at": "2024-10-22T09:30:00Z"
-                },
-                {
-                    "name": "LED Desk Lamp",
-                    "description": "Adjustable lamp with brightness control.",
-                    "price": 19.99,
-                    "stock": 120,
-                    "sales": 35,
-                    "code": "PROD-23",
-                    "category_id": 7,
-                    "fake_created_at": "2024-10-23T11:15:00Z"
-                },
-                {
-                    "name": "Wireless Charger",
-                    "description": "Fast wireless charger compatible with most devices.",
-                    "price": 24.99,
-                    "stock": 90,
-                    "sales": 20,
-                    "code": "PROD-24",
-                    "category_id": 1,
-                    "fake_created_at": "2024-10-24T13:00:00Z"
-                },
-                {
-                    "name": "Facial Cleanser",
-                    "description": "Gentle facial cleanser for all skin types.",
-                    "price": 14.99,
-                    "stock": 100,
-                    "sales": 30,
-                    "code": "PROD-25",
-                    "category_id": 8,
-                    "fake_created_at": "2024-10-25T14:30:00Z"
-                },
-                {
-                    "name": "Board Game",
-                    "description": "Entertaining and fun board game for all ages.",
-                    "price": 29.99,
-                    "stock": 60,
-                    "sales": 15,
-                    "code": "PROD-26",
-                    "category_id": 5,
-                    "fake_created_at": "2024-10-26T10:00:00Z"
-                },
-                {
-                    "name": "Electric Kettle",
-                    "description": "Fast boiling kettle with auto shut-off.",
-                    "price": 39.99,
-                    "stock": 50,
-                    "sales": 18,
-                    "code": "PROD-27",
-                    "category_id": 4,
-                    "fake_created_at": "2024-10-27T12:00:00Z"
-                },
-                {
-                    "name": "Treadmill",
-                    "description": "Compact treadmill with multiple speed settings.",
-                    "price": 499.99,
-                    "stock": 9,
-                    "sales": 3,
-                    "code": "PROD-28",
-                    "category_id": 6,
-                    "fake_created_at": "2024-10-28T09:00:00Z"
-                },
-                {
-                    "name": "Leather Jacket",
-                    "description": "Classic leather jacket with premium quality.",
-                    "price": 199.99,
-                    "stock": 30,
-                    "sales": 8,
-                    "code": "PROD-29",
-                    "category_id": 3,
-                    "fake_created_at": "2024-10-29T11:30:00Z"
-                },
-                {
-                    "name": "Hair Dryer",
-                    "description": "High-speed hair dryer with ionic technology.",
-                    "price": 49.99,
-                    "stock": 70,
-                    "sales": 22,
-                    "code": "PROD-30",
-                    "category_id": 8,
-                    "fake_created_at": "2024-10-30T14:15:00Z"
-                }
-            ]
-
-            for product_data in products:
-                fake_created_at = datetime.fromisoformat(product_data["fake_created_at"].replace("Z", "+00:00"))
-                user = db.query(User).filter(User.email == EMAIL ).first()
-                product = Product(
-                    name=product_data["name"],
-                    description=product_data["description"],
-                    price=product_data["price"],
-                    stock=product_data["stock"],
-                    sales=product_data["sales"],
-                    code=product_data["code"],
-                    category_id=product_data["category_id"],
-                    user_id=user.id,
-                    created_at=fake_created_at,
-                )
-                db.add(product)
-            
-            db.commit()
-            print("Database seeded successfully!")
-    except SQLAlchemyError as e:
-        print("An error occurred during seeding. Rolling back...")
-        print(str(e))
+"""
+Synthetic data generator for local load testing and benchmarks.
+
+Creates users, categories per user and products with skewed (long-tailed)
+distributions of tenant size, price, stock, sales and created_at. Rows are
+written with bulk executemany inserts in batches.
+
+created_at is counted back from --anchor, which defaults to today, so runs
+on different days differ. Pass --anchor as well as --seed to reproduce the
+same data, e.g. for benchmark baselines.
+
+Examples:
+    python seed.py --users 10 --products-per-user 200
+    python seed.py --users 10 --products-per-user 200 --seed 7 --anchor 2026-01-01
+    python seed.py --users 2000 --products-per-user 1000 --batch-size 20000
+    python seed.py --email natan@gmail.com --products-per-user 30
+"""
+import argparse
+import random
+import time
+from datetime import datetime, timedelta, timezone
+
+from sqlalchemy import insert, select
+from sqlalchemy.engine import Connection
+
+from app.auth import get_password_hash
+from app.database import engine
+from app.models import Base, Category, Product, User
+
+DEFAULT_PASSWORD = "password123"
+DEFAULT_PROFILE_IMAGE = "uploads/profile_images/Profile-picture-created-with-ai.jpeg"
+
+CATEGORY_NAMES = [
+    "Electronics", "Books", "Clothing", "Food", "Toys", "Sports", "Furniture", "Beauty",
+    "Garden", "Automotive", "Office", "Music", "Pets", "Health", "Kitchen", "Jewelry",
+]
+
+ADJECTIVES = [
+    "Wireless", "Classic", "Premium", "Compact", "Organic", "Portable", "Ergonomic", "Smart",
+    "Vintage", "Lightweight", "Durable", "Deluxe", "Eco", "Professional", "Mini", "Ultra",
+]
+
+NOUNS = [
+    "Mouse", "Keyboard", "Headphones", "Novel", "Backpack", "Running Shoes", "Yoga Mat",
+    "Coffee Beans", "Chocolate Bar", "Drone", "Building Blocks", "Soccer Ball", "Desk",
+    "Chair", "Lipstick", "Skincare Set", "Fitness Tracker", "Speaker", "Cookware Set",
+    "Smartphone", "Desk Lamp", "Charger", "Board Game", "Kettle", "Treadmill", "Jacket",
+    "Hair Dryer", "Water Bottle", "Notebook", "Watch",
+]
+
+DESCRIPTIONS = [
+    "A sleek and ergonomic design for everyday use.",
+    "Premium quality with a two-year warranty.",
+    "Lightweight, durable and easy to clean.",
+    "Best seller in its category, loved by customers.",
+    "Eco-friendly materials sourced from sustainable suppliers.",
+    "Compact size, perfect for travel.",
+]
+
+
+def tenant_sizes(rng: random.Random, users: int, mean: int, skew: float):
+    """Split users * mean products across tenants with Zipf-like weights."""
+    if skew <= 0:
+        return [mean] * users
+    weights = [1.0 / (rank ** skew) for rank in range(1, users + 1)]
+    rng.shuffle(weights)
+    scale = users * mean / sum(weights)
+    return [max(1, int(round(w * scale))) for w in weights]
+
+
+def product_row(rng: random.Random, user_id: int, category_ids, n: int, anchor: datetime):
+    price = round(min(max(rng.lognormvariate(3.3, 1.0), 0.5), 20000.0), 2)
+    # Pareto: most products sell little, a few sell a lot.
+    sales = int((rng.paretovariate(1.16) - 1.0) * 12)
+    # ~5% of the catalogue is out of stock, the rest is exponentially distributed.
+    stock = 0 if rng.random() < 0.05 else int(rng.expovariate(1 / 60.0))
+    # Recent products are more common than old ones; capped at two years.
+    age_days = min(rng.expovariate(1 / 120.0), 730.0)
+    created_at = anchor - timedelta(days=age_days)
+
+    return {
+        "name": f"{rng.choice(ADJECTIVES)} {rng.choice(NOUNS)} {n % 1000}",
+        "description": rng.choice(DESCRIPTIONS) if rng.random() < 0.8 else None,
+        "price": price,
+        "stock": stock,
+        "sales": sales,
+        "image": None,
+        "code": f"SKU-{user_id}-{n:07d}",
+        "category_id": rng.choice(category_ids) if category_ids and rng.random() < 0.95 else None,
+        "user_id": user_id,
+        "created_at": created_at,
+    }
+
+
+def insert_users(conn: Connection, args, hashed_password: str):
+    rows = [
+        {
+            "name": f"Load User {i}",
+            "email": f"{args.email_prefix}{i}@{args.email_domain}",
+            "profile_image": DEFAULT_PROFILE_IMAGE,
+            "hashed_password": hashed_password,
+        }
+        for i in range(args.users)
+    ]
+    user_ids = []
+    for start in range(0, len(rows), args.batch_size):
+        result = conn.execute(
+            insert(User).returning(User.id, sort_by_parameter_order=True),
+            rows[start:start + args.batch_size],
+        )
+        user_ids.extend(result.scalars().all())
+    return user_ids
+
+
+def insert_categories(conn: Connection, user_ids, args):
+    rows = [
+        {
+            "name": CATEGORY_NAMES[i % len(CATEGORY_NAMES)]
+            + ("" if i < len(CATEGORY_NAMES) else f" {i // len(CATEGORY_NAMES) + 1}"),
+            "description": None,
+            "user_id": user_id,
+        }
+        for user_id in user_ids
+        for i in range(args.categories_per_user)
+    ]
+    category_ids = {user_id: [] for user_id in user_ids}
+    for start in range(0, len(rows), args.batch_size):
+        result = conn.execute(
+            insert(Category).returning(Category.id, Category.user_id, sort_by_parameter_order=True),
+            rows[start:start + args.batch_size],
+        )
+        for category_id, user_id in result:
+            category_ids[user_id].append(category_id)
+    return category_ids
+
+
+def insert_products(conn: Connection, rng: random.Random, user_ids, category_ids, sizes, args, anchor):
+    batch = []
+    total = 0
+    started = time.perf_counter()
+
+    for user_id, size in zip(user_ids, sizes):
+        for n in range(size):
+            batch.append(product_row(rng, user_id, category_ids[user_id], n, anchor))
+            if len(batch) >= args.batch_size:
+                conn.execute(insert(Product), batch)
+                total += len(batch)
+                batch = []
+                elapsed = time.perf_counter() - started
+                print(f"  {total} products ({total / elapsed:.0f} rows/s)")
+
+    if batch:
+        conn.execute(insert(Product), batch)
+        total += len(batch)
+    return total
+
+
+def generate(args):
+    rng = random.Random(args.seed)
+    anchor = (
+        datetime.fromisoformat(args.anchor).replace(tzinfo=timezone.utc)
+        if args.anchor
+        else datetime.now(timezone.utc).replace(hour=0, minute=0, second=0, microsecond=0)
+    )
+
+    Base.metadata.create_all(bind=engine)
+    started = time.perf_counter()
+
+    with engine.begin() as conn:
+        if args.email:
+            user_id = conn.execute(select(User.id).where(User.email == args.email)).scalar()
+            if user_id is None:
+                raise SystemExit(f"User {args.email} not found")
+            user_ids = [user_id]
+        else:
+            # bcrypt is deliberately slow, so every generated user shares one hash.
+            user_ids = insert_users(conn, args, get_password_hash(args.password))
+        print(f"{len(user_ids)} users")
+
+        category_ids = insert_categories(conn, user_ids, args)
+        print(f"{sum(len(ids) for ids in category_ids.values())} categories")
+
+        sizes = tenant_sizes(rng, len(user_ids), args.products_per_user, args.tenant_skew)
+        total = insert_products(conn, rng, user_ids, category_ids, sizes, args, anchor)
+
+    elapsed = time.perf_counter() - started
+    print(f"Database seeded successfully! {total} products in {elapsed:.1f}s")
+    return user_ids
+
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description="Generate synthetic MyProducts data")
+    parser.add_argument("--users", type=int, default=1, help="Number of users to create")
+    parser.add_argument("--categories-per-user", type=int, default=8)
+    parser.add_argument("--products-per-user", type=int, default=30, help="Mean products per user")
+    parser.add_argument("--tenant-skew", type=float, default=1.1,
+                        help="Zipf exponent for tenant sizes (0 = every user gets the same amount)")
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--anchor", default=None,
+                        help="ISO date used as 'now' for created_at (default: today, UTC); "
+                             "required for runs to be reproducible")
+    parser.add_argument("--batch-size", type=int, default=10000)
+    parser.add_argument("--email", default=None, help="Add data for an existing user instead of creating users")
+    parser.add_argument("--email-prefix", default="loaduser")
+    parser.add_argument("--email-domain", default="example.com")
+    parser.add_argument("--password", default=DEFAULT_PASSWORD)
+    return parser.parse_args(argv)
 
 
 if __name__ == "__main__":
-    db = SessionLocal()
-    try:
-        seed_database(db)
-    finally:
-        db.close()
\ No newline at end of file
+    generate(parse_args())
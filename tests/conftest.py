@@ -0,0 +1,67 @@
+import os
+import tempfile
+
+# app/ reads its configuration at import time.
+TEST_DIR = tempfile.mkdtemp(prefix="myproducts-test-")
+os.environ["DATABASE_URL"] = f"sqlite:///{os.path.join(TEST_DIR, 'test.db')}"
+os.environ["DATABASE_REPLICA_URLS"] = ""
+os.environ["SECRET_KEY"] = "test-secret"
+os.environ["AUTH_ALGORITHM"] = "HS256"
+os.environ["ACCESS_TOKEN_EXPIRE_MINUTES"] = "60"
+os.environ["ALLOWED_ORIGINS"] = "*"
+os.environ["STORAGE_BACKEND"] = "local"
+os.environ["LOCAL_STORAGE_DIR"] = os.path.join(TEST_DIR, "uploads")
+os.environ["ADMISSION_ENABLED"] = "false"
+# Low enough that typical JSON responses go through compression.
+os.environ["COMPRESSION_MIN_SIZE"] = "100"
+for name in ("STORAGE_GC_INTERVAL_SECONDS", "INVENTORY_SNAPSHOT_INTERVAL_SECONDS", "REORDER_REFRESH_INTERVAL_SECONDS"):
+    os.environ[name] = "0"
+
+import shutil
+
+import pytest
+from fastapi.testclient import TestClient
+
+from app import models
+from app.database import engine
+from app.main import app
+
+PNG = b"\x89PNG\r\n\x1a\n" + b"\x00" * 32
+
+
+@pytest.fixture(autouse=True)
+def database():
+    models.Base.metadata.drop_all(bind=engine)
+    models.Base.metadata.create_all(bind=engine)
+    shutil.rmtree(os.environ["LOCAL_STORAGE_DIR"], ignore_errors=True)
+    yield
+
+
+@pytest.fixture
+def client():
+    with TestClient(app) as client:
+        yield client
+
+
+def sign_up(client, email="alice@example.com", name="Alice", image=PNG):
+    response = client.post(
+        "/users/",
+        data={"name": name, "email": email, "password": "password123"},
+        files={"profile_image": ("avatar.png", image, "image/png")},
+    )
+    assert response.status_code == 200, response.text
+    token = client.post("/users/token", data={"username": email, "password": "password123"}).json()["access_token"]
+    return {"Authorization": f"Bearer {token}"}
+
+
+@pytest.fixture
+def auth(client):
+    return sign_up(client)
+
+
+def create_product(client, auth, **fields):
+    data = {"name": "Widget", "price": "10", "stock": "5", "code": "W-1"}
+    data.update({key: str(value) for key, value in fields.items()})
+    response = client.post("/products/", data=data, headers=auth)
+    assert response.status_code == 200, response.text
+    return response.json()
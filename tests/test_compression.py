@@ -0,0 +1,34 @@
+import asyncio
+import gzip
+
+from app.compression import CompressionMiddleware
+
+BODY = b'{"name": "Widget"}' * 100
+
+
+def test_compression_leaves_the_inner_start_message_alone():
+    start = {
+        "type": "http.response.start",
+        "status": 200,
+        "headers": [(b"content-type", b"application/json"), (b"content-length", str(len(BODY)).encode())],
+    }
+    original_headers = list(start["headers"])
+
+    async def endpoint(scope, receive, send):
+        await send(start)
+        await send({"type": "http.response.body", "body": BODY})
+
+    sent = []
+
+    async def send(message):
+        sent.append(message)
+
+    async def receive():
+        return {"type": "http.request", "body": b"", "more_body": False}
+
+    scope = {"type": "http", "method": "GET", "path": "/", "headers": [(b"accept-encoding", b"gzip")]}
+    asyncio.run(CompressionMiddleware(endpoint)(scope, receive, send))
+
+    assert start["headers"] == original_headers
+    assert (b"content-encoding", b"gzip") in sent[0]["headers"]
+    assert gzip.decompress(sent[1]["body"]) == BODY
@@ -0,0 +1,70 @@
+from datetime import timedelta
+from time import monotonic
+
+import pytest
+from sqlalchemy import select
+from starlette.requests import Request
+
+from app import database
+from app.auth import create_access_token
+from app.models import User
+
+
+def request_for(email, expires=timedelta(minutes=30)):
+    token = create_access_token({"sub": email}, expires)
+    return Request({"type": "http", "headers": [(b"authorization", f"Bearer {token}".encode())]})
+
+
+@pytest.fixture
+def router(monkeypatch, tmp_path):
+    def make(url):
+        router = database.ReplicaRouter([url])
+        # Skip the lag check, so the replica counts as healthy until it fails.
+        router.replicas[0].checked_at = monotonic()
+        monkeypatch.setattr(database, "replicas", router)
+        return router
+    return make
+
+
+def test_failed_replica_statement_is_retried_on_the_primary(router, tmp_path):
+    router = router(f"sqlite:///{tmp_path}/missing/replica.db")
+    replica = router.replicas[0]
+
+    dependency = database.get_read_db(request_for("alice@example.com"))
+    db = next(dependency)
+    assert db.info["replica"] is replica
+
+    assert db.execute(select(User)).all() == []
+    assert db.info["replica"] is None
+    assert not replica.available
+    dependency.close()
+
+
+def test_read_your_writes_follows_the_user_across_tokens(router):
+    router = router(database.DATABASE_URL)
+
+    dependency = database.get_db(request_for("alice@example.com"))
+    db = next(dependency)
+    db.execute(select(User))
+    db.commit()
+    dependency.close()
+
+    # Another device of the same user, with a different token.
+    db, replica = database.open_read_session(request_for("alice@example.com", timedelta(minutes=5)))
+    db.close()
+    assert replica is None
+
+    db, replica = database.open_read_session(request_for("bob@example.com"))
+    db.close()
+    assert replica is router.replicas[0]
+
+
+def test_read_your_writes_holds_across_workers(router):
+    router = router(database.DATABASE_URL)
+    router.mark_write("alice@example.com")
+
+    # A second worker process, with its own router.
+    other = database.ReplicaRouter([database.DATABASE_URL])
+    other.replicas[0].checked_at = monotonic()
+    assert other.choose("alice@example.com") is None
+    assert other.choose("bob@example.com") is other.replicas[0]
@@ -0,0 +1,81 @@
+import os
+import time
+from datetime import datetime, timedelta, timezone
+
+from conftest import create_product
+
+from app import exports
+from app.database import SessionLocal
+from app.models import ExportJob
+from app.supabase import LOCAL_STORAGE_DIR
+
+
+def wait_for(client, auth, job_id):
+    for _ in range(100):
+        job = client.get(f"/reports/exports/{job_id}", headers=auth).json()
+        if job["status"] in ("done", "failed"):
+            return job
+        time.sleep(0.05)
+    raise AssertionError("export did not finish")
+
+
+def test_export_is_uploaded(client, auth):
+    create_product(client, auth)
+    response = client.post("/reports/exports", json={"report": "inventory"}, headers=auth)
+    assert response.status_code == 202
+
+    job = wait_for(client, auth, response.json()["id"])
+    assert job["status"] == "done"
+    assert job["rows_written"] == 1
+    user_id = client.get("/users/me/", headers=auth).json()["id"]
+    with open(os.path.join(LOCAL_STORAGE_DIR, exports.EXPORT_BUCKET, f"{user_id}_{job['id']}.csv")) as f:
+        assert f.readline().startswith("id,code,name")
+        assert "Widget" in f.readline()
+
+
+def test_stale_jobs_stop_counting_towards_the_limit(client, auth):
+    user_id = client.get("/users/me/", headers=auth).json()["id"]
+    old = datetime.now(timezone.utc) - timedelta(seconds=exports.EXPORT_JOB_TIMEOUT_SECONDS + 60)
+    db = SessionLocal()
+    for index in range(exports.EXPORT_MAX_ACTIVE_PER_USER):
+        db.add(ExportJob(
+            id=f"stale{index}", user_id=user_id, report="inventory", format="csv",
+            status="running", rows_written=0, created_at=old, started_at=old,
+        ))
+    db.add(ExportJob(
+        id="recent", user_id=user_id, report="inventory", format="csv", status="queued", rows_written=0,
+    ))
+    db.commit()
+    db.close()
+
+    response = client.post("/reports/exports", json={"report": "inventory"}, headers=auth)
+    assert response.status_code == 202
+
+    stale = client.get("/reports/exports/stale0", headers=auth).json()
+    assert stale["status"] == "failed"
+    assert stale["error"].startswith("Timed out")
+    assert client.get("/reports/exports/recent", headers=auth).json()["status"] == "queued"
+
+
+def test_pdf_is_rejected_without_reportlab(client, auth, monkeypatch):
+    monkeypatch.setattr(exports, "canvas", None)
+    response = client.post("/reports/exports", json={"report": "inventory", "format": "pdf"}, headers=auth)
+    assert response.status_code == 400
+
+
+def test_polling_reports_a_stale_job_without_writing(client, auth):
+    user_id = client.get("/users/me/", headers=auth).json()["id"]
+    old = datetime.now(timezone.utc) - timedelta(seconds=exports.EXPORT_JOB_TIMEOUT_SECONDS + 60)
+    db = SessionLocal()
+    db.add(ExportJob(
+        id="stale", user_id=user_id, report="inventory", format="csv",
+        status="running", rows_written=0, created_at=old, started_at=old,
+    ))
+    db.commit()
+
+    job = client.get("/reports/exports/stale", headers=auth).json()
+    assert job["status"] == "failed"
+    assert job["error"] == exports.STALE_JOB_ERROR
+    db.expire_all()
+    assert db.get(ExportJob, "stale").status == "running"
+    db.close()
@@ -0,0 +1,127 @@
+import asyncio
+import time
+from datetime import datetime, timedelta, timezone
+
+from conftest import create_product
+
+from app import idempotency
+from app.database import SessionLocal
+from app.models import IdempotencyKey, Product
+
+
+def product_count():
+    db = SessionLocal()
+    try:
+        return db.query(Product).count()
+    finally:
+        db.close()
+
+
+def test_retry_is_replayed(client, auth):
+    headers = {**auth, "Idempotency-Key": "create-widget"}
+    data = {"name": "Widget", "price": "10", "stock": "5", "code": "W-1"}
+    first = client.post("/products/", data=data, headers=headers)
+    retry = client.post("/products/", data=data, headers=headers)
+
+    assert first.status_code == retry.status_code == 200
+    assert retry.json() == first.json()
+    assert retry.headers["idempotent-replayed"] == "true"
+    assert product_count() == 1
+
+
+def test_compressed_response_is_replayed(client, auth):
+    headers = {**auth, "Idempotency-Key": "create-widget", "Accept-Encoding": "gzip"}
+    data = {"name": "Widget", "price": "10", "stock": "5", "code": "W-1"}
+    first = client.post("/products/", data=data, headers=headers)
+    retry = client.post("/products/", data=data, headers=headers)
+
+    assert first.headers["content-encoding"] == retry.headers["content-encoding"] == "gzip"
+    assert retry.json() == first.json()
+    assert retry.headers["idempotent-replayed"] == "true"
+
+
+def test_key_reused_for_a_different_request_is_rejected(client, auth):
+    headers = {**auth, "Idempotency-Key": "create-widget"}
+    client.post("/products/", data={"name": "Widget", "price": "10", "stock": "5", "code": "W-1"}, headers=headers)
+    response = client.post("/products/", data={"name": "Gadget", "price": "10", "stock": "5", "code": "G-1"}, headers=headers)
+
+    assert response.status_code == 422
+    assert product_count() == 1
+
+
+def request_scope(key="retry-me"):
+    return {
+        "type": "http",
+        "method": "POST",
+        "path": "/products/",
+        "query_string": b"",
+        "headers": [(b"idempotency-key", key.encode()), (b"content-type", b"application/json")],
+    }
+
+
+async def receive():
+    return {"type": "http.request", "body": b"{}", "more_body": False}
+
+
+def run_requests(count, endpoint_delay=0.0, key="retry-me"):
+    calls = []
+
+    async def endpoint(scope, receive, send):
+        calls.append(scope)
+        await receive()
+        await asyncio.sleep(endpoint_delay)
+        await send({"type": "http.response.start", "status": 201, "headers": [(b"content-type", b"text/plain")]})
+        await send({"type": "http.response.body", "body": f"call {len(calls)}".encode()})
+
+    middleware = idempotency.IdempotencyMiddleware(endpoint)
+
+    async def call():
+        messages = []
+
+        async def send(message):
+            messages.append(message)
+
+        await middleware(request_scope(key), receive, send)
+        return messages[1]["body"]
+
+    async def main():
+        return await asyncio.gather(*(call() for _ in range(count)))
+
+    return asyncio.run(main()), len(calls)
+
+
+def test_duplicate_waits_for_the_request_in_flight():
+    bodies, calls = run_requests(2, endpoint_delay=0.2)
+    assert bodies == [b"call 1", b"call 1"]
+    assert calls == 1
+
+
+def test_claim_held_by_another_worker_is_waited_for(monkeypatch):
+    monkeypatch.setattr(idempotency, "MAX_POLL_INTERVAL_SECONDS", 0.05)
+    db = SessionLocal()
+    db.add(IdempotencyKey(
+        subject="", path="/products", idempotency_key="retry-me", status="in_flight",
+        expires_at=datetime.now(timezone.utc) + timedelta(seconds=0.3),
+    ))
+    db.commit()
+    db.close()
+
+    # The claim lapses without a response, so the request runs in its place.
+    started = time.monotonic()
+    bodies, calls = run_requests(1)
+    assert time.monotonic() - started >= 0.3
+    assert bodies == [b"call 1"]
+    assert calls == 1
+
+
+def test_saved_responses_are_capped_in_bytes(monkeypatch):
+    monkeypatch.setattr(idempotency, "IDEMPOTENCY_MAX_BYTES", 10)
+    run_requests(1, key="first")
+    run_requests(1, key="second")
+
+    db = SessionLocal()
+    try:
+        keys = [row.idempotency_key for row in db.query(IdempotencyKey)]
+    finally:
+        db.close()
+    assert keys == ["second"]
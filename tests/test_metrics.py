@@ -0,0 +1,26 @@
+from prometheus_client import REGISTRY
+
+
+def requests_total(method, route, status):
+    labels = {"method": method, "route": route, "status": status}
+    return REGISTRY.get_sample_value("http_requests_total", labels) or 0
+
+
+def test_responses_answered_before_routing_keep_their_route(client, auth):
+    headers = {**auth, "Idempotency-Key": "create-widget"}
+    data = {"name": "Widget", "price": "10", "stock": "5", "code": "W-1"}
+    before = requests_total("POST", "/products/", "200")
+    unmatched = requests_total("POST", "unmatched", "200")
+
+    client.post("/products/", data=data, headers=headers)
+    replayed = client.post("/products/", data=data, headers=headers)
+
+    assert replayed.headers["idempotent-replayed"] == "true"
+    assert requests_total("POST", "/products/", "200") == before + 2
+    assert requests_total("POST", "unmatched", "200") == unmatched
+
+
+def test_unknown_paths_are_unmatched(client):
+    before = requests_total("GET", "unmatched", "404")
+    client.get("/no/such/path")
+    assert requests_total("GET", "unmatched", "404") == before + 1
@@ -0,0 +1,239 @@
+from conftest import create_product, sign_up
+
+
+def test_list_products_shapes(client, auth):
+    create_product(client, auth)
+
+    embedded = client.get("/products/", headers=auth)
+    assert embedded.status_code == 200
+    assert "categories" not in embedded.json()
+
+    normalized = client.get("/products/", params={"shape": "normalized"}, headers=auth)
+    assert normalized.status_code == 200
+    assert normalized.json()["categories"] == {}
+
+
+def test_list_products_rejects_unknown_shape(client, auth):
+    response = client.get("/products/", params={"shape": "normalised"}, headers=auth)
+    assert response.status_code == 422
+
+
+def test_patch_only_writes_supplied_fields(client, auth):
+    product = create_product(client, auth, description="Blue", sales=3)
+
+    response = client.patch(f"/products/{product['id']}", json={"stock": 0, "description": None}, headers=auth)
+    assert response.status_code == 200
+    patched = response.json()
+    assert patched["stock"] == 0
+    assert patched["description"] is None
+    assert (patched["name"], patched["price"], patched["sales"], patched["code"]) == ("Widget", 10.0, 3, "W-1")
+
+
+def test_patch_rejects_null_required_fields_and_empty_bodies(client, auth):
+    product = create_product(client, auth)
+    assert client.patch(f"/products/{product['id']}", json={"name": None}, headers=auth).status_code == 422
+    assert client.patch(f"/products/{product['id']}", json={}, headers=auth).status_code == 400
+
+
+def test_patch_with_if_match(client, auth):
+    product = create_product(client, auth)
+    etag = client.get(f"/products/{product['id']}", headers=auth).headers["etag"]
+    assert etag == '"0"'
+
+    first = client.patch(f"/products/{product['id']}", json={"stock": 7}, headers={**auth, "If-Match": etag})
+    assert first.status_code == 200
+    assert first.headers["etag"] != etag
+    assert client.get(f"/products/{product['id']}", headers=auth).headers["etag"] == first.headers["etag"]
+
+    # A second client still holding the old version.
+    stale = client.patch(f"/products/{product['id']}", json={"stock": 9}, headers={**auth, "If-Match": etag})
+    assert stale.status_code == 412
+    assert client.get(f"/products/{product['id']}", headers=auth).json()["stock"] == 7
+
+    fresh = client.patch(
+        f"/products/{product['id']}", json={"stock": 9}, headers={**auth, "If-Match": first.headers["etag"]}
+    )
+    assert fresh.status_code == 200
+    assert client.patch(f"/products/{product['id']}", json={"stock": 1}, headers={**auth, "If-Match": "*"}).status_code == 200
+    assert client.patch(f"/products/{product['id']}", json={"stock": 1}, headers={**auth, "If-Match": "abc"}).status_code == 400
+
+
+def test_patch_with_updated_at_in_body(client, auth):
+    product = create_product(client, auth)
+    updated = client.patch(f"/products/{product['id']}", json={"sales": 4}, headers=auth).json()
+
+    response = client.patch(
+        f"/products/{product['id']}", json={"sales": 5, "updated_at": updated["updated_at"]}, headers=auth
+    )
+    assert response.status_code == 200
+
+    stale = client.patch(
+        f"/products/{product['id']}", json={"sales": 6, "updated_at": updated["updated_at"]}, headers=auth
+    )
+    assert stale.status_code == 412
+    assert client.get(f"/products/{product['id']}", headers=auth).json()["sales"] == 5
+
+
+def test_patch_missing_product(client, auth):
+    assert client.patch("/products/999", json={"stock": 1}, headers=auth).status_code == 404
+    assert client.patch("/products/999", json={"stock": 1}, headers={**auth, "If-Match": '"0"'}).status_code == 404
+
+
+def test_patch_rejects_another_users_category(client, auth):
+    product = create_product(client, auth)
+    other_user = sign_up(client, email="bob@example.com", name="Bob")
+    foreign = client.post("/products/categories/", json={"name": "Secret"}, headers=other_user).json()
+    own = client.post("/products/categories/", json={"name": "Tools"}, headers=auth).json()
+
+    response = client.patch(f"/products/{product['id']}", json={"category_id": foreign["id"]}, headers=auth)
+    assert response.status_code == 404
+    assert client.get(f"/products/{product['id']}", headers=auth).json()["category"] is None
+
+    response = client.patch(f"/products/{product['id']}", json={"category_id": own["id"]}, headers=auth)
+    assert response.status_code == 200
+    assert response.json()["category"]["name"] == "Tools"
+
+
+def test_put_returns_an_etag_for_if_match(client, auth):
+    product = create_product(client, auth)
+    response = client.put(
+        f"/products/{product['id']}", data={"name": "Widget", "price": "12", "stock": "5", "code": "W-1"}, headers=auth
+    )
+    assert response.status_code == 200
+    assert response.headers["etag"] == client.get(f"/products/{product['id']}", headers=auth).headers["etag"]
+
+    patched = client.patch(
+        f"/products/{product['id']}", json={"stock": 6}, headers={**auth, "If-Match": response.headers["etag"]}
+    )
+    assert patched.status_code == 200
+
+
+def test_get_product_by_code(client, auth):
+    oldest = create_product(client, auth, code="SKU-1", name="Oldest")
+    create_product(client, auth, code="SKU-1", name="Newer")
+    other_user = sign_up(client, email="bob@example.com", name="Bob")
+    create_product(client, other_user, code="SKU-2")
+
+    response = client.get("/products/by-code/SKU-1", headers=auth)
+    assert response.status_code == 200
+    assert response.json()["id"] == oldest["id"]
+    assert client.get("/products/by-code/SKU-2", headers=auth).status_code == 404
+
+
+def test_resolve_codes(client, auth):
+    first = create_product(client, auth, code="A-1")
+    create_product(client, auth, code="A-1", name="Duplicate")
+    second = create_product(client, auth, code="B-2")
+
+    response = client.post("/products/resolve-codes", json={"codes": ["B-2", "A-1", "Z-9", "B-2"]}, headers=auth)
+    assert response.status_code == 200
+    body = response.json()
+    assert {code: product["id"] for code, product in body["products"].items()} == {"A-1": first["id"], "B-2": second["id"]}
+    assert body["missing"] == ["Z-9"]
+
+    assert client.post("/products/resolve-codes", json={"codes": []}, headers=auth).status_code == 422
+    assert client.post("/products/resolve-codes", json={"codes": ["X"] * 501}, headers=auth).status_code == 422
+
+
+def test_suggest_products_by_name_or_code_prefix(client, auth):
+    mouse = create_product(client, auth, name="Wireless Mouse", code="WM-1", sales=5)
+    keyboard = create_product(client, auth, name="Keyboard", code="WIRE-KB", sales=50)
+    create_product(client, auth, name="Mouse Pad", code="MP-1", sales=100)
+    other_user = sign_up(client, email="bob@example.com", name="Bob")
+    create_product(client, other_user, name="Wireless Charger", code="WC-1", sales=1000)
+
+    response = client.get("/products/suggest", params={"q": "wire"}, headers=auth)
+    assert response.status_code == 200
+    assert [suggestion["id"] for suggestion in response.json()] == [keyboard["id"], mouse["id"]]
+
+    limited = client.get("/products/suggest", params={"q": "W", "limit": 1}, headers=auth).json()
+    assert [suggestion["id"] for suggestion in limited] == [keyboard["id"]]
+
+
+def test_suggest_treats_like_wildcards_literally(client, auth):
+    discount = create_product(client, auth, name="50% off", code="D-1")
+    create_product(client, auth, name="500 sheets", code="P-1")
+
+    response = client.get("/products/suggest", params={"q": "50%"}, headers=auth)
+    assert [suggestion["id"] for suggestion in response.json()] == [discount["id"]]
+    assert client.get("/products/suggest", params={"q": "_"}, headers=auth).json() == []
+    assert client.get("/products/suggest", params={"q": ""}, headers=auth).status_code == 422
+
+
+def facet_counts(body):
+    return (
+        body["total_items"],
+        {facet["name"]: facet["count"] for facet in body["categories"]},
+        [facet["count"] for facet in body["price"]],
+        {facet["band"]: facet["count"] for facet in body["stock"]},
+    )
+
+
+def test_facets_count_each_facet_without_its_own_filter(client, auth):
+    tools = client.post("/products/categories/", json={"name": "Tools"}, headers=auth).json()["id"]
+    toys = client.post("/products/categories/", json={"name": "Toys"}, headers=auth).json()["id"]
+    create_product(client, auth, category_id=tools, price=5, stock=0)
+    create_product(client, auth, category_id=tools, price=30, stock=5)
+    create_product(client, auth, category_id=toys, price=30, stock=50)
+    create_product(client, auth, price=600, stock=10)
+
+    total, categories, price, stock = facet_counts(
+        client.get("/products/facets", params={"category": tools}, headers=auth).json()
+    )
+    assert total == 2
+    assert categories == {"Tools": 2, "Toys": 1, None: 1}
+    assert price == [1, 0, 1, 0, 0, 0, 0]
+    assert stock == {"out_of_stock": 1, "low": 1, "in_stock": 0}
+
+    total, categories, price, stock = facet_counts(
+        client.get("/products/facets", params={"category": tools, "price_min": 20}, headers=auth).json()
+    )
+    assert total == 1
+    assert categories == {"Tools": 1, "Toys": 1, None: 1}
+    assert price == [1, 0, 1, 0, 0, 0, 0]
+    assert stock == {"out_of_stock": 0, "low": 1, "in_stock": 0}
+
+
+def test_low_stock_facet_agrees_with_the_dashboard(client, auth):
+    for stock in (0, 3, 10, 11):
+        create_product(client, auth, stock=stock)
+
+    _, _, _, stock = facet_counts(client.get("/products/facets", headers=auth).json())
+    dashboard = client.get("/reports/dashboard_metrics", headers=auth).json()
+    assert stock == {"out_of_stock": 1, "low": 2, "in_stock": 1}
+    assert dashboard["low_stock_products"] == stock["out_of_stock"] + stock["low"]
+
+
+def listed_ids(client, auth, **params):
+    response = client.get("/products/", params={"page_size": 100, **params}, headers=auth)
+    assert response.status_code == 200, response.text
+    return [product["id"] for product in response.json()["products"]]
+
+
+def test_sort_by_several_keys(client, auth):
+    tools = client.post("/products/categories/", json={"name": "Tools"}, headers=auth).json()["id"]
+    toys = client.post("/products/categories/", json={"name": "Toys"}, headers=auth).json()["id"]
+    hammer = create_product(client, auth, name="Hammer", category_id=tools, sales=5)["id"]
+    drill = create_product(client, auth, name="Drill", category_id=tools, sales=9)["id"]
+    kite = create_product(client, auth, name="Kite", category_id=toys, sales=9)["id"]
+    ball = create_product(client, auth, name="Ball", category_id=toys, sales=9)["id"]
+
+    assert listed_ids(client, auth, order_by="category,-sales,name") == [drill, hammer, ball, kite]
+    assert listed_ids(client, auth, order_by="-sales,name") == [ball, drill, kite, hammer]
+    # Keys without a prefix follow order.
+    assert listed_ids(client, auth, order_by="name", order="desc") == [kite, hammer, drill, ball]
+
+
+def test_sort_ties_are_broken_by_id_in_the_last_keys_direction(client, auth):
+    ids = [create_product(client, auth, name="Same", price=5)["id"] for _ in range(4)]
+
+    assert listed_ids(client, auth, order_by="price") == ids
+    assert listed_ids(client, auth, order_by="-price") == ids[::-1]
+
+    pages = [listed_ids(client, auth, order_by="name", page=page, page_size=2) for page in (1, 2)]
+    assert pages == [ids[:2], ids[2:]]
+
+
+def test_sort_rejects_unknown_keys(client, auth):
+    response = client.get("/products/", params={"order_by": "name,owner"}, headers=auth)
+    assert response.status_code == 400
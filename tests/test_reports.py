@@ -0,0 +1,55 @@
+import json
+
+from conftest import create_product
+
+from app import database
+
+
+def count_sessions(monkeypatch):
+    opened = []
+    session_factory = database.SessionLocal
+
+    def counting_session_local():
+        session = session_factory()
+        opened.append(session)
+        return session
+
+    monkeypatch.setattr(database, "SessionLocal", counting_session_local)
+    return opened
+
+
+def test_abc_analysis_uses_one_session(client, auth, monkeypatch):
+    create_product(client, auth, name="Best", price=17, sales=5)
+    create_product(client, auth, name="Middle", price=2, sales=5)
+    create_product(client, auth, name="Tail", price=1, sales=5)
+    opened = count_sessions(monkeypatch)
+
+    response = client.get("/reports/abc_analysis", headers=auth)
+    assert response.status_code == 200
+    assert [product["abc_class"] for product in response.json()["products"]] == ["A", "B", "C"]
+    assert len(opened) == 1
+
+    streamed = client.get("/reports/abc_analysis", params={"format": "ndjson"}, headers=auth)
+    assert streamed.status_code == 200
+    assert [json.loads(line)["name"] for line in streamed.text.splitlines()] == ["Best", "Middle", "Tail"]
+    assert len(opened) == 2
+
+
+def test_abc_analysis_requires_a_valid_token(client, monkeypatch):
+    opened = count_sessions(monkeypatch)
+    response = client.get("/reports/abc_analysis", headers={"Authorization": "Bearer nope"})
+    assert response.status_code == 401
+    assert len(opened) == 1
+
+
+def test_reorder_suggestions_follow_product_writes(client, auth):
+    product = create_product(client, auth, stock=1, sales=100)
+    first = client.get("/reports/reorder_suggestions", params={"include_all": "true"}, headers=auth).json()
+    assert [suggestion["stock"] for suggestion in first] == [1]
+
+    client.patch(f"/products/{product['id']}", json={"stock": 500}, headers=auth)
+    second = client.get("/reports/reorder_suggestions", params={"include_all": "true"}, headers=auth).json()
+    assert [suggestion["stock"] for suggestion in second] == [500]
+
+    client.delete(f"/products/{product['id']}", headers=auth)
+    assert client.get("/reports/reorder_suggestions", params={"include_all": "true"}, headers=auth).json() == []
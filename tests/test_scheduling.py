@@ -0,0 +1,15 @@
+from app import scheduling
+
+
+def test_one_worker_claims_each_period():
+    assert scheduling.claim_period("storage_gc", 60, now=600)
+    assert not scheduling.claim_period("storage_gc", 60, now=659)
+    assert scheduling.claim_period("reorder_refresh", 60, now=600)
+    assert scheduling.claim_period("storage_gc", 60, now=660)
+
+
+def test_old_claims_are_pruned():
+    scheduling.claim_period("storage_gc", 60, now=0)
+    scheduling.claim_period("storage_gc", 60, now=60 * (scheduling.KEEP_PERIODS + 1))
+    # Period 0 is claimable again once it has been pruned.
+    assert scheduling.claim_period("storage_gc", 60, now=0)
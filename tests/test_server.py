@@ -0,0 +1,21 @@
+import os
+
+from app import server
+
+
+def test_prepare_metrics_dir_only_deletes_sample_files(tmp_path, monkeypatch):
+    (tmp_path / "counter_123.db").write_bytes(b"samples")
+    (tmp_path / "settings.ini").write_text("keep")
+    (tmp_path / "data").mkdir()
+    monkeypatch.setenv("PROMETHEUS_MULTIPROC_DIR", str(tmp_path))
+
+    server.prepare_metrics_dir()
+
+    assert sorted(os.listdir(tmp_path)) == ["data", "settings.ini"]
+
+
+def test_prepare_metrics_dir_creates_a_missing_directory(tmp_path, monkeypatch):
+    directory = tmp_path / "metrics"
+    monkeypatch.setenv("PROMETHEUS_MULTIPROC_DIR", str(directory))
+    server.prepare_metrics_dir()
+    assert directory.is_dir()
@@ -0,0 +1,97 @@
+import asyncio
+import gzip
+
+from starlette.datastructures import Headers
+
+from app.auth import create_access_token
+from app.compression import CompressionMiddleware
+from app.singleflight import SingleFlightMiddleware
+
+
+def request_scope():
+    token = create_access_token({"sub": "alice@example.com"})
+    return {
+        "type": "http",
+        "method": "GET",
+        "path": "/reports/dashboard",
+        "query_string": b"",
+        "headers": [(b"authorization", f"Bearer {token}".encode())],
+    }
+
+
+async def receive():
+    return {"type": "http.request", "body": b"", "more_body": False}
+
+
+def statuses_of_two_duplicates(first_status):
+    calls = []
+
+    async def endpoint(scope, receive, send):
+        calls.append(scope)
+        status = first_status if len(calls) == 1 else 200
+        # Let the duplicate arrive while the first request is in flight.
+        await asyncio.sleep(0.05)
+        await send({"type": "http.response.start", "status": status, "headers": []})
+        await send({"type": "http.response.body", "body": str(status).encode()})
+
+    middleware = SingleFlightMiddleware(endpoint)
+
+    async def call():
+        messages = []
+
+        async def send(message):
+            messages.append(message)
+
+        await middleware(request_scope(), receive, send)
+        return messages[0]["status"]
+
+    async def main():
+        return await asyncio.gather(call(), call())
+
+    return asyncio.run(main()), len(calls)
+
+
+def test_duplicates_share_a_successful_response():
+    statuses, calls = statuses_of_two_duplicates(200)
+    assert statuses == [200, 200]
+    assert calls == 1
+
+
+def test_duplicates_run_on_their_own_after_a_failed_leader():
+    statuses, calls = statuses_of_two_duplicates(503)
+    assert statuses == [503, 200]
+    assert calls == 2
+
+
+def test_duplicates_get_a_body_matching_their_encoding():
+    body = b'{"name": "Widget"}' * 100
+    calls = []
+
+    async def endpoint(scope, receive, send):
+        calls.append(scope)
+        await asyncio.sleep(0.05)
+        await send({"type": "http.response.start", "status": 200, "headers": [(b"content-type", b"application/json")]})
+        await send({"type": "http.response.body", "body": body})
+
+    middleware = CompressionMiddleware(SingleFlightMiddleware(endpoint))
+
+    async def call(accept_encoding):
+        messages = []
+
+        async def send(message):
+            messages.append(message)
+
+        scope = request_scope()
+        scope["headers"].append((b"accept-encoding", accept_encoding))
+        await middleware(scope, receive, send)
+        return Headers(raw=messages[0]["headers"]).get("content-encoding"), messages[1]["body"]
+
+    async def main():
+        return await asyncio.gather(call(b"gzip"), call(b"gzip"), call(b"identity"))
+
+    responses = asyncio.run(main())
+    assert len(calls) == 1
+    assert [encoding for encoding, _ in responses] == ["gzip", "gzip", None]
+    assert gzip.decompress(responses[0][1]) == body
+    assert gzip.decompress(responses[1][1]) == body
+    assert responses[2][1] == body
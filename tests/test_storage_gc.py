@@ -0,0 +1,90 @@
+import os
+
+from conftest import PNG, create_product, sign_up
+
+from sqlalchemy import event
+
+from app import storage_gc
+from app.database import SessionLocal
+from app.supabase import LOCAL_STORAGE_DIR
+
+
+def stored_path(url):
+    return os.path.join(LOCAL_STORAGE_DIR, url.replace("\\", "/").split("uploads/")[-1])
+
+
+def test_object_key_ignores_the_url_prefix():
+    for url in (
+        "/tmp/run/uploads/profile_images/abc.png",
+        "profile_images/abc.png",
+        "https://example.supabase.co/storage/v1/object/public/profile_images/abc.png",
+        "uploads\\profile_images\\abc.png",
+    ):
+        assert storage_gc.object_key("profile_images", url) == "abc.png"
+    assert storage_gc.object_key("profile_images", "product_images/abc.png") is None
+
+
+def test_gc_removes_only_unreferenced_images_after_writes(client):
+    auth = sign_up(client)
+    profile_image = client.get("/users/me/", headers=auth).json()["profile_image"]
+
+    # Write routes authenticate through the same session they commit.
+    assert client.post("/products/categories/", json={"name": "Tools"}, headers=auth).status_code == 201
+    product = create_product(client, auth)
+    first = client.put(
+        f"/products/{product['id']}",
+        data={"name": "Widget", "price": "10", "stock": "5", "code": "W-1"},
+        files={"image": ("first.png", PNG + b"first", "image/png")},
+        headers=auth,
+    ).json()["image"]
+    second = client.put(
+        f"/products/{product['id']}",
+        data={"name": "Widget", "price": "10", "stock": "5", "code": "W-1"},
+        files={"image": ("second.png", PNG + b"second", "image/png")},
+        headers=auth,
+    ).json()["image"]
+
+    report = storage_gc.collect(grace_seconds=0)
+
+    assert report["removed"] == 1
+    assert not os.path.exists(stored_path(first))
+    assert os.path.exists(stored_path(second))
+    assert os.path.exists(os.path.join(LOCAL_STORAGE_DIR, profile_image))
+    assert client.get("/users/me/", headers=auth).json()["profile_image"] == profile_image
+
+
+def test_gc_keeps_an_orphan_reused_before_the_sweep(client):
+    auth = sign_up(client)
+    product = create_product(client, auth)
+    form = {"name": "Widget", "price": "10", "stock": "5", "code": "W-1"}
+    first = client.put(
+        f"/products/{product['id']}", data=form,
+        files={"image": ("first.png", PNG + b"first", "image/png")}, headers=auth,
+    ).json()["image"]
+    client.put(
+        f"/products/{product['id']}", data=form,
+        files={"image": ("second.png", PNG + b"second", "image/png")}, headers=auth,
+    )
+
+    reused = []
+
+    def reuse_before_delete(orm_execute_state):
+        statement = orm_execute_state.statement
+        if orm_execute_state.is_delete and statement.table.name == "stored_objects" and not reused:
+            # Another product uploads the orphan's content after the GC
+            # decided to remove it, before its row is deleted.
+            other = create_product(client, auth, name="Gadget", code="G-1")
+            reused.append(client.put(
+                f"/products/{other['id']}", data={**form, "name": "Gadget", "code": "G-1"},
+                files={"image": ("again.png", PNG + b"first", "image/png")}, headers=auth,
+            ).json()["image"])
+
+    event.listen(SessionLocal, "do_orm_execute", reuse_before_delete)
+    try:
+        report = storage_gc.collect(grace_seconds=0)
+    finally:
+        event.remove(SessionLocal, "do_orm_execute", reuse_before_delete)
+
+    assert reused == [first]
+    assert report["removed"] == 0
+    assert os.path.exists(stored_path(first))